@@ -1,303 +1,260 @@
+import base64
+import io
+import json
 import streamlit as st
 import numpy as np
-import re
 import pandas as pd
 import assignment
 import streamlit.components.v1 as components
 from app_js import get_js
 from app_style import get_html_style
+from lsa_backends import LSA_BACKENDS, InfeasibleAssignmentError
+from transportation import TransportationError
+from sparse_matrix import SparseMatrix
+from assignment_cache import cached_assign, cached_assign_replicated
+from warm_start import WarmStart
+from matrix_reader import (
+    MATRIX_FILE_TYPES, MatrixParseError, read_matrix, read_matrix_text, read_text_frame, to_numeric_matrix
+)
+from matrix_info import (
+    ReplicationFactorError, ExpandableMatrixAndBackgrounds,
+    split_text_to_array, calculate_priority_ranking
+)
 
 # ページの設定
 st.set_page_config(layout="wide")
 
-class MatrixDimensionError(Exception):
-    """行と列の複製係数の和が一致しない場合に発生する例外"""
-    pass
 
-class ReplicationFactorError(Exception):
-    """複製係数が1未満の場合に発生する例外"""
-    pass
+# 埋め込み表示のレイアウト（px）
+GRID_CELL_SIZE = 40
+GRID_HEADER_WIDTH = 120
+GRID_HEADER_HEIGHT = 100
+GRID_RESULT_SIZE = 160
+GRID_MAX_HEIGHT = 720
 
-class ExpandableMatrixAndBackgrounds:
+
+def encode_array(array):
     """
-    expand可能なマトリックスと背景情報を管理するクラス
+    配列をリトルエンディアンのバイト列にしてbase64の文字列で返す（ブラウザ側で型付き配列に戻す）
     """
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode("ascii")
+
 
-    def show_all_members(self):
-        """
-        このインスタンスの全てのメンバー変数の値を見やすく表示するテスト用メソッド
-        """
-        print("==== ExpandableMatrixAndBackgrounds メンバー変数一覧 ====")
-        print(f"row_names: {self.row_names}")
-        print(f"column_names: {self.column_names}")
-        print(f"row_priorities: {self.row_priorities}")
-        print(f"column_priorities: {self.column_priorities}")
-        print(f"display_matrix: {self.display_matrix}")
-        print(f"row_ids: {self.row_ids}")
-        print(f"col_ids: {self.col_ids}")
-        print("===============================================")
+def create_grid_payload(
+    original_matrix_info : ExpandableMatrixAndBackgrounds,
+    row_replication_factors,
+    column_replication_factors,
+    assignment_matrix,
+    assignments
+):
     """
-    expand可能なマトリックスと背景情報を管理するクラス
+    埋め込み表示に渡すデータを作る
+
+    複製前の行列・名前・優先順位と複製係数だけを渡し、展開表示と2つの折りたたみ表示は
+    ブラウザ側で組み立てる。複製後の大きさに比例するのは、割り当てるべきセルのビット列と
+    行ごとの割当列だけになる。
+
+    Parameters
+    ----------
+    original_matrix_info : ExpandableMatrixAndBackgrounds
+        複製前の行列の情報
+    row_replication_factors : list[int]
+        行複製係数
+    column_replication_factors : list[int]
+        列複製係数
+    assignment_matrix : list or numpy.ndarray or SparseMatrix
+        複製後の行列で割り当てるべきセルを0とする行列（輸送問題モードでは複製前の大きさの行列で、
+        ビット列にする前に複製係数に従って展開する。疎行列モードでは割当可能なセルだけを持つ疎行列）
+    assignments : list
+        複製後の行列での割当のリスト [(row, col), ...]
+
+    Returns
+    -------
+    payload : dict
+        JSONに変換できる表示データ
     """
-    def __init__(self, row_names, column_names, row_priorities, column_priorities, display_matrix, row_ids = None, col_ids = None):
-        self.row_names = row_names
-        self.column_names = column_names
-        self.row_priorities = row_priorities
-        self.column_priorities = column_priorities
-        self.display_matrix = display_matrix
-        if row_ids is None:
-            self.row_ids = [str(i) for i in range(len(display_matrix))]
-        else:
-            self.row_ids = row_ids
-        if col_ids is None:
-            self.col_ids = [str(i) for i in range(len(display_matrix[0]))]
-        else:
-            self.col_ids = col_ids
-
-    def row_expanded(self, row_replication_factors):
-        """
-        行複製係数に従って行を複製した新しいインスタンスを生成するインスタンスメソッド
-
-        Parameters
-        ----------
-        row_replication_factors : list of int
-            行複製係数
-
-        Returns
-        -------
-        ExpandableMatrixAndBackgrounds
-            行複製後の新しいインスタンス
-        # """
-        # selfのメンバー変数に対して複製を行う
-        expanded_row_names, expanded_row_priorities, expanded_row_ids = \
-            self.expand_names_and_priorities_and_ids(
-                self.row_names,
-                self.row_priorities,
-                row_replication_factors
-            )
-
-        # 列情報はそのまま
-        return ExpandableMatrixAndBackgrounds(
-            expanded_row_names,
-            self.column_names,
-            expanded_row_priorities,
-            self.column_priorities,
-            self.row_expand_matrix(self.display_matrix, row_replication_factors),
-            expanded_row_ids,
-            self.col_ids
-        )
-
-    def column_expanded(self, column_replication_factors):
-        """
-        列複製係数に従って列を複製した新しいインスタンスを生成するインスタンスメソッド
-
-        Parameters
-        ----------
-        column_replication_factors : list of int
-            列複製係数
-
-        Returns
-        -------
-        ExpandableMatrixAndBackgrounds
-            列複製後の新しいインスタンス
-        """
-        # selfのメンバー変数に対して複製を行う
-        expanded_column_names, expanded_column_priorities, expanded_column_ids = \
-            self.expand_names_and_priorities_and_ids(
-                self.column_names,
-                self.column_priorities,
-                column_replication_factors
-            )
-            
-        # 行情報はそのまま
-        return ExpandableMatrixAndBackgrounds(
-            self.row_names,
-            expanded_column_names,
-            self.row_priorities,
-            expanded_column_priorities,
-            self.column_expand_matrix(self.display_matrix, column_replication_factors),
-            self.row_ids,
-            expanded_column_ids
-        )
-        
-    def row_expand_matrix(self, numeric_matrix, row_replication_factors):
-        """
-        行複製係数に従って行列を展開する
-        """
-        return [row for row, factor in zip(numeric_matrix, row_replication_factors) for _ in range(factor)]
-
-    def column_expand_matrix(self, numeric_matrix, col_duplication_factors):
-        """
-        列複製係数に従って行列を展開する
-        """
-        return [
-            [value for value, factor in zip(row, col_duplication_factors) for _ in range(factor)]
-            for row in numeric_matrix
-        ]
-
-    def create_square_matrix(self, numeric_matrix, row_replication_factors, column_replication_factors):
-        """
-        行列を複製係数に従って展開する
-        """
-        # 行複製係数の和と列複製係数の和が一致するかを検証
-        if sum(row_replication_factors) != sum(column_replication_factors):
-            raise MatrixDimensionError()
-
-        # 行を複製
-        row_expanded_matrix = self.row_expand_matrix(numeric_matrix, row_replication_factors)
-
-        # 行・列ともに複製
-        square_matrix = self.column_expand_matrix(row_expanded_matrix, column_replication_factors)
-
-        return square_matrix
-    
-    def expand_names_and_priorities_and_ids(self, names, priorities, replication_factors):
-        """
-        名前と優先順位を複製係数に従って展開する
-        """
-        # 行または列の複製
-        expanded_names = []
-        expanded_priorities = []
-        expanded_ids = []
-        
-        for i, (priority, factor) in enumerate(zip(priorities, replication_factors)):
-            if i < len(names):
-                name = names[i]
-            else:
-                name = ""
-            if factor == 1:
-                expanded_names.append(name)
-            else:
-                expanded_names.extend([f"{name}{j+1}" for j in range(factor)])
-            expanded_priorities.extend([priority] * factor)
-            expanded_ids.extend([str(i) + "-" + str(j) for j in range(factor)])
-        return expanded_names, expanded_priorities, expanded_ids
-
-def split_text_to_array(input_text):
+    m = original_matrix_info
+    matrix = np.asarray(m.display_matrix)
+    rows, cols = matrix.shape
+
+    # 値の範囲に収まる最も小さい整数型で送る（整数でなければ倍精度）
+    matrix_dtype = "float64"
+    if matrix.dtype.kind in "biu":
+        low, high = (int(matrix.min()), int(matrix.max())) if matrix.size else (0, 0)
+        for dtype in ("int8", "int16", "int32"):
+            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                matrix_dtype = dtype
+                break
+
+    if isinstance(assignment_matrix, SparseMatrix):
+        # 疎行列モードの割当可能行列は割当可能なセルだけを持つので、値が0のセルだけを立てる
+        zero_mask = np.zeros(assignment_matrix.shape, dtype=bool)
+        zero_cells = assignment_matrix.values == 0
+        zero_mask[assignment_matrix.rows[zero_cells], assignment_matrix.cols[zero_cells]] = True
+    else:
+        zero_mask = np.asarray(assignment_matrix) == 0
+    expanded_shape = (int(np.sum(row_replication_factors)), int(np.sum(column_replication_factors)))
+    if zero_mask.shape != expanded_shape:
+        zero_mask = np.repeat(np.repeat(zero_mask, row_replication_factors, axis=0), column_replication_factors, axis=1)
+    n = expanded_shape[0]
+    col_of_row = np.full(n, -1, dtype="<i4")
+    if len(assignments):
+        assigned = np.asarray(assignments, dtype=np.int64)
+        col_of_row[assigned[:, 0]] = assigned[:, 1]
+
+    return {
+        "rows": rows,
+        "cols": cols,
+        "matrix": encode_array(matrix.astype(np.dtype(matrix_dtype).newbyteorder("<"))),
+        "matrix_dtype": matrix_dtype,
+        "forbidden": None if m.sparse_matrix is None else encode_array(np.packbits(~m.sparse_matrix.allowed_mask())),
+        "zero_mask": encode_array(np.packbits(zero_mask)),
+        "assignments": encode_array(col_of_row),
+        # 名前が足りない行・列は空の名前にする
+        "row_names": [m.row_names[i] if i < len(m.row_names) else "" for i in range(rows)],
+        "col_names": [m.column_names[j] if j < len(m.column_names) else "" for j in range(cols)],
+        "row_factors": [int(factor) for factor in row_replication_factors],
+        "col_factors": [int(factor) for factor in column_replication_factors],
+        "row_priorities": [int(priority) for priority in m.row_priorities],
+        "col_priorities": [int(priority) for priority in m.column_priorities]
+    }
+
+
+def show_trace(trace):
     """
-    入力テキストをタブ、スペース、改行で分割し、配列に変換する。
+    assignment.assignの計測結果（段階ごとの経過時間・メモリとモデルの大きさ）を表示する
     """
-    return re.split(r'[\t|\s|\r\n|\r|\n]', input_text)
-
-def parse_input_matrix(input_text):
-    # 入力されたテキストを行列に変換
-    lines = re.split(r'\r\n|\r|\n', input_text)
-    matrix = [re.split(r'\s', line) for line in lines]
-    return matrix
-
-def calculate_priority_ranking(numeric_matrix, matrix_type):
-    # 各行の合計を計算
-    sums = [sum(row) for row in numeric_matrix]
-    # ランキングを計算
-    # コスト行列ならTrue(小さいほど順位が高い)、利益行列ならFalse(大きいほど順位が高い)
-    ranks = pd.Series(sums).rank(method='min', ascending=not matrix_type).astype(int)
-    return ranks.tolist()
-
-
-def create_display_html_table_content(
-    display_matrix_info : ExpandableMatrixAndBackgrounds,
-    table_type : str,
-    assignment_matrix=None
-):
-    m = display_matrix_info
-    
-    display_rows = len(m.display_matrix) + 2
-    display_cols = len(m.display_matrix[0]) + 2
-        
-    # HTMLテーブルを作成
-    html_table = f"""
-    <div class='center-table'>
-        <div class='table-container'>
-            <table class='no-border-table'>
+    with st.expander(f"計測結果（合計 {trace['total_seconds']:.3f} 秒）"):
+        phases = pd.DataFrame([
+            {
+                "段階": phase["name"],
+                "経過時間[秒]": round(phase["seconds"], 4),
+                "メモリ増減[KiB]": phase["memory_delta_bytes"] // 1024,
+                "メモリピーク[KiB]": phase["memory_peak_bytes"] // 1024
+            }
+            for phase in trace["phases"]
+        ])
+        st.dataframe(phases, hide_index=True)
+        if trace["models"]:
+            models = pd.DataFrame(trace["models"]).rename(columns={"size": "行数", "variables": "変数", "constraints": "制約"})
+            st.dataframe(models, hide_index=True)
+        if trace["max_rss_bytes"] is not None:
+            st.caption(f"最大常駐メモリ: {trace['max_rss_bytes'] / 2**20:.1f} MiB")
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def build_expanded_problem(numeric_matrix, allowed_mask, row_names, column_names, row_priorities, column_priorities,
+                         row_replication_factors, column_replication_factors):
     """
-    for i in range(display_rows):
-        html_table += "<tr>"
-        for j in range(display_cols):
-            I = i-1
-            J = j-1
-            
-            if i == 0 and j == 0 or i == display_rows - 1 and j == display_cols - 1 or i == display_rows - 1 and j == 0 or i == 0 and j == display_cols - 1:
-                # 四隅のセルに特定のクラスを追加
-                html_table += f"<td class='corner-cell'></td>"
-            # 優先順位も割当結果も表示していたときはこうしていた
-            # elif (table_type == "row-fold" or table_type == "column-fold") and (i == 0 and j == display_cols - 2 or i == display_rows - 2 and j == 0 or 
-            #                                                                     i >= display_rows - 2 and j >= display_cols - 2):
-            #     # 四隅のセルに特定のクラスを追加
-            #     html_table += f"<td class='corner-cell'></td>"
-            else:
-                if i == 0:
-                    # 列名を薄い青色にし、列名は縦書きで上から下に表示する
-                    cell_style = "writing-mode: vertical-lr;"
-                    if (table_type == "column-fold") and m.folded_column_replication_factors[J] > 1:
-                        column_name = m.column_names[J] + " × " + str(m.folded_column_replication_factors[J])
-                    else:
-                        column_name = m.column_names[J]
-                    html_table += f"<th id='col-name-{table_type}-{J} col_id='{m.col_ids[J]}' assignment_name='{m.column_names[J]}' style='background-color: #d3f9f9'><span style='{cell_style}'>{column_name}</span></th>"
-                elif j == 0:
-                    # 行名を薄い青色にする
-                    cell_style = "background-color: #d3f9f9;"
-                    if (table_type == "row-fold") and m.folded_row_replication_factors[I] > 1:
-                        row_name = m.row_names[I] + " × " + str(m.folded_row_replication_factors[I])
-                    else:
-                        row_name = m.row_names[I]
-                    html_table += f"<th id='row-name-{table_type}-{I}' row_id='{m.row_ids[I]}' assignment_name='{m.row_names[I]}' style='{cell_style}'><span>{row_name}</span></th>"
-                elif i == display_rows - 1:
-                    if table_type == "square":
-                        # 優先順位を薄緑色にする
-                        cell_style = "background-color: #ccffcc;"
-                        html_table += f"<td style='{cell_style}' col_id={m.col_ids[J]}>{m.column_priorities[J]}</td>"
-                    else:
-                        # 列割当結果
-                        cell_style = "writing-mode: vertical-lr;"
-                        html_table += f"<th id='col-assignment-{table_type}-{J}' col_id={m.col_ids[J]} style='background-color: #ccffcc;'><span style='{cell_style}'></span></th>"
-                elif j == display_cols - 1:
-                    if table_type == "square":
-                        # 優先順位を薄緑色にする
-                        cell_style = "background-color: #ccffcc;"
-                        html_table += f"<td style='{cell_style}' row_id={m.row_ids[I]}>{m.row_priorities[I]}</td>"
-                    else:
-                        # 行割当結果
-                        cell_style = "background-color: #ccffcc;"
-                        html_table += f"<th id='row-assignment-{table_type}-{I}' style='{cell_style}' row_id={m.row_ids[I]}></th>"
-                # 優先順位も割当結果も表示していたときはこうしていた
-                # elif (table_type == "row-fold" or table_type == "column-fold") and i == display_rows - 2:
-                #     # 薄灰色にし、縦書きで太字で上から下に割当結果を表示する
-                #     cell_style = "writing-mode: vertical-lr;"
-                #     html_table += f"<th id='col-assignment-{table_type}-{J}' col_id={m.col_ids[J]} style='background-color: #cccccc;'><span style='{cell_style}'></span></th>"
-                # elif (table_type == "row-fold" or table_type == "column-fold") and j == display_cols - 2:
-                #     # 薄灰色にし、太字で割当結果を表示する
-                #     cell_style = "background-color: #cccccc;"
-                #     html_table += f"<th id='row-assignment-{table_type}-{I}' style='{cell_style}' row_id={m.row_ids[I]}></th>"
-                else:
-                    # display_matrixの値をdata属性に設定
-                    cell_style = ""
-                    if table_type == "square":
-                        if assignment_matrix[I][J] == 0:
-                            # 割り当てるべきセルは黄色にする
-                            cell_style = "background-color: #ffffe0;"
-                        # 最適自動割当のため、idは単純な座標から参照できるようにする
-                        html_table += f"<td id = 'cell-{table_type}-{I}-{J}' row_id='{m.row_ids[I]}' col_id='{m.col_ids[J]}' style='{cell_style}' data-value='{m.display_matrix[I][J]}' onclick='toggleCellColor({I}, {J})'>{m.display_matrix[I][J]}</td>"
-                    else:
-                        html_table += f"<td id = 'cell-{table_type}-{I}-{J}' row_id='{m.row_ids[I]}' col_id='{m.col_ids[J]}' style='{cell_style}' data-value='{m.display_matrix[I][J]}'>{m.display_matrix[I][J]}</td>"
-        html_table += "</tr>"
-    
-    if table_type == "square":
-        html_table += f"""
-            </table>
-            <div class='vertical-label'>行優先順位</div>
-        </div>
-        <div style='text-align: center; font-weight: bold; width: 100%;'>列優先順位</div>
+    複製前と複製後の行列の情報を作る（同じ入力ならキャッシュを使う）
+
+    行複製係数の和と列複製係数の和が異なれば、複製後の行列は長方形のまま解く。
+
+    Parameters
+    ----------
+    numeric_matrix : numpy.ndarray
+        複製前の行列
+    allowed_mask : numpy.ndarray or None
+        疎行列モードで割当可能なセルをTrueとする行列（疎行列モードでなければNone）
+    row_names, column_names : list[str]
+        行名・列名
+    row_priorities, column_priorities : list[int]
+        複製前の行・列の優先順位
+    row_replication_factors, column_replication_factors : list[int]
+        行・列の複製係数
+
+    Returns
+    -------
+    original_matrix_info : ExpandableMatrixAndBackgrounds
+        複製前の情報
+    expanded_matrix_info : ExpandableMatrixAndBackgrounds
+        複製後の行列の情報（疎行列モードでは割当可能なセルだけの疎行列も持つ）
+    """
+    # 複製前
+    original_matrix_info = ExpandableMatrixAndBackgrounds(
+        row_names, column_names, row_priorities, column_priorities, numeric_matrix,
+        sparse_matrix=None if allowed_mask is None else SparseMatrix.from_dense(numeric_matrix, allowed_mask)
+    )
+    # 行複製・列複製した行列（行列は複製前のものを共有し、参照されたときに展開する）
+    expanded_matrix_info = original_matrix_info.expanded(row_replication_factors, column_replication_factors)
+    return original_matrix_info, expanded_matrix_info
+
+
+@st.fragment
+def show_result(result):
+    """
+    セッションに保存した割当結果を表示する
+
+    フラグメントとして描画するので、結果の表示だけを更新する場合にページ全体を再実行しない。
+
+    Parameters
+    ----------
+    result : dict
+        grid_data（create_grid_payloadの戻り値と割当回数）、total_assignment、solve_info、size（複製後の行数）
+    """
+    solve_info = result["solve_info"]
+    st.markdown("<div style='text-align: center; font-size: 16px; margin: 10px 0;'>黄色のマスを割り当てていけば最適割当となります。</div>", unsafe_allow_html=True)
+
+    # 制限時間で打ち切った場合は、優先順位の同点解処理が最適でないことを表示
+    if solve_info and solve_info["status"] != "OPTIMAL":
+        gap_text = "不明" if solve_info["gap"] is None else f"{solve_info['gap']:.2%}"
+        st.warning(f"制限時間内に優先順位の最適性を証明できませんでした（状態: {solve_info['status']}, ギャップ: {gap_text}）。割当合計は最適です。")
+
+    # 計測結果（キャッシュから返した場合は初回の計測値）
+    if solve_info and solve_info.get("trace"):
+        show_trace(solve_info["trace"])
+
+    # 右側にHTMLラジオを配置し、表示を切り替え
+    # 表示データと割当をJSONにしてscriptタグに埋め込む（"</"はscriptタグを閉じないようにエスケープ）
+    # 割当回数を含めることで割当ボタンを押すたびにhtmlが変化して初期表示が走るようになる
+    grid_data = dict(result["grid_data"], layout={
+        "cell_size": GRID_CELL_SIZE,
+        "header_width": GRID_HEADER_WIDTH,
+        "header_height": GRID_HEADER_HEIGHT,
+        "result_size": GRID_RESULT_SIZE
+    })
+    grid_data_json = json.dumps(grid_data, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+
+    html_table_with_radio = f"""
+    <script type='application/json' id='grid-data'>{grid_data_json}</script>
+    <div style='display:flex; gap:16px; align-items:flex-start; justify-content:flex-start; flex-wrap: nowrap;'>
+      <div style='flex:1 1 auto; min-width:0;'>
+        <div id='tbl_square'><div id='grid_square'></div></div>
+        <div id='tbl_fold_rows' style='display:none;'><div id='grid_fold_rows'></div></div>
+        <div id='tbl_fold_cols' style='display:none;'><div id='grid_fold_cols'></div></div>
+      </div>
+      <div style='width:220px; flex:0 0 220px;'>
+        <label><input type='radio' name='display_mode_html' value='square' checked> 展開表示</label><br/>
+        <label><input type='radio' name='display_mode_html' value='fold_rows'> 行を折りたたむ(割当操作はできません)</label><br/>
+        <label><input type='radio' name='display_mode_html' value='fold_cols'> 列を折りたたむ(割当操作はできません)</label>
+      </div>
     </div>
     """
-    else:
-        html_table += f"""
-            </table>
+    
+    # html_table_tail = f"""<div style="display: flex; justify-content: center; text-align: center; margin-top: 20px; margin-right: 220px;">
+    html_table_tail = f"""<div style="display: flex; flex-direction: column; align-items: center; margin-top: 20px; margin-right: 220px;">
+        <div style="display: flex; justify-content: center; text-align: center; margin-bottom: 10px;">
+            <div id='sum-display' style="margin-right: 10px;">割当合計: 0</div>
+            <div>最適割当合計: {result['total_assignment']}</div>
         </div>
+        <button onclick="resetAssignment()" style="display: block; margin: 10px auto;">割当リセット</button>
     </div>
     """
-    
-    return html_table
-                    
+
+    # script
+    html_js = get_js()
+
+    # CSSスタイルを定義
+    html_style = get_html_style(GRID_CELL_SIZE, GRID_MAX_HEIGHT)
+
+    # HTMLコンテンツを表示（ラジオで切替するが中身は同一）
+    # 表は見えている範囲だけを描画し、GRID_MAX_HEIGHTを超える分は表の中でスクロールする
+    grid_height = min(
+        GRID_HEADER_HEIGHT + GRID_CELL_SIZE * result["size"] + GRID_RESULT_SIZE + 20,
+        GRID_MAX_HEIGHT
+    )
+    components.html(html_table_with_radio + html_table_tail + html_js + html_style, height=grid_height + 160)
+
+
 def set_test_data():
     """
     テストデータをセッション状態に設定するメソッド
@@ -322,12 +279,187 @@ def set_test_data():
     st.session_state.test_row_names = test_row_names
 
 
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_matrix(matrix_source, file_type, sparse_mode):
+    """
+    貼り付けたテキストまたはアップロードされたファイルを整数の行列に変換する（同じ入力は再度変換しない）
+
+    Parameters
+    ----------
+    matrix_source : str or bytes
+        貼り付けたテキスト、またはアップロードされたファイルの中身
+    file_type : str or None
+        ファイルの種類（貼り付けたテキストならNone）
+    sparse_mode : bool
+        疎行列モードか
+
+    Returns
+    -------
+    numeric_matrix : numpy.ndarray
+        整数の行列
+    allowed_mask : numpy.ndarray or None
+        割当可能なセルをTrueとするブール行列（疎行列モードでなければNone）
+    """
+    if file_type is None:
+        return read_matrix_text(matrix_source, sparse_mode)
+    return read_matrix(io.BytesIO(matrix_source), file_type, sparse_mode)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def build_editor_frame(matrix_source, file_type, matrix_type, sparse_mode, use_test_factors):
+    """
+    読み込んだ行列から、複製係数と優先順位の初期値を周囲に加えたdata_editor用の表を作る
+
+    入力・行列の種類・疎行列モードが同じなら再計算しない（行名・列名の入力や
+    優先のフラグの切り替えでは作り直さない）。大きな表を再実行のたびにコピーしないよう
+    st.cache_resource でキャッシュするので、戻り値は書き換えないこと。
+
+    Parameters
+    ----------
+    matrix_source : str or bytes
+        貼り付けたテキスト、またはアップロードされたファイルの中身
+    file_type : str or None
+        ファイルの種類（貼り付けたテキストならNone）
+    matrix_type : int
+        行列の種類(0ならコスト行列、1なら利益行列)
+    sparse_mode : bool
+        疎行列モードか
+    use_test_factors : bool
+        テストデータの複製係数を使うか
+
+    Returns
+    -------
+    df : pandas.DataFrame or None
+        data_editorに渡す表（ファイルを読めなかった場合はNone）
+    matrix : tuple or None
+        読み込んだ (整数の行列, 割当可能なセルのマスク)（変換できなかった場合はNone）
+    error_message : str
+        入力が不正な場合のエラーメッセージ（正常なら空文字列）
+    """
+    error_message = ""
+    matrix = None
+    try:
+        numeric_matrix, allowed_mask = load_matrix(matrix_source, file_type, sparse_mode)
+        matrix = (numeric_matrix, allowed_mask)
+        # 表には整数を文字列にして載せる（割当不可のセルは空欄）
+        body = numeric_matrix.astype(str).astype(object)
+        if allowed_mask is not None:
+            body[~allowed_mask] = ''
+        # ※コスト行列には正方行列にしてから変換する→割り当て時にassignment.pyで変換すれば十分
+
+        # 行優先順位を計算
+        row_priorities = calculate_priority_ranking(numeric_matrix, matrix_type)
+
+        # 列優先順位を計算
+        column_priorities = calculate_priority_ranking(numeric_matrix.T, matrix_type)
+
+    except ImportError:
+        return None, None, "XLSXファイルを読むにはopenpyxlをインストールしてください"
+    except ValueError as e:
+        # 整数に変換できないセルがある場合は、その位置をエラーメッセージにする
+        if isinstance(e, MatrixParseError):
+            error_message = str(e)
+        else:
+            error_message = "長方形の整数のみの行列を入力してください (空は0に変換するので許容)"
+        if file_type is not None:
+            return None, None, error_message
+        # 貼り付けたテキストは、表で修正できるようにセルを文字列のまま載せる
+        body = read_text_frame(matrix_source, dtype=str).fillna('').to_numpy(dtype=object)
+        column_priorities = [''] * body.shape[1]
+        row_priorities = [''] * body.shape[0]
+
+    rows, cols = body.shape
+
+    # 行複製係数と列複製係数を追加
+    # テストデータが入力されている場合は特定の値を設定
+    if use_test_factors:
+        row_replication_factors = ['4', '1', '1', '1', '1', '7']
+        column_replication_factors = ['1', '1', '1', '1', '1', '1', '1', '1', '1', '1', '1', '1', '1', '2']
+    else:
+        row_replication_factors = ['1'] * rows
+        column_replication_factors = ['1'] * cols
+
+    # 新しい行列を作成し、元の行列を中央に配置
+    new_matrix = np.full((rows + 2, cols + 2), '', dtype=object)
+    new_matrix[1:rows + 1, 1:cols + 1] = body
+
+    # 行複製係数を左に、列複製係数を上に追加
+    new_matrix[1:rows + 1, 0] = row_replication_factors
+    new_matrix[0, 1:cols + 1] = column_replication_factors
+
+    # 行優先順位を右に、列優先順位を下に追加
+    new_matrix[1:rows + 1, cols + 1] = [str(priority) for priority in row_priorities]
+    new_matrix[rows + 1, 1:cols + 1] = [str(priority) for priority in column_priorities]
+
+    # 1列目と1行目のラベルを「複」に設定
+    new_matrix[0][0] = '複↓→'
+
+    # 最終列と最終行のラベルを「優」に設定
+    new_matrix[rows + 1][cols + 1] = '←↑優'
+
+    df = pd.DataFrame(new_matrix)
+    return df, matrix, error_message
+
+
+def read_edited_matrix(df, edited_df, matrix, sparse_mode):
+    """
+    data_editorで編集した表から行列を読む
+
+    表の形が変わっていなければ、読み込み時に変換した行列に編集されたセルだけを反映する
+    （表全体を整数に変換し直さない）。行の追加・削除で形が変わった場合は表全体を変換する。
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        data_editorに渡した表
+    edited_df : pandas.DataFrame
+        data_editorで編集した表
+    matrix : tuple or None
+        読み込み時に変換した (整数の行列, 割当可能なセルのマスク)
+    sparse_mode : bool
+        疎行列モードか
+
+    Returns
+    -------
+    numeric_matrix : numpy.ndarray
+        整数の行列
+    allowed_mask : numpy.ndarray or None
+        割当可能なセルをTrueとするブール行列（疎行列モードでなければNone）
+    """
+    rows, cols = edited_df.shape[0] - 2, edited_df.shape[1] - 2
+    edited_body = edited_df.iloc[1:rows + 1, 1:cols + 1].to_numpy(dtype=object)
+    if matrix is None or edited_df.shape != df.shape:
+        return to_numeric_matrix(pd.DataFrame(edited_body), sparse_mode)
+
+    numeric_matrix, allowed_mask = matrix
+    original_body = df.iloc[1:rows + 1, 1:cols + 1].to_numpy(dtype=object)
+    changed = np.argwhere(original_body != edited_body)
+    if len(changed) == 0:
+        return numeric_matrix, allowed_mask
+
+    # 編集されたセルだけを変換して書き戻す
+    try:
+        values, allowed = to_numeric_matrix(pd.DataFrame({0: edited_body[changed[:, 0], changed[:, 1]]}), sparse_mode)
+    except MatrixParseError as e:
+        i, j = changed[e.row]
+        raise MatrixParseError(int(i), int(j), e.value) from None
+    numeric_matrix = numeric_matrix.copy()
+    numeric_matrix[changed[:, 0], changed[:, 1]] = values[:, 0]
+    if allowed_mask is not None:
+        allowed_mask = allowed_mask.copy()
+        allowed_mask[changed[:, 0], changed[:, 1]] = allowed[:, 0]
+    return numeric_matrix, allowed_mask
+
+
 def main():
     st.title("割当計算機")
     
     # セッション状態の初期化
     if 'assignment_count' not in st.session_state:
         st.session_state.assignment_count = 0
+    if 'warm_start' not in st.session_state:
+        # 前回の求解状態（数セルだけ変えて解き直す場合に、変わった行・列だけを割り当て直す）
+        st.session_state.warm_start = WarmStart()
     
     # テスト用のボタンを追加
     if st.button("テストデータを入力", help="※テスト用"):
@@ -363,6 +495,12 @@ def main():
                               value=default_value,
                               placeholder="10 20 30 40 50\r\n10 20 30 40 50\r\n10 20 30 40 50\r\n10 20 30 40 50\r\n10 20 30 40 50"
                               )
+
+    # 大きな行列はファイルでも入力できる（アップロードされたファイルを貼り付けより優先する）
+    uploaded_file = st.file_uploader(
+        "または行列のファイルをアップロードしてください (CSV・TSV・XLSX・NPY・Parquet、見出し行なし)",
+        type=list(MATRIX_FILE_TYPES)
+    )
     
     # 行列の種類を選択（0: コスト行列, 1: 利益行列）
     matrix_type = st.radio(
@@ -373,75 +511,30 @@ def main():
         horizontal=True,
         label_visibility="collapsed"
     )
+
+    # 疎行列モード：空欄と「x」のセルを割当不可とし、割当可能なセルだけで解く
+    sparse_mode = st.checkbox("空欄と「x」のセルを割当不可にする", value=False)
         
     # エラーメッセージ
     error_message = ""
 
-    if input_matrix:
-        # 入力をパースして行列に変換
-        matrix = parse_input_matrix(input_matrix)
-        
-        # 行列の行数と列数を取得
-        rows = len(matrix)
-        cols = max(len(row) for row in matrix)
-
-        try:
-            # 空文字列を0に変換して数値に変換
-            numeric_matrix = np.array([[cell if cell != '' else 0 for cell in row] for row in matrix], dtype=int)
-            # ※コスト行列には正方行列にしてから変換する→割り当て時にassignment.pyで変換すれば十分
-
-            # 行優先順位を計算
-            row_priorities = calculate_priority_ranking(numeric_matrix, matrix_type)
-
-            # 列優先順位を計算
-            column_priorities = calculate_priority_ranking(numeric_matrix.T, matrix_type)
-
-        except ValueError as e:
-            # 数値に変換できない場合や他のエラーの場合はエラーメッセージを設定
-            error_message = "長方形の整数のみの行列を入力してください (空は0に変換するので許容)"
-            column_priorities = [''] * cols
-            row_priorities = [''] * rows
-
-        # 行複製係数と列複製係数を追加
-        # テストデータが入力されている場合は特定の値を設定
-        if st.session_state.get('test_input_matrix'):
-            row_replication_factors = ['4', '1', '1', '1', '1', '7']
-            column_replication_factors = ['1', '1', '1', '1', '1', '1', '1', '1', '1', '1', '1', '1', '1', '2']
-        else:
-            row_replication_factors = ['1'] * rows
-            column_replication_factors = ['1'] * cols
-
-        # 新しい行列を作成
-        new_matrix = [[''] * (cols + 2) for _ in range(rows + 2)]
-
-        # 元の行列を中央に配置
-        for i in range(rows):
-            for j in range(len(matrix[i])):
-                new_matrix[i + 1][j + 1] = matrix[i][j]
-
-        # 行複製係数を左に追加
-        for i in range(rows):
-            new_matrix[i + 1][0] = row_replication_factors[i]
-
-        # 列複製係数を上に追加
-        for j in range(cols):
-            new_matrix[0][j + 1] = column_replication_factors[j]
-
-        # 行優先順位を右に追加
-        for i in range(rows):
-            new_matrix[i + 1][cols + 1] = str(row_priorities[i])
-
-        # 列優先順位を下に追加
-        for j in range(cols):
-            new_matrix[rows + 1][j + 1] = str(column_priorities[j])
-
-        # 1列目と1行目のラベルを「複」に設定
-        new_matrix[0][0] = '複↓→'
-
-        # 最終列と最終行のラベルを「優」に設定
-        new_matrix[rows + 1][cols + 1] = '←↑優'
+    if uploaded_file is not None:
+        matrix_source = uploaded_file.getvalue()
+        file_type = uploaded_file.name.rsplit(".", 1)[-1].lower()
+    else:
+        matrix_source = input_matrix
+        file_type = None
+
+    # 入力が変わらない限りキャッシュした表を使う
+    df = None
+    if matrix_source:
+        df, matrix, error_message = build_editor_frame(
+            matrix_source, file_type, matrix_type, sparse_mode,
+            file_type is None and bool(st.session_state.get('test_input_matrix'))
+        )
 
-        df = pd.DataFrame(new_matrix)
+    if df is not None:
+        rows = len(df) - 2
         
         row_height = 20
         edited_df = st.data_editor(
@@ -449,7 +542,7 @@ def main():
             num_rows="dynamic",
             hide_index=True,
             use_container_width=False,
-            height=row_height * (rows + 2) + 57,
+            height=min(row_height * (rows + 2) + 57, GRID_MAX_HEIGHT),
             width=None,
             row_height=20
         )
@@ -463,22 +556,54 @@ def main():
             horizontal=True
         )
 
+        # 線形割当ソルバーを選択（munkres: 純Python, jv: NumPy, ortools: C++）
+        lsa_backend = st.radio(
+            "線形割当ソルバー",
+            options=list(LSA_BACKENDS),
+            format_func=lambda x: {"munkres": "Munkres (Python)", "jv": "JV (NumPy)", "ortools": "OR-Tools (C++)"}[x],
+            index=LSA_BACKENDS.index("ortools"),
+            horizontal=True
+        )
+
+        # 同点解の辞書式最適化エンジンを選択（cpsat: OR-Tools CP-SAT, matching: 段階ごとの最小費用マッチング）
+        tiebreak_engine = st.radio(
+            "同点解の辞書式最適化エンジン",
+            options=list(assignment.TIEBREAK_ENGINES),
+            format_func=lambda x: {"cpsat": "CP-SAT", "matching": "最小費用マッチング"}[x],
+            index=0,
+            horizontal=True
+        )
+
+        # 複製係数を展開せず、容量付きの輸送問題として解くか
+        use_transportation = st.checkbox(
+            "複製を展開せずに輸送問題として解く(複製係数が大きい場合に高速)",
+            value=False
+        )
+
+        # CP-SATの求解パラメータ（0は指定なし）
+        with st.expander("CP-SATの設定"):
+            num_workers = st.number_input("並列ワーカー数 (0: 自動)", min_value=0, value=0, step=1)
+            stage_time_limit = st.number_input("1段階あたりの制限時間[秒] (0: なし)", min_value=0.0, value=0.0, step=1.0)
+            time_limit = st.number_input("全体の制限時間[秒] (0: なし)", min_value=0.0, value=0.0, step=1.0)
+            solver_seed = st.number_input("乱数シード（同点解の選択にも使用）", min_value=0, value=0, step=1)
+            component_workers = st.number_input("独立な連結成分を並列に解くプロセス数", min_value=1, value=1, step=1)
+            # 計測は既定で無効（有効にすると段階ごとの経過時間・メモリを表示する）
+            trace_enabled = st.checkbox("処理時間とメモリを計測して表示する", value=False)
+
         if st.button("割当", use_container_width=True):
             
             # 割当ボタンが押された回数をカウント
             st.session_state.assignment_count += 1
+            solve_info = None
 
             # new_matrixをdfから設定
-            new_matrix = edited_df.values.tolist()
-            rows = len(new_matrix) - 2
-            cols = max(len(row) for row in new_matrix) - 2
+            new_matrix = edited_df.to_numpy(dtype=object)
+            rows = new_matrix.shape[0] - 2
+            cols = new_matrix.shape[1] - 2
 
             try:
-                # 行列の取得
-                numeric_matrix = [
-                    [int(new_matrix[i + 1][j + 1]) if new_matrix[i + 1][j + 1] != '' else 0 for j in range(cols)]
-                    for i in range(rows)
-                ]
+                # 行列の取得（編集されたセルだけを変換する）
+                numeric_matrix, allowed_mask = read_edited_matrix(df, edited_df, matrix, sparse_mode)
                 
                 # 行名
                 row_names = split_text_to_array(row_names_text)
@@ -503,96 +628,61 @@ def main():
                 # 列優先順位
                 column_priorities = [int(new_matrix[rows + 1][j + 1]) for j in range(cols)]
 
-                # ExpandableMatrixAndBackgroundsインスタンスを作成
-                # 複製前
-                original_matrix_info = ExpandableMatrixAndBackgrounds(row_names, column_names, row_priorities, column_priorities, numeric_matrix)
-                # 行複製
-                row_expanded_matrix_info = original_matrix_info.row_expanded(row_replication_factors)
-                # 列複製
-                column_expanded_matrix_info = original_matrix_info.column_expanded(column_replication_factors)
-                
-                # 折り畳み後の行名のために折りたたまれている複製係数を格納
-                row_expanded_matrix_info.folded_column_replication_factors = column_replication_factors
-                column_expanded_matrix_info.folded_row_replication_factors = row_replication_factors
-                
-                # 正方行列を作成しmatrix_infoに
-                square_matrix = original_matrix_info.create_square_matrix(numeric_matrix, row_replication_factors, column_replication_factors)
-                square_matrix_info = ExpandableMatrixAndBackgrounds(
-                    row_expanded_matrix_info.row_names,
-                    column_expanded_matrix_info.column_names,
-                    row_expanded_matrix_info.row_priorities,
-                    column_expanded_matrix_info.column_priorities,
-                    square_matrix,
-                    row_expanded_matrix_info.row_ids,
-                    column_expanded_matrix_info.col_ids
+                # 複製前・複製後の行列の情報（同じ入力ならキャッシュを使う）
+                original_matrix_info, expanded_matrix_info = build_expanded_problem(
+                    numeric_matrix, allowed_mask, row_names, column_names,
+                    row_priorities, column_priorities, row_replication_factors, column_replication_factors
                 )
-                
-                # matrix_info確認用
-                # row_expanded_matrix_info.show_all_members()
-                # column_expanded_matrix_info.show_all_members()
-                # original_matrix_info.show_all_members()
-                # square_matrix_info.show_all_members()
-                
-                # 割当
-                assignment_matrix, total_assignment, assignments = assignment.assign(square_matrix, square_matrix_info.row_priorities, square_matrix_info.column_priorities, priority_flg, matrix_type)
-                
-                html_table_square = create_display_html_table_content(square_matrix_info, "square", assignment_matrix)
-                html_table_row_fold = create_display_html_table_content(column_expanded_matrix_info, "row-fold")
-                html_table_column_fold = create_display_html_table_content(row_expanded_matrix_info, "column-fold")
-
-                # エラー発生時飛ばしたいのでtry文の中
-                st.markdown("<div style='text-align: center; font-size: 16px; margin: 10px 0;'>黄色のマスを割り当てていけば最適割当となります。</div>", unsafe_allow_html=True)
 
-                # 右側にHTMLラジオを配置し、表示を切り替え
-                # assignmentsをJSON文字列に変換
-                import json
-                assignments_json = json.dumps(assignments)
-                
-                # 割当回数をhtmlにセットすることで割当ボタンを押すたびにhtmlが変化して初期表示が走るようになる
-                html_table_with_radio = f"""
-                <div style='display:flex; gap:16px; align-items:flex-start; justify-content:flex-start; flex-wrap: nowrap;'>
-                  <div style='flex:1 1 auto; min-width:0; overflow:auto;'>
-                    <div id='tbl_square' data-assignments='{assignments_json}' data-assignment-count='{st.session_state.assignment_count}'>{html_table_square}
-                    </div>
-                    <div id='tbl_fold_rows' style='display:none;'>{html_table_row_fold}
-                    </div>
-                    <div id='tbl_fold_cols' style='display:none;'>{html_table_column_fold}
-                    </div>
-                  </div>
-                  <div style='width:220px; flex:0 0 220px;'>
-                    <label><input type='radio' name='display_mode_html' value='square' checked> 正方表示</label><br/>
-                    <label><input type='radio' name='display_mode_html' value='fold_rows'> 行を折りたたむ(割当操作はできません)</label><br/>
-                    <label><input type='radio' name='display_mode_html' value='fold_cols'> 列を折りたたむ(割当操作はできません)</label>
-                  </div>
-                </div>
-                """
+                # 割当
+                if use_transportation:
+                    # 同じ入力・シードの結果はキャッシュから返す（疎行列モードでは割当不可のセルを含む疎行列を渡す）
+                    assignment_matrix, total_assignment, assignments = cached_assign_replicated(original_matrix_info.sparse_matrix if sparse_mode else numeric_matrix, row_replication_factors, column_replication_factors, row_priorities, column_priorities, priority_flg, matrix_type, seed=int(solver_seed))
+                else:
+                    assignment_matrix, total_assignment, assignments, solve_info = cached_assign(
+                        expanded_matrix_info.sparse_matrix if sparse_mode else expanded_matrix_info.display_matrix, expanded_matrix_info.row_priorities, expanded_matrix_info.column_priorities, priority_flg, matrix_type,
+                        seed=int(solver_seed),
+                        backend=lsa_backend,
+                        engine=tiebreak_engine,
+                        num_workers=int(num_workers) or None,
+                        time_limit=time_limit or None,
+                        stage_time_limit=stage_time_limit or None,
+                        solver_seed=int(solver_seed),
+                        return_info=True,
+                        workers=int(component_workers),
+                        trace=trace_enabled,
+                        row_groups=expanded_matrix_info.row_ids.tolist(),
+                        col_groups=expanded_matrix_info.col_ids.tolist(),
+                        warm_start=st.session_state.warm_start
+                    )
                 
-                # html_table_tail = f"""<div style="display: flex; justify-content: center; text-align: center; margin-top: 20px; margin-right: 220px;">
-                html_table_tail = f"""<div style="display: flex; flex-direction: column; align-items: center; margin-top: 20px; margin-right: 220px;">
-                    <div style="display: flex; justify-content: center; text-align: center; margin-bottom: 10px;">
-                        <div id='sum-display' style="margin-right: 10px;">割当合計: 0</div>
-                        <div>最適割当合計: {total_assignment}</div>
-                    </div>
-                    <button onclick="resetAssignment()" style="display: block; margin: 10px auto;">割当リセット</button>
-                </div>
-                """
-
-                # script
-                html_js = get_js()
-
-                # CSSスタイルを定義
-                cell_size = 40  # セルのサイズを40pxに設定
-                html_style = get_html_style(cell_size)
-
-                # HTMLコンテンツを表示（ラジオで切替するが中身は同一）
-                components.html(html_table_with_radio + html_table_tail + html_js + html_style, height=cell_size * len(square_matrix) + 500)
-
+                # 結果はセッションに保存し、再実行のたびに解き直さず表示する
+                grid_data = create_grid_payload(
+                    original_matrix_info, row_replication_factors, column_replication_factors, assignment_matrix, assignments
+                )
+                grid_data["assignment_count"] = st.session_state.assignment_count
+                st.session_state.solve_result = {
+                    "grid_data": grid_data,
+                    "total_assignment": int(total_assignment),
+                    "solve_info": solve_info,
+                    "size": expanded_matrix_info.shape[0]
+                }
+
+            except MatrixParseError as e:
+                error_message = str(e)
             except ValueError:
                 error_message = "長方形の整数のみの行列を入力してください (空は0に変換するので許容)"
             except ReplicationFactorError:
                 error_message = "複製係数は1以上の整数を入力してください"
-            except MatrixDimensionError:
-                error_message = "行または列の複製後に正方形行列になるようにしてください (行複製係数の和と列複製係数の和を一致させてください)"
+            except (InfeasibleAssignmentError, TransportationError) as e:
+                error_message = str(e)
+            if error_message:
+                # 解けなかった場合は前回の結果を表示しない
+                st.session_state.solve_result = None
+
+        # 最後に解いた結果を表示する
+        if st.session_state.get("solve_result"):
+            show_result(st.session_state.solve_result)
 
     # エラーメッセージを表示
     if error_message:
@@ -606,12 +696,15 @@ def main():
             <li>ハンガリアンアルゴリズムとバックトラックによって割当を計算します。</li>
             <li>コスト行列の場合はコストを最小化し、利益行列の場合は利益を最大化します。</li>
             <li>下記の入力イメージを参考に、エクセルやスプレッドシートから行列をコピペしてください。</li>
+            <li>大きな行列はCSV・TSV・XLSX・NPY・Parquetのファイルをアップロードして入力することもできます。(見出し行なし、空のセルは0)</li>
             <li>複数係数を2以上に設定した場合は同じ行または列を直後に複製したものを計算します。</li>
+            <li>複製後の行数と列数が異なる場合は、少ない方の全ての行(または列)を割り当て、同点解は割り当てられる側の優先順位だけで選びます。(輸送問題として解く場合は行複製係数の和と列複製係数の和を一致させてください)</li>
             <li>優先順位の初期値は各行(または各列)の値の総和を順位化したものになっています。(コストなら小さいほど優先順位が高く、利益なら大きいほど優先順位が高い)</li>
             <li>優先順位と複製係数もエクセルやスプレッドシートからコピペで上書きできます。</li>
             <li>行を誤って追加した場合は選択してバックスペースで削除できます。</li>
             <li>テストデータを入力ボタンを使用した場合は、実使用の前にブラウザ更新をかける必要があります。</li>
             <li>割当ボタンをもう一度押すことで自動割当に戻せます。</li>
+            <li>数セルだけ変えて割当ボタンを押した場合は、前回の割当から変わった行(または列)だけを割り当て直すので、大きな行列でもすぐに計算できます。</li>
             <li>最適な割り当てが複数ある場合で、列優先の場合は、以下の規則で解を求めます。行優先の場合は行と列が逆になります。</li>
             <ol>
                 <li>優先順位の高い列グループ順に、コスト(利益の反転)の合計が小さいものから割り当てる。</li>
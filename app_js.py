@@ -1,269 +1,359 @@
 def get_js():
     return """
     <script>
+    // 見えている範囲の前後に余分に描画する行・列数（スクロール中に空白が見えないようにする）
+    const GRID_BUFFER = 8;
+
+    function escapeHtml(text) {
+        return String(text).replace(/[&<>"']/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c]));
+    }
+
+    // 見えている範囲（とその前後GRID_BUFFER行・列）のセルだけをDOMに置く表
+    // 行名・列名はスクロールしても固定し、セルのクリックはview.onCellClickに渡す
+    class VirtualGrid {
+        constructor(container, view, layout) {
+            this.container = container;
+            this.view = view;
+            this.cell = layout.cell_size;
+            this.headerWidth = layout.header_width;
+            this.headerHeight = layout.header_height;
+            this.footerSize = view.footer_size;
+            this.frame = null;
+
+            const bodyWidth = view.cols * this.cell;
+            const bodyHeight = view.rows * this.cell;
+            container.innerHTML = `
+                <div class='vg-scroller'>
+                  <div class='vg-top'>
+                    <div class='vg-corner' style='width:${this.headerWidth}px; height:${this.headerHeight}px;'></div>
+                    <div class='vg-layer vg-col-headers' style='width:${bodyWidth}px; height:${this.headerHeight}px;'></div>
+                    <div class='vg-footer-title vg-row-footer-title' style='width:${this.footerSize}px; height:${this.headerHeight}px;'>${escapeHtml(view.row_footer_title)}</div>
+                  </div>
+                  <div class='vg-middle'>
+                    <div class='vg-layer vg-row-headers' style='width:${this.headerWidth}px; height:${bodyHeight}px;'></div>
+                    <div class='vg-layer vg-body' style='width:${bodyWidth}px; height:${bodyHeight}px;'></div>
+                    <div class='vg-layer vg-row-footers' style='width:${this.footerSize}px; height:${bodyHeight}px;'></div>
+                  </div>
+                  <div class='vg-bottom'>
+                    <div class='vg-corner vg-footer-title' style='width:${this.headerWidth}px; height:${this.footerSize}px;'>${escapeHtml(view.col_footer_title)}</div>
+                    <div class='vg-layer vg-col-footers' style='width:${bodyWidth}px; height:${this.footerSize}px;'></div>
+                  </div>
+                </div>`;
+            this.scroller = container.querySelector('.vg-scroller');
+            this.body = container.querySelector('.vg-body');
+            this.colHeaders = container.querySelector('.vg-col-headers');
+            this.rowHeaders = container.querySelector('.vg-row-headers');
+            this.rowFooters = container.querySelector('.vg-row-footers');
+            this.colFooters = container.querySelector('.vg-col-footers');
+
+            this.scroller.addEventListener('scroll', () => this.invalidate());
+            this.body.addEventListener('click', event => {
+                const cell = event.target.closest('[data-i]');
+                if (cell && view.onCellClick) {
+                    view.onCellClick(parseInt(cell.dataset.i, 10), parseInt(cell.dataset.j, 10));
+                }
+            });
+            this.invalidate();
+        }
+
+        // 次の描画フレームで描き直す（同じフレーム内の複数回の更新は1回にまとめる）
+        invalidate() {
+            if (this.frame === null) {
+                this.frame = requestAnimationFrame(() => {
+                    this.frame = null;
+                    this.render();
+                });
+            }
+        }
+
+        render() {
+            // 非表示の表は表示されたときに描く
+            if (this.container.offsetParent === null) {
+                return;
+            }
+            const view = this.view;
+            const c = this.cell;
+            const top = this.scroller.scrollTop;
+            const left = this.scroller.scrollLeft;
+            const firstRow = Math.max(0, Math.floor(top / c) - GRID_BUFFER);
+            const lastRow = Math.min(view.rows, Math.ceil((top + this.scroller.clientHeight) / c) + GRID_BUFFER);
+            const firstCol = Math.max(0, Math.floor(left / c) - GRID_BUFFER);
+            const lastCol = Math.min(view.cols, Math.ceil((left + this.scroller.clientWidth) / c) + GRID_BUFFER);
+
+            const cells = [];
+            for (let i = firstRow; i < lastRow; i++) {
+                for (let j = firstCol; j < lastCol; j++) {
+                    cells.push(`<div class='vg-cell${view.onCellClick ? ' vg-clickable' : ''}' data-i='${i}' data-j='${j}' style='left:${j * c}px; top:${i * c}px; ${view.cellStyle(i, j)}'>${view.cellText(i, j)}</div>`);
+                }
+            }
+            this.body.innerHTML = cells.join('');
+
+            const rowHeaders = [];
+            const rowFooters = [];
+            for (let i = firstRow; i < lastRow; i++) {
+                rowHeaders.push(`<div class='vg-row-header' style='top:${i * c}px;'>${view.rowHeader(i)}</div>`);
+                rowFooters.push(`<div class='vg-row-footer' style='top:${i * c}px;'>${view.rowFooter(i)}</div>`);
+            }
+            this.rowHeaders.innerHTML = rowHeaders.join('');
+            this.rowFooters.innerHTML = rowFooters.join('');
+
+            const colHeaders = [];
+            const colFooters = [];
+            for (let j = firstCol; j < lastCol; j++) {
+                colHeaders.push(`<div class='vg-col-header' style='left:${j * c}px;'>${view.colHeader(j)}</div>`);
+                colFooters.push(`<div class='vg-col-footer' style='left:${j * c}px;'>${view.colFooter(j)}</div>`);
+            }
+            this.colHeaders.innerHTML = colHeaders.join('');
+            this.colFooters.innerHTML = colFooters.join('');
+        }
+    }
+
+    const gridData = JSON.parse(document.getElementById('grid-data').textContent);
+    const numRows = gridData.rows;
+    const numCols = gridData.cols;
+
+    // base64のバイト列を型付き配列にする
+    const TYPED_ARRAYS = {int8: Int8Array, int16: Int16Array, int32: Int32Array, float64: Float64Array};
+    function decodeBase64(text) {
+        const binary = atob(text);
+        const bytes = new Uint8Array(binary.length);
+        for (let k = 0; k < binary.length; k++) {
+            bytes[k] = binary.charCodeAt(k);
+        }
+        return bytes;
+    }
+    // numpy.packbitsで詰めたビット列のk番目
+    function bitAt(bits, k) {
+        return (bits[k >> 3] >> (7 - (k & 7))) & 1;
+    }
+
+    // 複製前の行列・割当不可のセル・割り当てるべきセル（展開表示で0のセル）
+    const matrix = new TYPED_ARRAYS[gridData.matrix_dtype](decodeBase64(gridData.matrix).buffer);
+    const forbiddenBits = gridData.forbidden === null ? null : decodeBase64(gridData.forbidden);
+    const zeroBits = decodeBase64(gridData.zero_mask);
+
+    // 複製係数から、展開表示の行・列ごとの複製前の番号と複製内の番号を作る
+    function expandFactors(factors) {
+        const total = factors.reduce((a, b) => a + b, 0);
+        const groupOf = new Int32Array(total);
+        const copyOf = new Int32Array(total);
+        let index = 0;
+        factors.forEach((factor, group) => {
+            for (let copy = 0; copy < factor; copy++, index++) {
+                groupOf[index] = group;
+                copyOf[index] = copy;
+            }
+        });
+        return [groupOf, copyOf];
+    }
+    const [rowGroupOf, rowCopyOf] = expandFactors(gridData.row_factors);
+    const [colGroupOf, colCopyOf] = expandFactors(gridData.col_factors);
+    // 複製後の行数・列数（行複製係数の和と列複製係数の和が異なれば長方形）
+    const expandedRows = rowGroupOf.length;
+    const expandedCols = colGroupOf.length;
+
+    // 複製後の名前は複製係数が2以上なら名前に1からの番号を付ける
+    function expandedName(names, factors, groupOf, copyOf) {
+        return index => {
+            const group = groupOf[index];
+            return factors[group] > 1 ? names[group] + (copyOf[index] + 1) : names[group];
+        };
+    }
+    // 折りたたんだ名前は名前に複製係数を添える
+    function foldedName(names, factors) {
+        return group => factors[group] > 1 ? names[group] + ' × ' + factors[group] : names[group];
+    }
+    const rowName = expandedName(gridData.row_names, gridData.row_factors, rowGroupOf, rowCopyOf);
+    const colName = expandedName(gridData.col_names, gridData.col_factors, colGroupOf, colCopyOf);
+    const foldedRowName = foldedName(gridData.row_names, gridData.row_factors);
+    const foldedColName = foldedName(gridData.col_names, gridData.col_factors);
+
+    // 割当操作
+    // 行ごとの割当列・列ごとの割当行（未割当は-1）
+    const colOfRow = new Int32Array(expandedRows).fill(-1);
+    const rowOfCol = new Int32Array(expandedCols).fill(-1);
+    let sum = 0;
+    let sumFrame = null;
+    // 折りたたんだ行・列ごとに、割り当てた相手の展開表示の列・行の番号（割り当てた順）
+    let colsOfRowGroup = new Map();
+    let rowsOfColGroup = new Map();
+
+    const FORBIDDEN_STYLE = 'background-color: #dddddd; color: #888888;';
+    const ORANGE_STYLE = 'background-color: orange;';
+
+    // 複製前の行列のセル(I, J)
+    function originalValue(I, J) {
+        return matrix[I * numCols + J];
+    }
+    function isForbidden(I, J) {
+        return forbiddenBits !== null && bitAt(forbiddenBits, I * numCols + J) === 1;
+    }
+    function cellText(I, J) {
+        return isForbidden(I, J) ? '×' : originalValue(I, J);
+    }
+
+    function result(names, vertical) {
+        return names.length ? `<span${vertical ? " class='vg-vertical'" : ''}>${escapeHtml(names.join(' '))}</span>` : '';
+    }
+
+    function groupMembers(map, group) {
+        const members = map.get(group);
+        return members === undefined ? [] : Array.from(members);
+    }
+
+    // 3つの表示はすべて複製前の行列と複製係数から作る（折りたたみ表示は初めて選ばれたときに作る）
+    const viewFactories = {
+        square: () => ({
+            rows: expandedRows,
+            cols: expandedCols,
+            footer_size: gridData.layout.cell_size,
+            row_footer_title: '行優先順位',
+            col_footer_title: '列優先順位',
+            cellText: (i, j) => cellText(rowGroupOf[i], colGroupOf[j]),
+            cellStyle: (i, j) => {
+                // 割り当てたセルはオレンジ、割り当てるべきセルは黄色にする
+                if (colOfRow[i] === j) return ORANGE_STYLE;
+                if (isForbidden(rowGroupOf[i], colGroupOf[j])) return FORBIDDEN_STYLE;
+                return bitAt(zeroBits, i * expandedCols + j) ? 'background-color: #ffffe0;' : '';
+            },
+            rowHeader: i => escapeHtml(rowName(i)),
+            colHeader: j => escapeHtml(colName(j)),
+            rowFooter: i => gridData.row_priorities[rowGroupOf[i]],
+            colFooter: j => gridData.col_priorities[colGroupOf[j]],
+            onCellClick: toggleCellColor
+        }),
+        // 行を折りたたむ表示: 行は複製前の行、列は展開表示の列
+        fold_rows: () => ({
+            rows: numRows,
+            cols: expandedCols,
+            footer_size: gridData.layout.result_size,
+            row_footer_title: '割当結果',
+            col_footer_title: '割当結果',
+            cellText: (I, j) => cellText(I, colGroupOf[j]),
+            cellStyle: (I, j) => {
+                if (rowOfCol[j] !== -1 && rowGroupOf[rowOfCol[j]] === I) return ORANGE_STYLE;
+                return isForbidden(I, colGroupOf[j]) ? FORBIDDEN_STYLE : '';
+            },
+            rowHeader: I => escapeHtml(foldedRowName(I)),
+            colHeader: j => escapeHtml(colName(j)),
+            rowFooter: I => result(groupMembers(colsOfRowGroup, I).map(colName), false),
+            colFooter: j => result(rowOfCol[j] === -1 ? [] : [gridData.row_names[rowGroupOf[rowOfCol[j]]]], true)
+        }),
+        // 列を折りたたむ表示: 行は展開表示の行、列は複製前の列
+        fold_cols: () => ({
+            rows: expandedRows,
+            cols: numCols,
+            footer_size: gridData.layout.result_size,
+            row_footer_title: '割当結果',
+            col_footer_title: '割当結果',
+            cellText: (i, J) => cellText(rowGroupOf[i], J),
+            cellStyle: (i, J) => {
+                if (colOfRow[i] !== -1 && colGroupOf[colOfRow[i]] === J) return ORANGE_STYLE;
+                return isForbidden(rowGroupOf[i], J) ? FORBIDDEN_STYLE : '';
+            },
+            rowHeader: i => escapeHtml(rowName(i)),
+            colHeader: J => escapeHtml(foldedColName(J)),
+            rowFooter: i => result(colOfRow[i] === -1 ? [] : [gridData.col_names[colGroupOf[colOfRow[i]]]], false),
+            colFooter: J => result(groupMembers(rowsOfColGroup, J).map(rowName), true)
+        })
+    };
+
+    const grids = {};
+    function ensureGrid(mode) {
+        if (!grids[mode]) {
+            grids[mode] = new VirtualGrid(document.getElementById('grid_' + mode), viewFactories[mode](), gridData.layout);
+        }
+        return grids[mode];
+    }
+    ensureGrid('square');
+
     // 表示モードの切り替え
     (function(){
       function show(mode){
-        var ids=[\"square\",\"fold_rows\",\"fold_cols\"]; ids.forEach(function(id){
-          var el=document.getElementById(\"tbl_\"+id); if(!el) return; el.style.display=(id===mode)?\"block\":\"none\";
+        var ids=["square","fold_rows","fold_cols"]; ids.forEach(function(id){
+          var el=document.getElementById("tbl_"+id); if(!el) return; el.style.display=(id===mode)?"block":"none";
         });
+        ensureGrid(mode).invalidate();
       }
-      document.querySelectorAll(\"input[name='display_mode_html']\").forEach(function(r){ r.addEventListener('change', function(e){ show(e.target.value); }); });
+      document.querySelectorAll("input[name='display_mode_html']").forEach(function(r){ r.addEventListener('change', function(e){ show(e.target.value); }); });
     })();
-    
-    // 割当操作
-    let selectedRows = new Set();
-    let selectedCols = new Set();
-    let sum = 0;
-    let originalColors = new Map();
-    let lastAssignmentCount = 0;
-    
-    // 割当結果を管理する配列（座標形式）
-    let AssignmentsForRowFold = []; // 配列 of assigned coordinates [row_id, col_id_main]
-    let AssignmentsForColumnFold = []; // 配列 of assigned coordinates [row_id, col_id_main]
-    
-    // ページ読み込み完了後に初期割当を適用
+
+    // 初期割当を適用（割当ボタンが押されるたびに実行）
     applyInitialAssignments();
-    // document.addEventListener('DOMContentLoaded', applyInitialAssignments);
-    
-    // 初期割当の適用（割当ボタンが押されるたびに実行）
+
     function applyInitialAssignments() {
-        const tblSquare = document.getElementById('tbl_square');
-        if (tblSquare && tblSquare.dataset.assignments) {
-            try {
-                
-                // まずオレンジ色をリセット
-                resetAssignment();
-                
-                const assignments = JSON.parse(tblSquare.dataset.assignments);
-                if (assignments && assignments.length > 0) {
-                    // 少し遅延させてDOMが完全に構築されるのを待つ
-                    setTimeout(function() {
-                        assignments.forEach(function(assignment) {
-                            if (assignment && assignment.length === 2) {
-                                toggleCellColor(assignment[0], assignment[1]);
-                            }
-                        });
-                    }, 100);
-                }
-                
-            } catch (e) {
-                console.error('Error parsing assignments:', e);
+        // まずオレンジ色をリセット
+        resetAssignment();
+        // 行ごとの割当列（未割当は-1）
+        const assignments = new Int32Array(decodeBase64(gridData.assignments).buffer);
+        assignments.forEach(function(j, i) {
+            if (j !== -1) {
+                toggleCellColor(i, j);
             }
-        }
+        });
     }
-    
-    // 割当リセット関数
+
+    // 割当リセット関数（割り当てたセルだけを戻す）
     function resetAssignment() {
         sum = 0;
-        selectedRows.clear();
-        selectedCols.clear();
-        AssignmentsForRowFold = [];
-        AssignmentsForColumnFold = [];
-        
-        document.querySelectorAll('td').forEach(cell => {
-            if (cell.style.backgroundColor === 'orange') {
-                cell.style.backgroundColor = originalColors.get(cell);
+        for (let i = 0; i < expandedRows; i++) {
+            if (colOfRow[i] !== -1) {
+                rowOfCol[colOfRow[i]] = -1;
+                colOfRow[i] = -1;
             }
-        });
-        
-        // 割当結果を更新するメソッドを呼び出す
+        }
+        colsOfRowGroup = new Map();
+        rowsOfColGroup = new Map();
         updateAssignmentDisplays();
-        
-        document.getElementById('sum-display').innerText = '割当合計: ' + sum;
+    }
+
+    function addMember(map, group, member) {
+        let members = map.get(group);
+        if (members === undefined) {
+            members = new Set();
+            map.set(group, members);
+        }
+        members.add(member);
     }
 
     function toggleCellColor(i, j) {
-        cell_square = document.getElementById("cell-square-" + i + "-" + j)
-        row_id = cell_square.getAttribute('row_id');
-        col_id = cell_square.getAttribute('col_id');
-        // ハイフンの前の数値を取り出す
-        let row_id_main = row_id.split('-')[0];
-        let col_id_main = col_id.split('-')[0];
-        cell_row_fold = document.querySelector(`td[id*="row-fold-"][row_id="${row_id_main}"][col_id="${col_id}"]`);
-        cell_column_fold = document.querySelector(`td[id*="column-fold-"][row_id="${row_id}"][col_id="${col_id_main}"]`);
-        // console.log(cell_row_fold);
-        // console.log(cell_column_fold);
-        let value = parseInt(cell_square.getAttribute('data-value'), 10);
+        if (isForbidden(rowGroupOf[i], colGroupOf[j])) {
+            return;
+        }
+        const value = originalValue(rowGroupOf[i], colGroupOf[j]);
 
-        // セルの色をトグル
-        if (cell_square.style.backgroundColor === 'orange') {
-            if (selectedRows.has(i)) {
-                selectedRows.delete(i);
-            }
-            if (selectedCols.has(j)) {
-                selectedCols.delete(j);
-            }
-            
-            // 座標形式で割当結果を削除
-            const coordinateRowFold = [row_id_main, j];
-            const coordinateColumnFold = [i, col_id_main];
-            
-            // 配列から該当する座標を削除
-            const indexRowFold = AssignmentsForRowFold.findIndex(coord => 
-                coord[0] === coordinateRowFold[0] && coord[1] === coordinateRowFold[1]);
-            if (indexRowFold !== -1) {
-                AssignmentsForRowFold.splice(indexRowFold, 1);
-            }
-            
-            const indexColumnFold = AssignmentsForColumnFold.findIndex(coord => 
-                coord[0] === coordinateColumnFold[0] && coord[1] === coordinateColumnFold[1]);
-            if (indexColumnFold !== -1) {
-                AssignmentsForColumnFold.splice(indexColumnFold, 1);
-            }
-            
-            cell_square.style.backgroundColor = originalColors.get(cell_square);
-            cell_row_fold.style.backgroundColor = originalColors.get(cell_row_fold);
-            cell_column_fold.style.backgroundColor = originalColors.get(cell_column_fold);
+        // セルの割当をトグル（行・列ごとの割当と折りたたみ表示の集計をそれぞれO(1)で更新する）
+        if (colOfRow[i] === j) {
+            colOfRow[i] = -1;
+            rowOfCol[j] = -1;
+            colsOfRowGroup.get(rowGroupOf[i]).delete(j);
+            rowsOfColGroup.get(colGroupOf[j]).delete(i);
             sum -= value;
         } else {
-            if (selectedRows.has(i) || selectedCols.has(j)) {
+            if (colOfRow[i] !== -1 || rowOfCol[j] !== -1) {
                 return;
             }
-            selectedRows.add(i);
-            selectedCols.add(j);
-            
-            // 座標形式で割当結果を追加
-            const coordinateRowFold = [row_id_main, j];
-            const coordinateColumnFold = [i, col_id_main];
-            
-            // 配列に座標を追加
-            AssignmentsForRowFold.push(coordinateRowFold);
-            AssignmentsForColumnFold.push(coordinateColumnFold);
-            
-            originalColors.set(cell_square, cell_square.style.backgroundColor);
-            originalColors.set(cell_row_fold, cell_row_fold.style.backgroundColor);
-            originalColors.set(cell_column_fold, cell_column_fold.style.backgroundColor);
-            cell_square.style.backgroundColor = 'orange';
-            cell_row_fold.style.backgroundColor = 'orange';
-            cell_column_fold.style.backgroundColor = 'orange';
+            colOfRow[i] = j;
+            rowOfCol[j] = i;
+            addMember(colsOfRowGroup, rowGroupOf[i], j);
+            addMember(rowsOfColGroup, colGroupOf[j], i);
             sum += value;
         }
-        
+
         // 割当結果を更新するメソッドを呼び出す
         updateAssignmentDisplays();
-        
-        document.getElementById('sum-display').innerText = '割当合計: ' + sum;
     }
-    
+
     // 割当結果表示を更新する関数
+    // 表と割当合計は次の描画フレームでまとめて描き直すので、初期割当の適用中に何度呼んでも1回分で済む
     function updateAssignmentDisplays() {
-        
-        console.log("==================");
-        console.log("割当結果");
-        console.log(AssignmentsForRowFold);
-        console.log(AssignmentsForColumnFold);
-        console.log("==================");
-        
-        // row-foldテーブルの更新
-        // 各行について割当結果を集計
-        const rowAssignments = {};
-        AssignmentsForRowFold.forEach(coordinate => {
-            const [I, J] = coordinate;
-            if (!rowAssignments[I]) {
-                rowAssignments[I] = [];
-            }
-            // 割当列に対応する列名を取得
-            const columnNameElement = document.querySelector(`th[id*="col-name-row-fold-${J}"]`);
-            if (columnNameElement) {
-                rowAssignments[I].push(columnNameElement.getAttribute('assignment_name'));
-            }
-        });
-
-        // 行割当結果を更新 (row-fold テーブル)
-        const rowFoldRowCount = document.querySelectorAll('th[id^="row-assignment-row-fold-"]').length;
-        for (let i = 0; i < rowFoldRowCount; i++) {
-            const assignmentCell = document.querySelector(`th[id="row-assignment-row-fold-${i}"]`);
-            if (assignmentCell) {
-                if (rowAssignments[i] && rowAssignments[i].length > 0) {
-                    assignmentCell.innerText = rowAssignments[i].join(' ');
-                } else {
-                    assignmentCell.innerText = '';
-                }
-            }
-        }
-        
-        // column-foldテーブルの更新
-        // 各行について割当結果を集計
-        const columnFoldRowAssignments = {};
-        AssignmentsForColumnFold.forEach(coordinate => {
-            const [I, J] = coordinate;
-            if (!columnFoldRowAssignments[I]) {
-                columnFoldRowAssignments[I] = [];
-            }
-            // 割当列に対応する列名を取得
-            const columnNameElement = document.querySelector(`th[id*="col-name-column-fold-${J}"]`);
-            if (columnNameElement) {
-                columnFoldRowAssignments[I].push(columnNameElement.getAttribute('assignment_name'));
-            }
-        });
-        
-        // 行割当結果を更新 (column-fold テーブル)
-        const columnFoldRowCount = document.querySelectorAll('th[id^="row-assignment-column-fold-"]').length;
-        for (let i = 0; i < columnFoldRowCount; i++) {
-            const assignmentCell = document.querySelector(`th[id="row-assignment-column-fold-${i}"]`);
-            if (assignmentCell) {
-                if (columnFoldRowAssignments[i] && columnFoldRowAssignments[i].length > 0) {
-                    assignmentCell.innerText = columnFoldRowAssignments[i].join(' ');
-                } else {
-                    assignmentCell.innerText = '';
-                }
-            }
-        }
-        
-        // 列に対しても同様の処理を行う
-        // 各列について割当結果を集計
-        const colAssignments = {};
-        AssignmentsForRowFold.forEach(coordinate => {
-            const [I, J] = coordinate;
-            if (!colAssignments[J]) {
-                colAssignments[J] = [];
-            }
-            // 割当行に対応する行名を取得
-            const rowNameElement = document.querySelector(`th[id*="row-name-row-fold-${I}"]`);
-            if (rowNameElement) {
-                colAssignments[J].push(rowNameElement.getAttribute('assignment_name'));
-            }
-        });
-        
-        // 列割当結果を更新 (row-fold テーブル)
-        const rowFoldColCount = document.querySelectorAll('th[id^="col-assignment-row-fold-"]').length;
-        for (let j = 0; j < rowFoldColCount; j++) {
-            const assignmentCell = document.querySelector(`th[id="col-assignment-row-fold-${j}"]`);
-            if (assignmentCell) {
-                if (colAssignments[j] && colAssignments[j].length > 0) {
-                    assignmentCell.innerText = colAssignments[j].join(' ');
-                } else {
-                    assignmentCell.innerText = '';
-                }
-            }
-        }
-        
-        // column-foldテーブルでも同様に列の処理を行う
-        const colAssignmentsColumnFold = {};
-        AssignmentsForColumnFold.forEach(coordinate => {
-            const [I, J] = coordinate;
-            if (!colAssignmentsColumnFold[J]) {
-                colAssignmentsColumnFold[J] = [];
-            }
-            const rowNameElement = document.querySelector(`th[id*="row-name-column-fold-${I}"]`);
-            if (rowNameElement) {
-                colAssignmentsColumnFold[J].push(rowNameElement.getAttribute('assignment_name'));
-            }
-        });
-        
-        // 列割当結果を更新 (column-fold テーブル)
-        const columnFoldColCount = document.querySelectorAll('th[id^="col-assignment-column-fold-"]').length;
-        for (let j = 0; j < columnFoldColCount; j++) {
-            const assignmentCell = document.querySelector(`th[id="col-assignment-column-fold-${j}"]`);
-            if (assignmentCell) {
-                if (colAssignmentsColumnFold[j] && colAssignmentsColumnFold[j].length > 0) {
-                    assignmentCell.innerText = colAssignmentsColumnFold[j].join(' ');
-                } else {
-                    assignmentCell.innerText = '';
-                }
-            }
+        Object.values(grids).forEach(grid => grid.invalidate());
+        if (sumFrame === null) {
+            sumFrame = requestAnimationFrame(() => {
+                sumFrame = null;
+                document.getElementById('sum-display').innerText = '割当合計: ' + sum;
+            });
         }
     }
     </script>
-    """
\ No newline at end of file
+    """
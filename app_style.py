@@ -1,4 +1,4 @@
-def get_html_style(cell_size):
+def get_html_style(cell_size, max_height):
     return f"""
     <style>
     /* ダークモードでも読めるように、埋め込み側で白背景・黒文字を基調にする */
@@ -6,96 +6,116 @@ def get_html_style(cell_size):
         background: #ffffff !important;
         color: #000000 !important;
     }}
-    .center-table {{
-        display: flex;
-        flex-direction: column;
-        align-items: center;
-        margin-top: 20px;
-        background: #ffffff !important;
-        color: #000000 !important;
+    /* 表全体のスクロール領域（見えている範囲のセルだけを描画する） */
+    .vg-scroller {{
+        position: relative;
+        overflow: auto;
+        max-height: {max_height}px;
+        width: max-content;
+        max-width: 100%;
+        margin: 20px auto 0 auto;
+        background: #ffffff;
+        color: #000000;
     }}
-    .table-container {{
+    .vg-top, .vg-middle, .vg-bottom {{
         display: flex;
-        align-items: center;
-        background: #ffffff !important;
-        color: #000000 !important;
+        width: max-content;
     }}
-    .vertical-label {{
-        writing-mode: vertical-rl;
-        text-orientation: upright;
-        margin-left: 10px;
-        font-weight: bold;
-        color: #000000 !important;
+    /* 列名はスクロールしても上端に固定する */
+    .vg-top {{
+        position: sticky;
+        top: 0;
+        z-index: 2;
     }}
-    .horizontal-label {{
-        text-align: center; 
-        font-weight: bold; 
-        color: #000000 !important;
+    /* 四隅のセル */
+    .vg-corner {{
+        position: sticky;
+        left: 0;
+        z-index: 3;
+        flex: none;
+        background: #ffffff;
     }}
-    .no-border-table, .no-border-table tr {{
-        border: none;
+    .vg-layer {{
+        position: relative;
+        flex: none;
+        overflow: hidden;
     }}
-    table {{
-        border-collapse: collapse;
-        table-layout: auto;  /* fixedからautoに変更 */
-        width: max-content;  /* 内容に合わせて自動調整 */
-        background: #ffffff; /* デフォルト白（インライン指定があればそちら優先） */
-        color: #000000;
+    /* 行名はスクロールしても左端に固定する */
+    .vg-row-headers {{
+        position: sticky;
+        left: 0;
+        z-index: 1;
+        background: #ffffff;
     }}
-     /* 割り当て結果セル専用のスタイル */
-     th[id*="row-assignment"] {{
-         height: {cell_size}px;
-         overflow: visible;    /* 内容をすべて表示 */
-         white-space: nowrap;  /* 改行を防ぐ */
-         border: 1px solid #000;
-         text-overflow: ellipsis;  /* 超過した部分を省略記号で表示 */
-         text-align: left !important;  /* 左づめに設定 */
-         padding-left: 4px;  /* 左側にパディングを追加 */
-     }}
-    /* 割り当て結果セル専用のスタイル */
-    th[id*="col-assignment"] {{
-        width: {cell_size}px;
-        white-space: normal;  /* 改行を許可 */
-        word-wrap: break-word; /* 長い単語を改行 */
-        overflow: visible;    /* 内容をすべて表示 */
-        border: 1px solid #000;
+    .vg-col-headers {{
+        background: #ffffff;
     }}
-    /* 通常のヘッダーセル（列名・行名）のスタイル */
-    th:not([id*="assignment"]) {{
-        max-width: 160px;  /* 最大幅を80pxに設定 */
-        overflow: hidden;  /* 超過した部分を隠す */
-        white-space: nowrap;  /* 改行を防ぐ */
-        text-overflow: clip;  /* 超過した部分を切り取る */
+    .vg-cell, .vg-row-header, .vg-col-header, .vg-row-footer, .vg-col-footer {{
+        position: absolute;
+        box-sizing: border-box;
         border: 1px solid #000;
-    }}
-    td {{
-        width: {cell_size}px;
-        height: {cell_size}px;
-        text-align: center !important;
         overflow: hidden;
         white-space: nowrap;
-        border: 1px solid #000;
     }}
-    .priority-text {{
+    .vg-cell {{
+        width: {cell_size + 1}px;
+        height: {cell_size + 1}px;
+        line-height: {cell_size - 2}px;
         text-align: center;
-        font-weight: bold;
     }}
-    .row-priority {{
-        writing-mode: horizontal-tb;
+    .vg-clickable {{
+        cursor: pointer;
+    }}
+    /* 行名・列名は薄い青色にし、列名は縦書きで上から下に表示する */
+    .vg-row-header {{
+        left: 0;
+        width: 100%;
+        height: {cell_size + 1}px;
+        line-height: {cell_size - 2}px;
+        padding: 0 4px;
+        background-color: #d3f9f9;
+    }}
+    .vg-col-header {{
+        top: 0;
+        width: {cell_size + 1}px;
+        height: 100%;
+        padding: 4px 0;
+        writing-mode: vertical-lr;
+        text-align: start;
+        line-height: {cell_size - 2}px;
+        background-color: #d3f9f9;
+    }}
+    /* 優先順位・割当結果は薄緑色にする */
+    .vg-row-footer {{
+        left: 0;
+        width: 100%;
+        height: {cell_size + 1}px;
+        line-height: {cell_size - 2}px;
+        padding: 0 4px;
+        background-color: #ccffcc;
+    }}
+    .vg-col-footer {{
+        top: 0;
+        width: {cell_size + 1}px;
+        height: 100%;
+        text-align: center;
+        background-color: #ccffcc;
+    }}
+    .vg-vertical {{
+        writing-mode: vertical-lr;
+        white-space: normal;
+        line-height: {cell_size - 2}px;
+    }}
+    .vg-footer-title {{
+        box-sizing: border-box;
+        flex: none;
+        padding: 4px;
+        font-weight: bold;
+        background: #ffffff;
     }}
-    .column-priority {{
+    .vg-row-footer-title {{
         writing-mode: vertical-rl;
         text-orientation: upright;
-        height: 100px;
-    }}
-    /* 四隅のセルのスタイルを変更 */
-    .no-border-table .corner-cell {{
-        background-color: transparent;  /* 背景色を無しにする */
-        contenteditable: false !important;
-        border-top: none;
-        border-bottom: none;
-        border-right: none;
-        border-left: none;
     }}
     </style>
     """
@@ -1,17 +1,89 @@
 import numpy as np
+import concurrent.futures
+import logging
 import random
-import ExtendedMunkres
+import time
 from munkres import make_cost_matrix
 from ortools.sat.python import cp_model
+from lsa_backends import solve_lsa, solve_sparse
+from lexicographic_matching import optimize_by_matching
+from optimal_edges import optimal_edge_cells, matching_components
+from instrumentation import Trace
+from sparse_matrix import SparseMatrix
 
-def assign(original_matrix, row_priorities, col_priorities, priority_flag, matrix_type):
+logger = logging.getLogger(__name__)
+
+# 選択可能な辞書式最適化エンジン
+TIEBREAK_ENGINES = ("cpsat", "matching")
+
+class SolveBudget:
+    """
+    CP-SATの求解パラメータと時間予算を管理し、各段階の求解結果を記録するクラス
+    """
+    def __init__(self, num_workers=None, time_limit=None, stage_time_limit=None, solver_seed=None, trace=None):
+        self.num_workers = num_workers
+        self.stage_time_limit = stage_time_limit
+        self.solver_seed = solver_seed
+        self.deadline = None if time_limit is None else time.monotonic() + time_limit
+        self.stages = []
+        # 段階ごとの経過時間・メモリの記録（計測しない場合も無効なTraceを持つ）
+        self.trace = Trace() if trace is None else trace
+
+    def configure(self, solver):
+        """
+        ワーカー数とシードをソルバーに設定する
+        """
+        if self.num_workers is not None:
+            solver.parameters.num_workers = self.num_workers
+        if self.solver_seed is not None:
+            solver.parameters.random_seed = self.solver_seed
+
+    def next_time_limit(self):
+        """
+        次の段階に使える時間（秒）を返す。制限がなければNone、予算切れなら0
+        """
+        limits = []
+        if self.stage_time_limit is not None:
+            limits.append(self.stage_time_limit)
+        if self.deadline is not None:
+            limits.append(max(0.0, self.deadline - time.monotonic()))
+        return min(limits) if limits else None
+
+    def record(self, status, gap):
+        """
+        段階ごとの状態（"OPTIMAL", "FEASIBLE", "SKIPPED"）と相対ギャップを記録する
+        """
+        self.stages.append({"status": status, "gap": gap})
+
+    def summary(self):
+        """
+        全段階の結果をまとめる。最適でない最初の段階の状態とギャップを全体の結果とする
+        """
+        for stage in self.stages:
+            if stage["status"] != "OPTIMAL":
+                return {"status": "FEASIBLE", "gap": stage["gap"], "stages": self.stages, "trace": self.trace.summary()}
+        return {"status": "OPTIMAL", "gap": 0.0, "stages": self.stages, "trace": self.trace.summary()}
+
+# 辞書式最適化の途中で定義域から除いたセルの印（割当可能な0と区別する）
+PRUNED_CELL = -1
+
+# 重み付き単一目的にまとめる場合の目的関数値の上限（CP-SATが厳密に扱える範囲）
+MAX_SCALARIZED_OBJECTIVE = 2**53
+
+def assign(original_matrix, row_priorities, col_priorities, priority_flag, matrix_type, backend="munkres", scalarize=False, engine="cpsat",
+           num_workers=None, time_limit=None, stage_time_limit=None, solver_seed=None, return_info=False, workers=1,
+           row_groups=None, col_groups=None, seed=None, trace=False, warm_start=None):
     """
     優先順位の高い順から元の行列でより高い値を割り当てる
 
     Parameters:
     -----------
-    original_matrix : numpy.ndarray
-        元の行列
+    original_matrix : numpy.ndarray or sparse_matrix.SparseMatrix
+        元の行列。SparseMatrixの場合、含まれないセルは割当不可として扱い、
+        backendによらず割当可能なセルだけを辺とする疎な線形割当ソルバーで解く
+        （完全な割当が存在しなければlsa_backends.InfeasibleAssignmentErrorを送出する）
+        行数と列数が異なる場合は、少ない側の全ての行（または列）を別々の列（または行）に割り当て、
+        優先順位による同点解の選択も全て割り当てられる側の優先順位だけで行う
     col_priorities : list[int]
         列ごとの優先順位
     row_priorities : list[int]
@@ -20,135 +92,659 @@ def assign(original_matrix, row_priorities, col_priorities, priority_flag, matri
         優先順位のフラグ（0: 行優先, 1: 列優先）
     matrix_type : int
         行列の種類(0ならコスト行列、1なら利益行列)
+    backend : str
+        線形割当ソルバー（lsa_backends.LSA_BACKENDSのいずれか）
+    scalarize : bool
+        Trueなら辞書式順序を保つ整数重みで全段階を1回の求解にまとめる
+        （重みが大きくなりすぎる場合は段階的な求解に戻る）。段階的な求解の方が速い問題が
+        あるため既定はFalse
+    engine : str
+        同点解の辞書式最適化エンジン（TIEBREAK_ENGINESのいずれか）
+        "cpsat"はOR-Tools CP-SAT、"matching"は段階ごとの最小費用完全マッチング
+    num_workers : int or None
+        CP-SATの並列ワーカー数（Noneならソルバーの既定値）
+    time_limit : float or None
+        CP-SATの全段階合計の制限時間（秒）
+    stage_time_limit : float or None
+        CP-SATの1段階あたりの制限時間（秒）
+    solver_seed : int or None
+        CP-SATの乱数シード
+    return_info : bool
+        Trueなら求解状態（status, gap, 段階ごとの結果）の辞書も返す
+    workers : int
+        独立な連結成分を並列に解くプロセス数（1なら逐次）
+    row_groups : list or None
+        行ごとの複製元の識別子（同じ行を複製した行は同じ値）。Noneなら内容が同一の行を複製とみなす
+    col_groups : list or None
+        列ごとの複製元の識別子。Noneなら内容が同一の列を複製とみなす
+    seed : int or None
+        同点解をランダムに選ぶ行・列シャッフルの乱数シード（Noneならグローバルな乱数を使う）
+    trace : bool or instrumentation.Trace
+        Trueなら段階ごとの経過時間・メモリとモデルの大きさを計測し、solve_infoの"trace"に入れる
+        （Trace(True, memory=False)を渡すと時間だけを測る）
+    warm_start : warm_start.WarmStart or None
+        前回の求解状態。渡すと正方の密行列の問題では前回から変わった行・列だけを割り当て直し、
+        入力が前回と同じ連結成分の辞書式最適化を省く（今回の状態に書き換える）
 
     Returns:
     --------
+    assignment_matrix : numpy.ndarray or sparse_matrix.SparseMatrix
+        割り当てるべきセルを0とする行列（original_matrixがSparseMatrixなら、同じセルだけを持つ疎行列）
+    total_assignment : int
+        割当利益またはコストの総和
     assignments : list
         割り当てのリスト [(row, col), ...]
+    solve_info : dict
+        return_infoがTrueの場合のみ。制限時間で打ち切った場合は status="FEASIBLE" と
+        最適でない最初の段階の相対ギャップが入る
     """
+    if isinstance(original_matrix, SparseMatrix):
+        num_rows, num_cols = original_matrix.shape
+    else:
+        num_rows = len(original_matrix)
+        num_cols = len(original_matrix[0]) if num_rows > 0 else 0
+    if num_rows > num_cols:
+        # 行数が列数より多い場合は、転置して全ての列を割り当てる問題として解き、結果を転置して戻す
+        transposed_matrix = original_matrix.transpose() if isinstance(original_matrix, SparseMatrix) else np.asarray(original_matrix).T
+        transposed_assignment_matrix, total_assignment, transposed_assignments, *solve_info = assign(
+            transposed_matrix, col_priorities, row_priorities, 1 - priority_flag, matrix_type, backend, scalarize, engine,
+            num_workers, time_limit, stage_time_limit, solver_seed, return_info, workers,
+            col_groups, row_groups, seed, trace, warm_start
+        )
+        assignments = sorted((row, col) for col, row in transposed_assignments)
+        if isinstance(transposed_assignment_matrix, SparseMatrix):
+            return (transposed_assignment_matrix.transpose(), total_assignment, assignments, *solve_info)
+        return (transposed_assignment_matrix.T, total_assignment, assignments, *solve_info)
+
     assignments = []
-    m = ExtendedMunkres.ExtendedMunkres()
+    budget = SolveBudget(num_workers, time_limit, stage_time_limit, solver_seed, trace if isinstance(trace, Trace) else Trace(trace))
+    tracer = budget.trace
+
+    if isinstance(original_matrix, SparseMatrix):
+        sparse_matrix = original_matrix
+        rows, cols, values = sparse_matrix.rows, sparse_matrix.cols, sparse_matrix.values
+        with tracer.phase("コスト行列への変換"):
+            if matrix_type == 1 and sparse_matrix.nnz > 0:
+                values = values.max() - values
+            sparse_costs = SparseMatrix(sparse_matrix.shape, rows, cols, values)
 
-    # 利益行列をコスト行列に変換
-    if matrix_type == 1:
-        print("利益行列をコスト行列に変換")
-        cost_matrix = make_cost_matrix(original_matrix)
+        with tracer.phase(f"線形割当 (sparse, {sparse_matrix.nnz}セル)"):
+            result, reduced_costs, column_slack = solve_sparse(sparse_costs, return_column_slack=True)
     else:
-        cost_matrix = original_matrix
-        print(cost_matrix)
+        # 利益行列をコスト行列に変換
+        with tracer.phase("コスト行列への変換"):
+            if matrix_type == 1:
+                logger.debug("利益行列をコスト行列に変換")
+                if isinstance(original_matrix, np.ndarray):
+                    # NumPy配列ならセルごとのループをせずに変換する
+                    cost_matrix = original_matrix.max() - original_matrix if original_matrix.size else original_matrix
+                else:
+                    cost_matrix = make_cost_matrix(original_matrix)
+            else:
+                cost_matrix = original_matrix
+
+        if warm_start is not None and num_rows == num_cols:
+            # 前回の最適割当と双対変数から、変わった行・列だけを割り当て直す
+            with tracer.phase(f"線形割当 ({backend}, 前回の状態から修復)"):
+                result, original_assignment_matrix = warm_start.solve_lsa(original_matrix, cost_matrix, backend)
+                column_slack = None
+            logger.debug("修復した行・列の数: %s", warm_start.repaired)
+        else:
+            with tracer.phase(f"線形割当 ({backend})"):
+                result, original_assignment_matrix, column_slack = solve_lsa(cost_matrix, backend, return_column_slack=True)
 
-    result = m.compute(cost_matrix)
-    original_assignment_matrix = m.get_internal_C()
+    # 行数が列数より少ない場合、余裕が正の列は全ての最適割当で割り当てられ、それ以外の列は残せる
+    # （正方の場合はNoneで、全ての列が割り当てられる）
+    required_cols = None if column_slack is None else column_slack > 0
     
+    # 被約費用0でも、どの最適割当にも現れないセルは割当可能から外す
+    # 選択肢が1つだけになった行・列は、そのセルに固定される
+    # 疎行列モードでは割当可能なセルの配列のまま扱い、割当可能行列も同じセルだけを持つ疎行列で返す
+    with tracer.phase("最適辺の抽出"):
+        if isinstance(original_matrix, SparseMatrix):
+            zero_cells = np.flatnonzero(reduced_costs == 0)
+            zero_rows, zero_cols = rows[zero_cells], cols[zero_cells]
+        else:
+            original_assignment_matrix = np.array(original_assignment_matrix)
+            zero_rows, zero_cols = np.nonzero(original_assignment_matrix == 0)
+        optimal = optimal_edge_cells((num_rows, num_cols), zero_rows, zero_cols, result, None if required_cols is None else ~required_cols)
+        if isinstance(original_matrix, SparseMatrix):
+            reduced_costs = reduced_costs.copy()
+            reduced_costs[zero_cells[~optimal]] = PRUNED_CELL
+            original_assignment_matrix = SparseMatrix(sparse_matrix.shape, rows, cols, reduced_costs)
+            optimal_costs = sparse_costs.values[zero_cells[optimal]]
+        else:
+            original_assignment_matrix[zero_rows[~optimal], zero_cols[~optimal]] = PRUNED_CELL
+            optimal_costs = np.asarray(cost_matrix)[zero_rows[optimal], zero_cols[optimal]]
+        optimal_rows, optimal_cols = zero_rows[optimal], zero_cols[optimal]
+    logger.debug("割当可能なセル数: %d -> %d", len(optimal), int(optimal.sum()))
+
     # 割当利益orコストの総和を計算
-    total_assignment = 0
-    for (i, j) in result:
-        total_assignment += original_matrix[i][j]
+    if isinstance(original_matrix, SparseMatrix):
+        assigned_col = np.empty(num_rows, dtype=np.int64)
+        for (i, j) in result:
+            assigned_col[i] = j
+        total_assignment = sparse_matrix.values[cols == assigned_col[rows]].sum()
+    else:
+        total_assignment = 0
+        for (i, j) in result:
+            total_assignment += original_matrix[i][j]
     # 優先順位に基づいて割り当てを行う
-    one_side = len(cost_matrix)
+    with tracer.phase("シャッフル"):
+        # ランダムな行置換と列置換を生成
+        row_permutation = list(range(num_rows))
+        col_permutation = list(range(num_cols))
+        rng = random if seed is None else random.Random(seed)
+        rng.shuffle(row_permutation)
+        rng.shuffle(col_permutation)
+        inverse_row_permutation = np.empty(num_rows, dtype=np.int64)
+        inverse_row_permutation[row_permutation] = np.arange(num_rows)
+        inverse_col_permutation = np.empty(num_cols, dtype=np.int64)
+        inverse_col_permutation[col_permutation] = np.arange(num_cols)
 
-    # ランダムな行置換と列置換を生成
-    row_permutation = list(range(one_side))
-    col_permutation = list(range(one_side))
-    random.shuffle(row_permutation)
-    random.shuffle(col_permutation)
-    
-    print(f"=== シャッフル情報 ===")
-    print(f"元の行順序: {list(range(one_side))}")
-    print(f"新しい行順序: {row_permutation}")
-    print(f"元の列順序: {list(range(one_side))}")
-    print(f"新しい列順序: {col_permutation}")
-    
-    # 各変数に同じ対応でシャッフルを適用（置換を同時に適用）
-    # cost_matrixの行と列を同時にシャッフル
-    cost_matrix = [[cost_matrix[row_permutation[i]][col_permutation[j]] for j in range(one_side)] for i in range(one_side)]
-    print(cost_matrix[0][0])
-    
-    # assignment_matrixの行と列を同時にシャッフル
-    assignment_matrix = [[original_assignment_matrix[row_permutation[i]][col_permutation[j]] for j in range(one_side)] for i in range(one_side)]
-    
-    # row_prioritiesをシャッフル
-    row_priorities = [row_priorities[row_permutation[i]] for i in range(one_side)]
-    
-    # col_prioritiesをシャッフル
-    col_priorities = [col_priorities[col_permutation[j]] for j in range(one_side)]
-
-    print(f"=== シャッフル後の情報 ===")
-    print(f"シャッフル後のcost_matrix:")
-    for i, row in enumerate(cost_matrix):
-        print(f"  行{i}: {row}")
-    print(f"シャッフル後のassignment_matrix:")
-    for i, row in enumerate(assignment_matrix):
-        print(f"  行{i}: {row}")
-    print(f"シャッフル後のrow_priorities: {row_priorities}")
-    print(f"シャッフル後のcol_priorities: {col_priorities}")
-    print(f"=========================")
-    
-    # OR-Toolsによる最適化
-    # assignment_matrix: 0が割当可能
-    
-    # OR-Tools CP-SATモデルの設定
-    model = cp_model.CpModel()
-    
-    # 変数定義：各行に対してどの列に割り当てるかを決定
-    row_vars = []
-    for row in range(one_side):
-        available_cols = [col for col in range(one_side) 
-                         if assignment_matrix[row][col] == 0]
-        var = model.NewIntVarFromDomain(
-            cp_model.Domain.FromValues(available_cols), 
-            f'row_{row}'
+        # 割当可能なセルだけを、行と列を同時にシャッフルした行ごとの {列: コスト} にする
+        # （以降の辞書式最適化の計算量とメモリは割当可能なセル数に比例する）
+        shuffled_rows = inverse_row_permutation[optimal_rows]
+        shuffled_cols = inverse_col_permutation[optimal_cols]
+        order = np.lexsort((shuffled_cols, shuffled_rows))
+        cell_costs = [{} for _ in range(num_rows)]
+        for row, col, cost in zip(shuffled_rows[order].tolist(), shuffled_cols[order].tolist(), optimal_costs[order].tolist()):
+            cell_costs[row][col] = cost
+
+        # row_prioritiesをシャッフル
+        row_priorities = [row_priorities[row_permutation[i]] for i in range(num_rows)]
+        
+        # col_prioritiesをシャッフル
+        col_priorities = [col_priorities[col_permutation[j]] for j in range(num_cols)]
+
+        if required_cols is not None:
+            required_cols = [bool(required_cols[col_permutation[j]]) for j in range(num_cols)]
+
+    with tracer.phase("対称性の同値類"):
+        # 複製された行・列（コストも優先順位も同一）の対称性をCP-SATに伝えるための同値類
+        row_classes = make_symmetry_classes(
+            cell_costs, row_priorities,
+            None if row_groups is None else [row_groups[row_permutation[i]] for i in range(num_rows)]
         )
-        row_vars.append(var)
-        # print(f'row_{row}: {available_cols}')
-    
-    # 制約：各行は異なる列に割り当てられる（全単射）
-    model.AddAllDifferent(row_vars)
+        # 割り当てずに残る列がある場合、列の入れ替えでは割当の有無も入れ替わるので列の対称性は使わない
+        col_classes = None if required_cols is not None else make_symmetry_classes(
+            transpose_cells(cell_costs, num_cols), col_priorities,
+            None if col_groups is None else [col_groups[col_permutation[j]] for j in range(num_cols)]
+        )
+
+    # 行列全体の書式化は重いので、デバッグログが有効な場合だけ行う
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("新しい行順序: %s", row_permutation)
+        logger.debug("新しい列順序: %s", col_permutation)
+        logger.debug("シャッフル後の割当可能なセル:\n%s", "\n".join(f"  行{i}: {row}" for i, row in enumerate(cell_costs)))
+        logger.debug("シャッフル後のrow_priorities: %s", row_priorities)
+        logger.debug("シャッフル後のcol_priorities: %s", col_priorities)
     
     # 3. 辞書式最適化の実装
+    # 線形割当ソルバーの最適解は割当可能なセルだけを使うので、最初の解（ヒント）に使う
+    lsa_col_of_row = dict(result)
+    current_solution = [(i, int(inverse_col_permutation[lsa_col_of_row[row_permutation[i]]])) for i in range(num_rows)]
 
-    # priority_flgに基づいて最適化の順序を決定
-    if priority_flag == 0:  # 行優先
-        print("=== 行優先モード ===")
-        # 第1優先: 行優先順位に基づく最小化
-        current_solution = optimize_by_row_priorities(model, row_vars, row_priorities, assignment_matrix, cost_matrix, "第1優先")
-        
-        # 第2優先: 列優先順位に基づく最小化
-        if current_solution:
-            current_solution = optimize_by_column_priorities(model, row_vars, col_priorities, assignment_matrix, cost_matrix, "第2優先")
-    else:  # 列優先
-        print("=== 列優先モード ===")
-        # 第1優先: 列優先順位に基づく最小化
-        current_solution = optimize_by_column_priorities(model, row_vars, col_priorities, assignment_matrix, cost_matrix, "第1優先")
-        
-        # 第2優先: 行優先順位に基づく最小化
-        if current_solution:
-            current_solution = optimize_by_row_priorities(model, row_vars, row_priorities, assignment_matrix, cost_matrix, "第2優先")
+    # 割り当てずに残る列がある場合、同点解は全て割り当てられる行の優先順位だけで選ぶ
+    stage_col_priorities = col_priorities if required_cols is None else None
+
+    # 割当可能なセルのグラフが連結成分に分かれる場合は、成分ごとに独立に辞書式最適化する
+    # （各グループの値は成分ごとの値の和なので、成分ごとの辞書式最適解を合わせると全体の辞書式最適解になる）
+    # 疎行列モードではmatchingエンジンの各段階も割当可能なセルだけを辺として解く（backendはNone）
+    current_solution = optimize_by_components(
+        engine, None if isinstance(original_matrix, SparseMatrix) else backend, cell_costs, num_cols, row_priorities, stage_col_priorities, priority_flag,
+        current_solution, scalarize, budget, workers, row_classes, col_classes, required_cols, warm_start
+    )
     
     # 最終解
     if current_solution:
         assignments = current_solution
-        print(f"=== 最終解の変換過程 ===")
-        print(f"最終的な制約：{model.Proto().constraints}")
-        print(f"最終解（シャッフル後）: {assignments}")
+        logger.debug("最終解（シャッフル後）: %s", assignments)
         
         # assignmentsを元の順序に戻す
-        original_assignments = []
         # ロジック：置換後のn番目の値は元の行列のσ(n)番目の値が入っている→その値はどこからきたか→元の行列のσ(n)番目の値が来ている
         # よって単にσ(n)に戻せばいいのであって、逆置換は必要ない
-        for i, (row, col) in enumerate(assignments):
-            # シャッフルされた座標から元の座標に変換
-            original_row = row_permutation[row]
-            original_col = col_permutation[col]
-            original_assignments.append((original_row, original_col))
-            print(f"  割当{i}: ({row}, {col}) <- ({original_row}, {original_col})")
-        
-        assignments = original_assignments
-        print(f"最終解（元の順序）: {assignments}")
-        print(f"===================")
+        with tracer.phase("元の順序への復元"):
+            assignments = [(row_permutation[row], col_permutation[col]) for row, col in assignments]
+        logger.debug("最終解（元の順序）: %s", assignments)
  
+    tracer.stop()
+    if return_info:
+        return original_assignment_matrix, total_assignment, assignments, budget.summary()
     return original_assignment_matrix, total_assignment, assignments
 
+def make_stage_groups(row_priorities, col_priorities, priority_flag):
+    """
+    priority_flagに基づいて辞書式最適化の段階を並べる関数
+    Parameters
+    ----------
+    row_priorities : list[int]
+        行優先順位リスト
+    col_priorities : list[int] or None
+        列優先順位リスト（Noneなら列の段階を置かない）
+    priority_flag : int
+        優先順位のフラグ（0: 行優先, 1: 列優先）
+    Returns
+    -------
+    stage_groups : list
+        (0: 行 / 1: 列, グループのインデックスリスト) のリスト
+    """
+    row_stage_groups = [(0, rows) for _, rows in make_sorted_priority_groups(row_priorities)]
+    if col_priorities is None:
+        return row_stage_groups
+    col_stage_groups = [(1, cols) for _, cols in make_sorted_priority_groups(col_priorities)]
+    if priority_flag == 0:
+        return row_stage_groups + col_stage_groups
+    return col_stage_groups + row_stage_groups
+def solve_component(engine, backend, cell_costs, num_cols, row_priorities, col_priorities, priority_flag, current_solution, scalarize, budget,
+                    row_classes=None, col_classes=None, required_cols=None):
+    """
+    1つの連結成分について辞書式最適化を行う関数（プロセスプールからも呼び出す）
+    Parameters
+    ----------
+    engine : str
+        辞書式最適化エンジン（TIEBREAK_ENGINESのいずれか）
+    backend : str or None
+        matchingエンジンで使う線形割当ソルバー（Noneなら割当可能なセルだけを辺として解く）
+    cell_costs : list[dict]
+        成分内の行ごとの {列: コスト}（割当可能なセルだけを持つ）
+    num_cols : int
+        成分内の列数
+    row_priorities : list[int]
+        成分内の行優先順位リスト
+    col_priorities : list[int] or None
+        成分内の列優先順位リスト（Noneなら列の段階を置かない）
+    priority_flag : int
+        優先順位のフラグ（0: 行優先, 1: 列優先）
+    current_solution : list
+        成分内の初期解（ヒント）
+    scalarize : bool
+        Trueなら重み付き単一目的で1回だけ解く
+    budget : SolveBudget
+        求解パラメータと時間予算
+    row_classes : list or None
+        成分内の行の対称性の同値類
+    col_classes : list or None
+        成分内の列の対称性の同値類
+    required_cols : list[bool] or None
+        成分内の列ごとに、必ず割り当てる列ならTrue（Noneなら全ての列を割り当てる）
+    Returns
+    -------
+    current_solution : list or None
+        成分内の最適解のリスト
+    stages : list
+        budgetに記録された段階ごとの結果
+    phases : list
+        budget.traceに記録された経過時間・メモリ
+    models : list
+        budget.traceに記録されたモデルの大きさ
+    """
+    stage_groups = make_stage_groups(row_priorities, col_priorities, priority_flag)
+    if engine == "matching":
+        logger.debug("最小費用マッチングによる辞書式最適化")
+        with budget.trace.phase(f"最小費用マッチング ({len(stage_groups)}段階)"):
+            current_solution = optimize_by_matching(stage_groups, cell_costs, num_cols, current_solution, backend, required_cols)
+    else:
+        current_solution = optimize_by_cpsat(cell_costs, num_cols, row_priorities, col_priorities, priority_flag, stage_groups, current_solution, scalarize, budget,
+                                             row_classes, col_classes, required_cols)
+    return current_solution, budget.stages, budget.trace.phases, budget.trace.models
+def _solve_component_task(task):
+    """プロセスプール用にsolve_componentの引数をまとめて受け取る"""
+    return solve_component(*task)
+def optimize_by_components(engine, backend, cell_costs, num_cols, row_priorities, col_priorities, priority_flag, current_solution, scalarize, budget, workers=1,
+                           row_classes=None, col_classes=None, required_cols=None, warm_start=None):
+    """
+    割当可能なセルの二部グラフを連結成分に分け、成分ごとに辞書式最適化を行う関数
+
+    行・列が1つずつの成分は割当が決まっているので解かない。
+    warm_startに入力が同じ成分の前回の最適解があれば、その成分も解かずに再利用する。
+    workersが2以上で解くべき成分が複数ある場合はプロセスプールで並列に解く。
+    Parameters
+    ----------
+    engine : str
+        辞書式最適化エンジン（TIEBREAK_ENGINESのいずれか）
+    backend : str or None
+        matchingエンジンで使う線形割当ソルバー（Noneなら割当可能なセルだけを辺として解く）
+    cell_costs : list[dict]
+        行ごとの {列: コスト}（割当可能なセルだけを持つ）
+    num_cols : int
+        列数
+    row_priorities : list[int]
+        行優先順位リスト
+    col_priorities : list[int] or None
+        列優先順位リスト（Noneなら列の段階を置かない）
+    priority_flag : int
+        優先順位のフラグ（0: 行優先, 1: 列優先）
+    current_solution : list
+        割当可能なセルだけを使う全ての行の割当（ヒント）
+    scalarize : bool
+        Trueなら重み付き単一目的で1回だけ解く
+    budget : SolveBudget
+        求解パラメータと時間予算（各成分の結果もここに記録する）
+    workers : int
+        並列に解くプロセス数
+    row_classes : list or None
+        行の対称性の同値類（複製された行は同じ成分に入る）
+    col_classes : list or None
+        列の対称性の同値類
+    required_cols : list[bool] or None
+        列ごとに、必ず割り当てる列ならTrue（Noneなら全ての列を割り当てる）
+    warm_start : warm_start.WarmStart or None
+        前回の成分ごとの最適解（今回最適性を証明できた成分の解に置き換える）
+    Returns
+    -------
+    current_solution : list or None
+        最適解のリスト、解が見つからない場合はNone
+    """
+    cell_rows = np.repeat(np.arange(len(cell_costs), dtype=np.int64), [len(row_costs) for row_costs in cell_costs])
+    cell_cols = np.fromiter((col for row_costs in cell_costs for col in row_costs), dtype=np.int64, count=len(cell_rows))
+    row_component, col_component = matching_components((len(cell_costs), num_cols), cell_rows, cell_cols, current_solution)
+    col_of_row = dict(current_solution)
+
+    components = {}
+    for row in range(len(cell_costs)):
+        components.setdefault(row_component[row], []).append(row)
+    component_cols = {}
+    for col, component in enumerate(col_component.tolist()):
+        component_cols.setdefault(component, []).append(col)
+
+    final_solution = {}
+    tasks = []
+    task_indices = []
+    for component, rows in components.items():
+        cols = component_cols[component]
+        if len(rows) == 1 and len(cols) == 1:
+            # 選択肢が1つしかない行は固定
+            final_solution[rows[0]] = col_of_row[rows[0]]
+            continue
+        local_col = {col: j for j, col in enumerate(cols)}
+        tasks.append((
+            engine,
+            backend,
+            [{local_col[col]: cost for col, cost in cell_costs[row].items()} for row in rows],
+            len(cols),
+            [row_priorities[row] for row in rows],
+            None if col_priorities is None else [col_priorities[col] for col in cols],
+            priority_flag,
+            [(i, local_col[col_of_row[row]]) for i, row in enumerate(rows)],
+            scalarize,
+            budget,
+            None if row_classes is None else [row_classes[row] for row in rows],
+            None if col_classes is None else [col_classes[col] for col in cols],
+            None if required_cols is None else [required_cols[col] for col in cols],
+        ))
+        task_indices.append((rows, cols))
+    # 入力が前回と同じ成分は前回の最適解を使う
+    keys = [None] * len(tasks)
+    reused = {}
+    if warm_start is not None:
+        keys = [warm_start.component_key(task) for task in tasks]
+        reused = {k: warm_start.component_solutions[key] for k, key in enumerate(keys) if key in warm_start.component_solutions}
+    pending = [k for k in range(len(tasks)) if k not in reused]
+    logger.debug("連結成分数: %d（解く成分: %d, 前回の解を使う成分: %d）", len(components), len(pending), len(reused))
+
+    results = {}
+    if workers > 1 and len(pending) > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            for k, result in zip(pending, executor.map(_solve_component_task, [tasks[k] for k in pending])):
+                results[k] = result + (result[1],)
+    else:
+        for k in pending:
+            start = len(budget.stages)
+            result = _solve_component_task(tasks[k])
+            results[k] = result + (budget.stages[start:],)
+
+    component_solutions = {}
+    for k, (rows, cols) in enumerate(task_indices):
+        if k in reused:
+            solution = reused[k]
+            component_solutions[keys[k]] = solution
+        else:
+            solution, stages, phases, models, own_stages = results[k]
+            if solution is None:
+                return None
+            # プロセスプールで解いた成分の記録はコピー側にあるので取り込む
+            if stages is not budget.stages:
+                budget.stages.extend(stages)
+            budget.trace.merge(phases, models)
+            # 時間切れなどで最適性を証明できなかった解は次回に持ち越さない
+            if keys[k] is not None and all(stage["status"] == "OPTIMAL" for stage in own_stages):
+                component_solutions[keys[k]] = solution
+        for local_row, local_col in solution:
+            final_solution[rows[local_row]] = cols[local_col]
+
+    if warm_start is not None:
+        warm_start.component_solutions = component_solutions
+        warm_start.reused_components = len(reused)
+    return sorted(final_solution.items())
+def optimize_by_cpsat(cell_costs, num_cols, row_priorities, col_priorities, priority_flag, stage_groups, current_solution, scalarize=False, budget=None,
+                      row_classes=None, col_classes=None, required_cols=None):
+    """
+    OR-Tools CP-SATで辞書式最適化を行う関数
+    Parameters
+    ----------
+    cell_costs : list[dict]
+        行ごとの {列: コスト}（割当可能なセルだけを持つ。定義域から除いたセルは取り除く）
+    num_cols : int
+        列数
+    row_priorities : list[int]
+        行優先順位リスト
+    col_priorities : list[int] or None
+        列優先順位リスト（Noneなら列の段階を置かない）
+    priority_flag : int
+        優先順位のフラグ（0: 行優先, 1: 列優先）
+    stage_groups : list
+        辞書式順序に並べた (axis, members) のリスト
+    current_solution : list
+        ヒントとして使う解
+    scalarize : bool
+        Trueなら重み付き単一目的で1回だけ解く
+    budget : SolveBudget or None
+        求解パラメータと時間予算
+    row_classes : list or None
+        行の対称性の同値類（同じ値の行は入れ替えても同じ解になる）
+    col_classes : list or None
+        列の対称性の同値類
+    required_cols : list[bool] or None
+        列ごとに、必ず割り当てる列ならTrue（Noneなら全ての列を割り当てる）
+    Returns
+    -------
+    current_solution : list or None
+        最適解のリスト、解が見つからない場合はNone
+    """
+    one_side = len(cell_costs)
+    if budget is None:
+        budget = SolveBudget()
+    
+    with budget.trace.phase(f"モデル構築 (n={one_side})"):
+        # OR-Tools CP-SATモデルの設定
+        model = cp_model.CpModel()
+        
+        # 変数定義：割当可能なセルごとに、そのセルを割り当てるかどうかのブール変数を1つだけ作る
+        # 以降の目的関数と制約はすべてこの変数を共有する
+        cell_vars = create_cell_vars(model, cell_costs)
+        
+        # 制約：各行・各列にちょうど1つ割り当てる（全単射）
+        # 列の方が多い場合、全ての最適割当で使われる列以外は割り当てずに残せる（ダミー行は作らない）
+        col_vars = [[] for _ in range(num_cols)]
+        for row in range(one_side):
+            model.AddExactlyOne(cell_vars[row].values())
+            for col, var in cell_vars[row].items():
+                col_vars[col].append(var)
+        for col in range(num_cols):
+            if required_cols is None or required_cols[col]:
+                model.AddExactlyOne(col_vars[col])
+            else:
+                model.AddAtMostOne(col_vars[col])
+        
+        # 複製された行・列の並べ替えで移り合う解を1つに絞る
+        if row_classes is not None:
+            add_symmetry_breaking(model, cell_vars, row_classes, col_classes)
+            current_solution = canonicalize_solution(current_solution, row_classes, col_classes)
+    if budget.trace.enabled:
+        proto = model.Proto()
+        budget.trace.record_model(size=one_side, variables=len(proto.variables), constraints=len(proto.constraints))
+    
+    # 全段階で同じモデルとソルバーを使い、前段の解をヒントとして引き継ぐ
+    solver = cp_model.CpSolver()
+    budget.configure(solver)
+    weights = make_lexicographic_weights(stage_groups, cell_costs, num_cols) if scalarize else None
+
+    if weights is not None:
+        logger.debug("重み付き単一目的モード")
+        current_solution = optimize_by_weighted_priorities(model, cell_vars, stage_groups, weights, cell_costs, num_cols, solver, current_solution, budget)
+    elif priority_flag == 0 or col_priorities is None:  # 行優先（または行の段階だけ）
+        logger.debug("行優先モード")
+        # 第1優先: 行優先順位に基づく最小化
+        current_solution = optimize_by_row_priorities(model, cell_vars, row_priorities, cell_costs, "第1優先", solver, current_solution, budget)
+        
+        # 第2優先: 列優先順位に基づく最小化
+        if current_solution and col_priorities is not None:
+            current_solution = optimize_by_column_priorities(model, cell_vars, col_priorities, cell_costs, num_cols, "第2優先", solver, current_solution, budget)
+    else:  # 列優先
+        logger.debug("列優先モード")
+        # 第1優先: 列優先順位に基づく最小化
+        current_solution = optimize_by_column_priorities(model, cell_vars, col_priorities, cell_costs, num_cols, "第1優先", solver, current_solution, budget)
+        
+        # 第2優先: 行優先順位に基づく最小化
+        if current_solution:
+            current_solution = optimize_by_row_priorities(model, cell_vars, row_priorities, cell_costs, "第2優先", solver, current_solution, budget)
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("最終的な制約：%s", model.Proto().constraints)
+    return current_solution
+def make_symmetry_classes(cell_costs, priorities, groups=None):
+    """
+    入れ替えても問題が変わらない行（または列）の同値類を作る関数
+
+    割当可能なセルとそのコストが同一で優先順位も同じ行は、複製元が同じ（groupsが同じ）場合に同じ類とする。
+    辞書式最適化は割当可能なセルだけを扱うので、それ以外のセルのコストは問わない。
+    groupsがNoneの場合は内容だけで判定する。
+    Parameters
+    ----------
+    cell_costs : list[dict]
+        行ごとの {列: コスト}（列の同値類を作る場合はtranspose_cellsで転置したもの）
+    priorities : list[int]
+        行ごとの優先順位
+    groups : list or None
+        行ごとの複製元の識別子
+    Returns
+    -------
+    classes : list[int]
+        行ごとの同値類の番号
+    """
+    class_ids = {}
+    classes = []
+    for i, row_costs in enumerate(cell_costs):
+        key = (None if groups is None else groups[i], priorities[i], tuple(row_costs.items()))
+        classes.append(class_ids.setdefault(key, len(class_ids)))
+    return classes
+def transpose_cells(cell_costs, num_cols):
+    """
+    行ごとの {列: コスト} を列ごとの {行: コスト} に並べ替える関数
+    Parameters
+    ----------
+    cell_costs : list[dict]
+        行ごとの {列: コスト}
+    num_cols : int
+        列数
+    Returns
+    -------
+    col_costs : list[dict]
+        列ごとの {行: コスト}（行の昇順）
+    """
+    col_costs = [{} for _ in range(num_cols)]
+    for row, row_costs in enumerate(cell_costs):
+        for col, cost in row_costs.items():
+            col_costs[col][row] = cost
+    return col_costs
+def add_symmetry_breaking(model, cell_vars, row_classes, col_classes):
+    """
+    同じ同値類の行同士・列同士に順序制約を加える関数
+
+    同値類の中で番号の小さい行ほど小さい列に割り当てる（列も同様に小さい行から）。
+    行優先の辞書式順序で最大の解（lex-leader）を選ぶ制約なので、行と列の両方に同時に課しても
+    解が失われない。割当可能なセルと各段階の制約はどちらも同値類の入れ替えで不変である。
+    Parameters
+    ----------
+    model : cp_model.CpModel
+        OR-ToolsのCP-SATモデル
+    cell_vars : list[dict]
+        セルごとのブール変数
+    row_classes : list[int]
+        行の同値類
+    col_classes : list[int] or None
+        列の同値類（Noneなら行だけに順序制約を課す）
+    """
+    one_side = len(cell_vars)
+    assigned_col = [sum(col * var for col, var in cell_vars[row].items()) for row in range(one_side)]
+    symmetric_sides = [(row_classes, assigned_col)]
+    if col_classes is not None:
+        row_terms = [[] for _ in col_classes]
+        for row, row_cell_vars in enumerate(cell_vars):
+            for col, var in row_cell_vars.items():
+                row_terms[col].append(row * var)
+        assigned_row = [sum(terms) for terms in row_terms]
+        symmetric_sides.append((col_classes, assigned_row))
+    constraint_count = 0
+    for classes, assigned in symmetric_sides:
+        last_member = {}
+        for index, class_id in enumerate(classes):
+            if class_id in last_member:
+                model.Add(assigned[last_member[class_id]] < assigned[index])
+                constraint_count += 1
+            last_member[class_id] = index
+    logger.debug("対称性除去の順序制約: %d", constraint_count)
+def canonicalize_solution(solution, row_classes, col_classes):
+    """
+    解を同値類の入れ替えでadd_symmetry_breakingの順序制約を満たす形に直す関数
+
+    行の並べ替えと列の並べ替えを交互に、変化がなくなるまで繰り返す。
+    Parameters
+    ----------
+    solution : list
+        解のリスト [(row, col), ...]
+    row_classes : list[int]
+        行の同値類
+    col_classes : list[int] or None
+        列の同値類（Noneなら行だけを並べ替える）
+    Returns
+    -------
+    solution : list
+        順序制約を満たす同じコストの解
+    """
+    col_of_row = [0] * len(solution)
+    for row, col in solution:
+        col_of_row[row] = col
+    changed = True
+    while changed:
+        changed = False
+        # 同じ類の行に割り当てられた列を昇順に配り直す
+        for members in _class_members(row_classes):
+            cols = sorted(col_of_row[row] for row in members)
+            for row, col in zip(members, cols):
+                if col_of_row[row] != col:
+                    col_of_row[row] = col
+                    changed = True
+        if col_classes is None:
+            break
+        # 同じ類の列に割り当てられた行を昇順に配り直す
+        row_of_col = [0] * len(col_of_row)
+        for row, col in enumerate(col_of_row):
+            row_of_col[col] = row
+        for members in _class_members(col_classes):
+            rows = sorted(row_of_col[col] for col in members)
+            for col, row in zip(members, rows):
+                if col_of_row[row] != col:
+                    col_of_row[row] = col
+                    changed = True
+    return [(row, col) for row, col in enumerate(col_of_row)]
+def _class_members(classes):
+    """同値類ごとのメンバー（昇順）のうち、2つ以上あるものを返す"""
+    members = {}
+    for index, class_id in enumerate(classes):
+        members.setdefault(class_id, []).append(index)
+    return [indices for indices in members.values() if len(indices) > 1]
 def make_sorted_priority_groups(priorities):
     """
     優先順位リストからソート済みの優先順位グループを作成する関数
@@ -172,54 +768,56 @@ def make_sorted_priority_groups(priorities):
     sorted_priority_groups = [(priority, priority_groups[priority]) for priority in sorted_priorities]
     return sorted_priority_groups
 
-def create_cost_terms_in_cols(model, row_vars, current_cols, assignment_matrix, cost_matrix, prefix):
+def create_cell_vars(model, cell_costs):
     """
-    指定された列グループに対してコスト項を作成する関数
+    割当可能なセルごとにブール変数を作成する関数
     Parameters
     ----------
     model : cp_model.CpModel
         OR-ToolsのCP-SATモデル
-    row_vars : list
-        行変数のリスト
+    cell_costs : list[dict]
+        行ごとの {列: コスト}（割当可能なセルだけを持つ）
+    Returns
+    -------
+    cell_vars : list[dict]
+        行ごとの {列: ブール変数}（x[row][col]として参照する）
+    """
+    cell_vars = []
+    for row, row_costs in enumerate(cell_costs):
+        cell_vars.append({col: model.NewBoolVar(f'x_{row}_{col}') for col in row_costs})
+    return cell_vars
+def create_cost_terms_in_cols(cell_vars, current_cols, col_costs):
+    """
+    指定された列グループに対してコスト項を作成する関数
+    Parameters
+    ----------
+    cell_vars : list[dict]
+        セルごとのブール変数
     current_cols : list
         対象となる列のインデックスリスト
-    assignment_matrix : numpy.ndarray
-        割当可能行列（0が割当可能）
-    cost_matrix : numpy.ndarray
-        コスト行列
-    prefix : str
-        変数名のプレフィックス
+    col_costs : list[dict]
+        列ごとの {行: コスト}（割当可能なセルだけを持つ）
     Returns
     -------
     terms : list
         コスト項のリスト
     """
     terms = []
-    for row, var in enumerate(row_vars):
-        for col in current_cols:
-            if assignment_matrix[row][col] == 0:  # 割り当て可能な場合のみ
-                is_assigned = model.NewBoolVar(f'{prefix}_row_{row}_col_{col}')
-                model.Add(var == col).OnlyEnforceIf(is_assigned)
-                model.Add(var != col).OnlyEnforceIf(is_assigned.Not())
-                terms.append(cost_matrix[row][col] * is_assigned)
+    for col in current_cols:
+        for row, cost in col_costs[col].items():
+            terms.append(cost * cell_vars[row][col])
     return terms
-def create_cost_terms_in_rows(model, row_vars, current_rows, assignment_matrix, cost_matrix, prefix):
+def create_cost_terms_in_rows(cell_vars, current_rows, cell_costs):
     """
     指定された行グループに対してコスト項を作成する関数
     Parameters
     ----------
-    model : cp_model.CpModel
-        OR-ToolsのCP-SATモデル
-    row_vars : list
-        行変数のリスト
+    cell_vars : list[dict]
+        セルごとのブール変数
     current_rows : list
         対象となる行のインデックスリスト
-    assignment_matrix : numpy.ndarray
-        割当可能行列（0が割当可能）
-    cost_matrix : numpy.ndarray
-        コスト行列
-    prefix : str
-        変数名のプレフィックス
+    cell_costs : list[dict]
+        行ごとの {列: コスト}（割当可能なセルだけを持つ）
     Returns
     -------
     terms : list
@@ -227,147 +825,377 @@ def create_cost_terms_in_rows(model, row_vars, current_rows, assignment_matrix,
     """
     terms = []
     for row in current_rows:
-        for col in range(len(assignment_matrix[0])):
-            if assignment_matrix[row][col] == 0:  # 割り当て可能な場合のみ
-                is_assigned = model.NewBoolVar(f'{prefix}_row_{row}_col_{col}')
-                model.Add(row_vars[row] == col).OnlyEnforceIf(is_assigned)
-                model.Add(row_vars[row] != col).OnlyEnforceIf(is_assigned.Not())
-                terms.append(cost_matrix[row][col] * is_assigned)
+        for col, cost in cell_costs[row].items():
+            terms.append(cost * cell_vars[row][col])
     return terms
-def optimize_by_row_priorities(model, row_vars, row_priorities, assignment_matrix, cost_matrix, prefix_name):
+def solve_stage(model, solver, cell_vars, current_solution, budget=None):
+    """
+    前段の解をヒントとして与えてモデルを解く関数
+
+    制限時間内に最適性を証明できなかった場合も、見つかった最良の実行可能解を返す。
+    予算切れや解が見つからなかった場合はヒントの解（実行可能解）をそのまま返す。
+    Parameters
+    ----------
+    model : cp_model.CpModel
+        OR-ToolsのCP-SATモデル
+    solver : cp_model.CpSolver
+        全段階で共有するソルバー
+    cell_vars : list[dict]
+        セルごとのブール変数
+    current_solution : list or None
+        前段の解（ヒント）
+    budget : SolveBudget or None
+        求解パラメータと時間予算（結果の記録先）
+    Returns
+    -------
+    current_solution : list or None
+        この段階の解のリスト、実行可能解が得られなかった場合はNone
+    """
+    if budget is None:
+        budget = SolveBudget()
+    time_limit = budget.next_time_limit()
+    if time_limit is not None and time_limit <= 0:
+        logger.debug("制限時間を使い切ったため、前段の解をそのまま使います")
+        budget.record("SKIPPED", None)
+        return current_solution
+
+    model.ClearHints()
+    if current_solution:
+        for row, assigned_col in current_solution:
+            for col, var in cell_vars[row].items():
+                model.AddHint(var, col == assigned_col)
+
+    if time_limit is not None:
+        solver.parameters.max_time_in_seconds = time_limit
+    else:
+        solver.parameters.ClearField("max_time_in_seconds")
+    with budget.trace.phase(f"CP-SAT 段階{len(budget.stages) + 1}"):
+        status = solver.Solve(model)
+    if status == cp_model.OPTIMAL:
+        budget.record("OPTIMAL", 0.0)
+    elif status == cp_model.FEASIBLE:
+        objective = solver.ObjectiveValue()
+        gap = abs(objective - solver.BestObjectiveBound()) / max(1.0, abs(objective))
+        logger.debug("制限時間内に最適性を証明できませんでした（相対ギャップ: %.4f）", gap)
+        budget.record("FEASIBLE", gap)
+    elif status == cp_model.UNKNOWN and current_solution:
+        logger.debug("制限時間内に解が見つからなかったため、前段の解をそのまま使います")
+        budget.record("SKIPPED", None)
+        return current_solution
+    else:
+        return None
+    return [
+        (row, next(col for col, var in row_cell_vars.items() if solver.BooleanValue(var)))
+        for row, row_cell_vars in enumerate(cell_vars)
+    ]
+def tighten_row_domains(model, cell_vars, current_rows, cell_costs, slack):
+    """
+    行グループの最小値が確定した後、行ごとの最小コストからslackを超えて高い列を定義域から除く関数
+
+    グループ内の他の行は少なくとも自身の最小コストを払うため、除いた列は以降の段階で選ばれ得ない。
+    Parameters
+    ----------
+    model : cp_model.CpModel
+        OR-ToolsのCP-SATモデル
+    cell_vars : list[dict]
+        セルごとのブール変数
+    current_rows : list
+        対象となる行のインデックスリスト
+    cell_costs : list[dict]
+        行ごとの {列: コスト}（除いたセルは取り除く）
+    slack : int
+        グループの最小値と下界の差
+    """
+    for row in current_rows:
+        row_min = min(cell_costs[row].values())
+        for col, cost in list(cell_costs[row].items()):
+            if cost - row_min > slack:
+                del cell_costs[row][col]
+                model.Add(cell_vars[row][col] == 0)
+def tighten_col_domains(model, cell_vars, current_cols, cell_costs, col_costs, slack):
+    """
+    列グループの最小値が確定した後、列ごとの最小コストからslackを超えて高い行からその列を除く関数
+    Parameters
+    ----------
+    model : cp_model.CpModel
+        OR-ToolsのCP-SATモデル
+    cell_vars : list[dict]
+        セルごとのブール変数
+    current_cols : list
+        対象となる列のインデックスリスト
+    cell_costs : list[dict]
+        行ごとの {列: コスト}（除いたセルは取り除く）
+    col_costs : list[dict]
+        列ごとの {行: コスト}（除いたセルは取り除く）
+    slack : int
+        グループの最小値と下界の差
+    """
+    for col in current_cols:
+        col_min = min(col_costs[col].values())
+        for row, cost in list(col_costs[col].items()):
+            if cost - col_min > slack:
+                del col_costs[col][row]
+                del cell_costs[row][col]
+                model.Add(cell_vars[row][col] == 0)
+def group_cost_bounds(members, member_costs):
+    """
+    行または列グループのコスト合計が取り得る範囲を求める関数
+    Parameters
+    ----------
+    members : list
+        グループに属する行または列のインデックスリスト
+    member_costs : list[dict]
+        行グループなら行ごとの {列: コスト}、列グループなら列ごとの {行: コスト}
+    Returns
+    -------
+    lower_bound : int
+        各メンバーが割当可能なセルのうち最小のコストを取る場合の合計
+    upper_bound : int
+        各メンバーが割当可能なセルのうち最大のコストを取る場合の合計
+    """
+    lower_bound = 0
+    upper_bound = 0
+    for member in members:
+        costs = member_costs[member].values()
+        lower_bound += min(costs)
+        upper_bound += max(costs)
+    return lower_bound, upper_bound
+def make_lexicographic_weights(stage_groups, cell_costs, num_cols):
+    """
+    辞書式順序を厳密に保つ各段階の整数重みを求める関数
+
+    後ろの段階から順に、ある段階の重みをそれより後ろの段階の重み付き範囲の合計より大きくする。
+    目的関数は各メンバーの最小コストを引いたコスト（0から範囲の幅まで）で作るので、
+    重みはPythonの多倍長整数で計算し、重み付きの幅の合計がMAX_SCALARIZED_OBJECTIVEを超える場合はNoneを返す。
+    Parameters
+    ----------
+    stage_groups : list
+        辞書式順序に並べた (axis, members) のリスト
+    cell_costs : list[dict]
+        行ごとの {列: コスト}（割当可能なセルだけを持つ）
+    num_cols : int
+        列数
+    Returns
+    -------
+    weights : list[int] or None
+        段階ごとの重み、桁あふれする場合はNone
+    """
+    col_costs = transpose_cells(cell_costs, num_cols) if any(axis == 1 for axis, _ in stage_groups) else None
+    bounds = [group_cost_bounds(members, cell_costs if axis == 0 else col_costs) for axis, members in stage_groups]
+    weights = [0] * len(stage_groups)
+    later_range = 0
+    for k in reversed(range(len(stage_groups))):
+        lower_bound, upper_bound = bounds[k]
+        weights[k] = later_range + 1
+        later_range += weights[k] * (int(upper_bound) - int(lower_bound))
+
+    max_objective = sum(weight * (int(upper_bound) - int(lower_bound)) for weight, (lower_bound, upper_bound) in zip(weights, bounds))
+    if max_objective > MAX_SCALARIZED_OBJECTIVE:
+        logger.debug("重みが大きすぎるため段階的な最適化を行います (目的関数の最大値: %d)", max_objective)
+        return None
+    return weights
+def optimize_by_weighted_priorities(model, cell_vars, stage_groups, weights, cell_costs, num_cols, solver, current_solution=None, budget=None):
+    """
+    全段階の目的関数を辞書式順序を保つ重みで足し合わせ、1回の求解で辞書式最適解を求める関数
+
+    各メンバー（行・列）はちょうど1つのセルに割り当てられるので、メンバーの割当可能なセルの
+    最小コストを引いても段階ごとの最適解は変わらない。引かずにコストの水準（例えば全て100以上）の
+    まま重みを掛けると係数が大きくなり、CP-SATが最適性を証明できなくなる。
+    Parameters
+    ----------
+    model : cp_model.CpModel
+        OR-ToolsのCP-SATモデル
+    cell_vars : list[dict]
+        セルごとのブール変数
+    stage_groups : list
+        辞書式順序に並べた (axis, members) のリスト
+    weights : list[int]
+        make_lexicographic_weightsで求めた段階ごとの重み
+    cell_costs : list[dict]
+        行ごとの {列: コスト}（割当可能なセルだけを持つ）
+    num_cols : int
+        列数
+    solver : cp_model.CpSolver
+        ソルバー
+    current_solution : list or None
+        ヒントとして使う解
+    budget : SolveBudget or None
+        求解パラメータと時間予算
+    Returns
+    -------
+    current_solution : list or None
+        最適解のリスト、解が見つからない場合はNone
+    """
+    # 各セルは行グループと列グループに1つずつ属するので、それぞれの重みを掛けたものの和が係数になる
+    row_weights = [0] * len(cell_vars)
+    col_weights = [0] * num_cols
+    for (axis, members), weight in zip(stage_groups, weights):
+        for member in members:
+            if axis == 0:
+                row_weights[member] = weight
+            else:
+                col_weights[member] = weight
+
+    # 行・列ごとの割当可能なセルの最小コスト（列の段階があるのは全ての列を割り当てる場合だけ）
+    row_min = [min((int(cost) for cost in row_costs.values()), default=0) for row_costs in cell_costs]
+    col_min = [None] * num_cols
+    for row_costs in cell_costs:
+        for col, cost in row_costs.items():
+            cost = int(cost)
+            if col_min[col] is None or cost < col_min[col]:
+                col_min[col] = cost
+
+    variables = []
+    coefficients = []
+    for row, row_cell_vars in enumerate(cell_vars):
+        for col, var in row_cell_vars.items():
+            cost = int(cell_costs[row][col])
+            variables.append(var)
+            coefficients.append((cost - row_min[row]) * row_weights[row] + (cost - col_min[col]) * col_weights[col])
+    logger.debug("段階数: %d, 重み: %s", len(stage_groups), weights)
+
+    model.Minimize(cp_model.LinearExpr.WeightedSum(variables, coefficients))
+    current_solution = solve_stage(model, solver, cell_vars, current_solution, budget)
+    model.ClearObjective()
+    if current_solution is None:
+        logger.debug("解が見つかりませんでした")
+    return current_solution
+def optimize_by_row_priorities(model, cell_vars, row_priorities, cell_costs, prefix_name, solver=None, current_solution=None, budget=None):
     """
     行優先順位に基づく辞書式最適化を実行する関数
     Parameters
     ----------
     model : cp_model.CpModel
         OR-ToolsのCP-SATモデル
-    row_vars : list
-        行変数のリスト
+    cell_vars : list[dict]
+        セルごとのブール変数
     row_priorities : list[int]
         行優先順位リスト
-    assignment_matrix : list or numpy.ndarray
-        割当可能行列（0が割当可能）
-    cost_matrix : list or numpy.ndarray
-        コスト行列
+    cell_costs : list[dict]
+        行ごとの {列: コスト}（割当可能なセルだけを持ち、定義域から除いたセルは取り除く）
     prefix_name : str
         処理名のプレフィックス（デバッグ用）
+    solver : cp_model.CpSolver
+        全段階で共有するソルバー（省略時は新規作成）
+    current_solution : list or None
+        前段までの解（ヒントとして使う）
+    budget : SolveBudget or None
+        求解パラメータと時間予算
     Returns
     -------
     current_solution : list or None
         最適解のリスト、解が見つからない場合はNone
     """
-    print(f"=== {prefix_name}: 行優先順位に基づく最小化 ===")
     sorted_row_priority_groups = make_sorted_priority_groups(row_priorities)
-    print(f"行優先順位グループ: {dict(sorted_row_priority_groups)}")
-    print(f"評価順序: {[priority for priority, _ in sorted_row_priority_groups]}")
+    logger.debug("%s: 行優先順位に基づく最小化（評価順序: %s）", prefix_name, [priority for priority, _ in sorted_row_priority_groups])
     
-    current_solution = None
+    if solver is None:
+        solver = cp_model.CpSolver()
     
     for row_priority, current_rows in sorted_row_priority_groups:
-        print(f"\n行優先順位 {row_priority} のグループ {current_rows} を評価中...")
+        logger.debug("行優先順位 %s のグループ %s を評価中", row_priority, current_rows)
         
-        objective_terms = create_cost_terms_in_rows(model, row_vars, current_rows, assignment_matrix, cost_matrix, f'obj_{prefix_name}_priority_{row_priority}')
+        # 各行が割当可能な列のうち最小のコストを取る場合の合計が下界
+        lower_bound, _ = group_cost_bounds(current_rows, cell_costs)
+        current_rows_set = set(current_rows)
         
-        if objective_terms:
-            model.Minimize(sum(objective_terms))
+        # 前段の解が下界に達していれば、この段階は解かずに最適と分かる
+        if current_solution and sum(cell_costs[row][col] for row, col in current_solution if row in current_rows_set) == lower_bound:
+            group_value = lower_bound
+            logger.debug("最小値: %s（下界に一致するため求解を省略）", group_value)
+        else:
+            model.Minimize(sum(create_cost_terms_in_rows(cell_vars, current_rows, cell_costs)))
+            current_solution = solve_stage(model, solver, cell_vars, current_solution, budget)
+            model.ClearObjective()
             
-            solver = cp_model.CpSolver()
-            status = solver.Solve(model)
+            if current_solution is None:
+                logger.debug("解が見つかりませんでした")
+                return None
             
-            if status == cp_model.OPTIMAL:
-                # 解を取得
-                current_solution = []
-                for row, var in enumerate(row_vars):
-                    col = solver.Value(var)
-                    current_solution.append((row, col))
-                
-                # このグループの最小値を計算
-                group_value = 0
-                for assigned_row, assigned_col in current_solution:
-                    if assigned_row in current_rows:
-                        group_value += cost_matrix[assigned_row][assigned_col]
-                
-                print(f"  最小値: {group_value}")
-                
-                # 次の優先度で制約を追加
-                # 対象行のコスト合計を制約として追加
-                cost_terms = create_cost_terms_in_rows(model, row_vars, current_rows, assignment_matrix, cost_matrix, f'constraint_{prefix_name}_priority_{row_priority}')
-                
-                if cost_terms:
-                    model.Add(sum(cost_terms) == group_value)
-            else:
-                print("  解が見つかりませんでした")
-                current_solution = None
+            # このグループの最小値を計算
+            group_value = 0
+            for assigned_row, assigned_col in current_solution:
+                if assigned_row in current_rows_set:
+                    group_value += cell_costs[assigned_row][assigned_col]
+            
+            logger.debug("最小値: %s", group_value)
         
-        model.ClearObjective()
+        # 次の優先度で制約を追加
+        # 下界との差が0なら定義域の絞り込みだけで合計が固定されるので、等式制約は不要
+        if group_value > lower_bound:
+            model.Add(sum(create_cost_terms_in_rows(cell_vars, current_rows, cell_costs)) == group_value)
+        tighten_row_domains(model, cell_vars, current_rows, cell_costs, group_value - lower_bound)
     
     return current_solution
-def optimize_by_column_priorities(model, row_vars, col_priorities, assignment_matrix, cost_matrix, prefix_name):
+def optimize_by_column_priorities(model, cell_vars, col_priorities, cell_costs, num_cols, prefix_name, solver=None, current_solution=None, budget=None):
     """
     列優先順位に基づく辞書式最適化を実行する関数
     Parameters
     ----------
     model : cp_model.CpModel
         OR-ToolsのCP-SATモデル
-    row_vars : list
-        行変数のリスト
+    cell_vars : list[dict]
+        セルごとのブール変数
     col_priorities : list[int]
         列優先順位リスト
-    assignment_matrix : list or numpy.ndarray
-        割当可能行列（0が割当可能）
-    cost_matrix : list or numpy.ndarray
-        コスト行列
+    cell_costs : list[dict]
+        行ごとの {列: コスト}（割当可能なセルだけを持ち、定義域から除いたセルは取り除く）
+    num_cols : int
+        列数
     prefix_name : str
         処理名のプレフィックス（デバッグ用）
+    solver : cp_model.CpSolver
+        全段階で共有するソルバー（省略時は新規作成）
+    current_solution : list or None
+        前段までの解（ヒントとして使う）
+    budget : SolveBudget or None
+        求解パラメータと時間予算
     Returns
     -------
     current_solution : list or None
         最適解のリスト、解が見つからない場合はNone
     """
-    print(f"=== {prefix_name}: 列優先順位に基づく最小化 ===")
     sorted_col_priority_groups = make_sorted_priority_groups(col_priorities)
-    print(f"列優先順位グループ: {dict(sorted_col_priority_groups)}")
-    print(f"評価順序: {[priority for priority, _ in sorted_col_priority_groups]}")
+    logger.debug("%s: 列優先順位に基づく最小化（評価順序: %s）", prefix_name, [priority for priority, _ in sorted_col_priority_groups])
     
-    current_solution = None
+    if solver is None:
+        solver = cp_model.CpSolver()
+    # 列ごとに見た割当可能なセル（定義域から除く場合はcell_costsと同時に取り除く）
+    col_costs = transpose_cells(cell_costs, num_cols)
     
     for col_priority, current_cols in sorted_col_priority_groups:
-        print(f"\n列優先順位 {col_priority} のグループ {current_cols} を評価中...")
+        logger.debug("列優先順位 %s のグループ %s を評価中", col_priority, current_cols)
         
-        objective_terms = create_cost_terms_in_cols(model, row_vars, current_cols, assignment_matrix, cost_matrix, f'obj_{prefix_name}_priority_{col_priority}')
+        # 各列が割当可能な行のうち最小のコストを取る場合の合計が下界
+        lower_bound, _ = group_cost_bounds(current_cols, col_costs)
+        current_cols_set = set(current_cols)
         
-        if objective_terms:
-            model.Minimize(sum(objective_terms))
+        # 前段の解が下界に達していれば、この段階は解かずに最適と分かる
+        if current_solution and sum(cell_costs[row][col] for row, col in current_solution if col in current_cols_set) == lower_bound:
+            group_value = lower_bound
+            logger.debug("最小値: %s（下界に一致するため求解を省略）", group_value)
+        else:
+            model.Minimize(sum(create_cost_terms_in_cols(cell_vars, current_cols, col_costs)))
+            current_solution = solve_stage(model, solver, cell_vars, current_solution, budget)
+            model.ClearObjective()
             
-            solver = cp_model.CpSolver()
-            status = solver.Solve(model)
+            if current_solution is None:
+                logger.debug("解が見つかりませんでした")
+                return None
             
-            if status == cp_model.OPTIMAL:
-                # 解を取得
-                current_solution = []
-                for row, var in enumerate(row_vars):
-                    col = solver.Value(var)
-                    current_solution.append((row, col))
-                
-                # このグループの最小値を計算
-                group_value = 0
-                for row, (assigned_row, assigned_col) in enumerate(current_solution):
-                    if assigned_col in current_cols:
-                        group_value += cost_matrix[assigned_row][assigned_col]
-                
-                print(f"  最小値: {group_value}")
-                
-                # 次の優先度で制約を追加
-                # 対象列のコスト合計を制約として追加
-                cost_terms = create_cost_terms_in_cols(model, row_vars, current_cols, assignment_matrix, cost_matrix, f'constraint_{prefix_name}_priority_{col_priority}')
-                
-                if cost_terms:
-                    model.Add(sum(cost_terms) == group_value)
-            else:
-                print("  解が見つかりませんでした")
-                current_solution = None
+            # このグループの最小値を計算
+            group_value = 0
+            for assigned_row, assigned_col in current_solution:
+                if assigned_col in current_cols_set:
+                    group_value += cell_costs[assigned_row][assigned_col]
+            
+            logger.debug("最小値: %s", group_value)
         
-        model.ClearObjective()
+        # 次の優先度で制約を追加
+        # 下界との差が0なら定義域の絞り込みだけで合計が固定されるので、等式制約は不要
+        if group_value > lower_bound:
+            model.Add(sum(create_cost_terms_in_cols(cell_vars, current_cols, col_costs)) == group_value)
+        tighten_col_domains(model, cell_vars, current_cols, cell_costs, col_costs, group_value - lower_bound)
     
     return current_solution
 # 以下テスト用
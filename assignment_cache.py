@@ -0,0 +1,320 @@
+import copy
+import functools
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+import numpy as np
+import assignment
+from transportation import assign_replicated
+from sparse_matrix import SparseMatrix
+
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_DIR = os.environ.get(
+    "ASSIGNMENT_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "auction-assignment")
+)
+
+
+def canonical_value(value):
+    """
+    引数をハッシュ用の正規形（JSONに変換できる値）に変換する
+
+    数値の配列はlistでもnumpy.ndarrayでも、形状・数値の種類・内容のハッシュが同じなら
+    同じ正規形になる。
+
+    Parameters
+    ----------
+    value : object
+        正規化する値
+
+    Returns
+    -------
+    canonical : object
+        JSONに変換できる正規形
+    """
+    if isinstance(value, (list, tuple, np.ndarray)):
+        try:
+            array = np.asarray(value) if len(value) > 0 else None
+        except ValueError:
+            # 長さの揃わない入れ子のリストは要素ごとに正規化する
+            array = None
+        if array is not None and array.dtype.kind in "biuf":
+            array = array.astype(np.float64 if array.dtype.kind == "f" else np.int64)
+            digest = hashlib.sha256(np.ascontiguousarray(array).tobytes()).hexdigest()
+            return ["array", array.dtype.kind, list(array.shape), digest]
+        return ["list", [canonical_value(item) for item in value]]
+    if isinstance(value, SparseMatrix):
+        return ["sparse", list(value.shape), canonical_value(value.rows), canonical_value(value.cols), canonical_value(value.values)]
+    if isinstance(value, dict):
+        return ["dict", [[str(key), canonical_value(value[key])] for key in sorted(value)]]
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError(f"キャッシュキーに使えない型です: {type(value).__name__}")
+
+
+def make_cache_key(name, args, kwargs):
+    """
+    関数名と引数の正規形からキャッシュキー（SHA-256の16進文字列）を作る
+
+    Parameters
+    ----------
+    name : str
+        キャッシュする関数の名前
+    args : tuple
+        位置引数
+    kwargs : dict
+        キーワード引数
+
+    Returns
+    -------
+    key : str
+        キャッシュキー
+    """
+    payload = json.dumps(
+        [CACHE_FORMAT_VERSION, name, canonical_value(list(args)), canonical_value(kwargs)],
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    メモリ上のLRUとディスク上のファイルの2層からなる結果キャッシュ
+
+    メモリ層はプロセス内（Streamlitの全セッション）で共有し、件数の上限を超えると
+    最も古く使われた結果から捨てる。呼び出し側が結果を書き換えても他の呼び出し側に
+    影響しないよう、メモリ層にはコピーを保存し、コピーを返す。ディスク層はプロセスをまたいで共有し、
+    合計サイズの上限を超えると最終アクセス時刻の古いファイルから削除する。
+    """
+
+    def __init__(self, max_entries=128, cache_dir=DEFAULT_CACHE_DIR, max_disk_bytes=256 * 1024 * 1024):
+        """
+        Parameters
+        ----------
+        max_entries : int
+            メモリ層に保持する結果の件数の上限（0ならメモリ層を使わない）
+        cache_dir : str or None
+            ディスク層のディレクトリ（Noneならディスク層を使わない）
+        max_disk_bytes : int
+            ディスク層の合計サイズの上限（バイト）
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        キーに対応する結果を返す（見つからなければNone）
+
+        ディスク層で見つかった結果はメモリ層にも載せる。
+        """
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(self.memory[key])
+
+        value = self._read_disk(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._put_memory(key, value)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """結果を両方の層に保存する"""
+        self._put_memory(key, value)
+        self._write_disk(key, value)
+
+    def clear(self):
+        """両方の層を空にする"""
+        self.memory.clear()
+        for path, _, _ in self._disk_entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _put_memory(self, key, value):
+        if self.max_entries <= 0:
+            return
+        self.memory[key] = copy.deepcopy(value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def _read_disk(self, key):
+        if self.cache_dir is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        try:
+            # 最終アクセス時刻を更新してLRUの順序に反映する
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def _write_disk(self, key, value):
+        if self.cache_dir is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # 書きかけのファイルを他のプロセスが読まないように、一時ファイルから置き換える
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            return
+        self._evict_disk()
+
+    def _disk_entries(self):
+        if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _evict_disk(self):
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[1])
+        total_size = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total_size <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+
+
+default_cache = ResultCache()
+
+
+def cached_call(name, func, args, kwargs, cache=None, is_final=None):
+    """
+    引数の正規形をキーに、funcの結果をキャッシュから返すか計算して保存する
+
+    is_finalを渡した場合は、is_final(結果)が真の結果だけを保存する
+    （制限時間で打ち切った結果など、解き直せば変わりうる結果は保存しない）。
+
+    Parameters
+    ----------
+    name : str
+        キャッシュキーに含める関数の名前
+    func : callable
+        結果を計算する関数
+    args : tuple
+        位置引数
+    kwargs : dict
+        キーワード引数
+    cache : ResultCache or None
+        使用するキャッシュ（Noneならdefault_cache）
+    is_final : callable or None
+        結果を保存してよいかを判定する関数（Noneなら全ての結果を保存する）
+
+    Returns
+    -------
+    result : object
+        funcの結果
+    """
+    cache = default_cache if cache is None else cache
+    key = make_cache_key(name, args, kwargs)
+    result = cache.get(key)
+    if result is None:
+        result = func(*args, **kwargs)
+        if is_final is None or is_final(result):
+            cache.put(key, result)
+    return result
+
+
+def cached_assign(original_matrix, row_priorities, col_priorities, priority_flag, matrix_type,
+                  seed=0, cache=None, **options):
+    """
+    assignment.assignの結果をキャッシュする
+
+    同点解の選び方はseedで決まるため、同じ入力とseedには常に同じ割当を返す。
+    seedを変えると別の同点解が選ばれうる。optionsはassignment.assignの
+    キーワード引数で、結果に影響しうるのですべてキーに含める。
+    ただしwarm_start（前回の求解状態）は最適解を変えないのでキーに含めない。
+    制限時間で打ち切った（statusがOPTIMALでない）結果は解き直せば変わりうるので保存しない。
+
+    Parameters
+    ----------
+    original_matrix : list or numpy.ndarray
+        元の行列
+    row_priorities : list[int]
+        行ごとの優先順位
+    col_priorities : list[int]
+        列ごとの優先順位
+    priority_flag : int
+        優先順位のフラグ（0: 行優先, 1: 列優先）
+    matrix_type : int
+        行列の種類(0ならコスト行列、1なら利益行列)
+    seed : int
+        同点解を選ぶ乱数シード
+    cache : ResultCache or None
+        使用するキャッシュ（Noneならdefault_cache）
+    **options
+        assignment.assignに渡すその他のキーワード引数
+
+    Returns
+    -------
+    result : tuple
+        assignment.assignの戻り値
+    """
+    options["seed"] = int(seed)
+    warm_start = options.pop("warm_start", None)
+    # 最適性を判定するため求解状態は常に受け取り、キーもreturn_infoによらず同じにする
+    return_info = options.pop("return_info", False)
+    options["return_info"] = True
+    result = cached_call(
+        "assign",
+        functools.partial(assignment.assign, warm_start=warm_start),
+        (original_matrix, row_priorities, col_priorities, priority_flag, matrix_type),
+        options,
+        cache,
+        is_final=lambda result: result[3]["status"] == "OPTIMAL"
+    )
+    return result if return_info else result[:3]
+
+
+def cached_assign_replicated(numeric_matrix, row_replication_factors, column_replication_factors,
+                             row_priorities, col_priorities, priority_flag, matrix_type,
+                             seed=0, cache=None):
+    """
+    transportation.assign_replicatedの結果をキャッシュする（引数はcached_assignと同様）
+    """
+    return cached_call(
+        "assign_replicated",
+        assign_replicated,
+        (numeric_matrix, row_replication_factors, column_replication_factors,
+         row_priorities, col_priorities, priority_flag, matrix_type),
+        {"seed": int(seed)},
+        cache
+    )
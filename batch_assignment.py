@@ -0,0 +1,129 @@
+import os
+import concurrent.futures
+from multiprocessing import shared_memory
+import numpy as np
+import assignment
+
+
+# これより大きい行列は pickle せず共有メモリでワーカーに渡す
+SHARED_MEMORY_MIN_BYTES = 1 << 20
+
+
+def assign_many(problems, workers=None, max_pending=None):
+    """
+    複数の割当問題をプロセスプールで並列に解き、終わった順に結果を返すイテレータ
+
+    各問題は assignment.assign のキーワード引数の辞書
+    （original_matrix, row_priorities, col_priorities, priority_flag, matrix_type と任意のオプション）。
+    大きな行列は共有メモリに書き込み、ワーカーはコピーせずに読み取る。
+    問題どうしは独立なので、CP-SATの並列ワーカー数は指定がなければ1にして
+    プロセス間でコアを取り合わないようにする。
+
+    Parameters
+    ----------
+    problems : iterable of dict
+        割当問題の列（必要になった分だけ読み進める）
+    workers : int or None
+        並列に解くプロセス数（Noneならコア数、1ならプールを使わず逐次）
+    max_pending : int or None
+        同時に投入しておく問題数の上限（Noneならworkersの2倍）
+
+    Yields
+    ------
+    index : int
+        problemsの中での問題の位置
+    result : tuple
+        assignment.assign の戻り値
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for index, problem in enumerate(problems):
+            yield index, assignment.assign(**problem)
+        return
+
+    max_pending = max_pending or 2 * workers
+    problem_iter = enumerate(problems)
+    pending = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            exhausted = False
+            while True:
+                # 投入数の上限まで問題を読み進める
+                while not exhausted and len(pending) < max_pending:
+                    try:
+                        index, problem = next(problem_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    payload, segment, options = _make_payload(problem)
+                    future = executor.submit(_assign_task, payload, options)
+                    pending[future] = (index, segment)
+
+                if not pending:
+                    break
+
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    index, segment = pending.pop(future)
+                    _release_segment(segment)
+                    yield index, future.result()
+        finally:
+            # 途中で例外が起きた場合や、呼び出し側が反復をやめた場合も共有メモリを解放する
+            for future, (_, segment) in pending.items():
+                future.cancel()
+            concurrent.futures.wait(pending)
+            for _, segment in pending.values():
+                _release_segment(segment)
+
+
+def _make_payload(problem):
+    """
+    問題の行列をワーカーに渡す形にする
+
+    Returns
+    -------
+    payload : tuple
+        ("shm", 共有メモリ名, shape, dtype) または ("object", 行列)
+    segment : SharedMemory or None
+        親プロセスが解放する共有メモリ
+    options : dict
+        行列以外のassignの引数
+    """
+    options = dict(problem)
+    matrix = options.pop("original_matrix")
+    options.setdefault("num_workers", 1)
+
+    array = np.asarray(matrix)
+    if array.dtype.kind not in "biuf" or array.nbytes < SHARED_MEMORY_MIN_BYTES:
+        return ("object", matrix), None, options
+
+    array = np.ascontiguousarray(array)
+    segment = shared_memory.SharedMemory(create=True, size=array.nbytes)
+    np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+    return ("shm", segment.name, array.shape, array.dtype.str), segment, options
+
+
+def _release_segment(segment):
+    if segment is None:
+        return
+    segment.close()
+    segment.unlink()
+
+
+def _assign_task(payload, options):
+    """ワーカープロセスで1問を解く"""
+    if payload[0] == "object":
+        return assignment.assign(payload[1], **options)
+
+    _, name, shape, dtype = payload
+    segment = shared_memory.SharedMemory(name=name)
+    try:
+        matrix = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+        matrix.flags.writeable = False
+        # 戻り値が共有メモリを参照しないように、割当可能行列は独立した配列にする
+        assignment_matrix, *rest = assignment.assign(matrix, **options)
+        result = (np.array(assignment_matrix), *rest)
+        del matrix, assignment_matrix
+    finally:
+        segment.close()
+    return result
@@ -0,0 +1,287 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import numpy as np
+import assignment
+from cli import build_problem
+from instrumentation import Trace
+
+
+# 生成する問題の種類
+INSTANCE_KINDS = ("dense", "sparse", "heavy_tie", "heavy_replication", "many_groups", "offset_cost", "single_group")
+DEFAULT_SIZES = (10, 30, 100, 300, 1000, 2000)
+
+# 比較する辞書式最適化の構成 (名前, assignのキーワード引数)
+ENGINE_CONFIGS = (
+    ("cpsat-weighted/ortools", {"engine": "cpsat", "backend": "ortools", "scalarize": True}),
+    ("cpsat-staged/ortools", {"engine": "cpsat", "backend": "ortools", "scalarize": False}),
+    ("matching/jv", {"engine": "matching", "backend": "jv"}),
+    ("matching/ortools", {"engine": "matching", "backend": "ortools"}),
+    ("cpsat-weighted/munkres", {"engine": "cpsat", "backend": "munkres", "scalarize": True}),
+)
+
+
+def generate_record(kind, n, seed):
+    """
+    シードから再現できる n×n（複製後）の問題のレコードを作る
+
+    Parameters
+    ----------
+    kind : str
+        INSTANCE_KINDSのいずれか
+        dense: 0〜100の一様乱数の利益行列
+        sparse: 9割が空（0）の利益行列
+        heavy_tie: 0〜2の値しかなく同点解が非常に多い
+        heavy_replication: 約n/10行・列の行列を複製してn×nにする
+        many_groups: 優先順位がすべて異なる（段階数がn）同点の多い行列
+        offset_cost: 100〜102の値しかない（最小値が0でない）同点の多いコスト行列
+        single_group: offset_costで、行の優先順位が全て同じ（1グループ）で行優先
+    n : int
+        複製後の正方行列の大きさ
+    seed : int
+        乱数シード
+
+    Returns
+    -------
+    record : dict
+        cli.build_problemに渡せるレコード
+    """
+    rng = np.random.default_rng([seed, n, INSTANCE_KINDS.index(kind)])
+    record = {"name": f"{kind}-{n}", "matrix_type": 1, "priority_flag": 1}
+    num_groups = max(1, min(5, n // 4))
+
+    if kind == "dense":
+        matrix = rng.integers(0, 101, (n, n))
+    elif kind == "sparse":
+        matrix = np.where(rng.random((n, n)) < 0.1, rng.integers(1, 101, (n, n)), 0)
+    elif kind == "heavy_tie":
+        matrix = rng.integers(0, 3, (n, n))
+    elif kind == "heavy_replication":
+        base = max(2, n // 10)
+        record["row_replication_factors"] = _random_composition(rng, n, base).tolist()
+        record["column_replication_factors"] = _random_composition(rng, n, base).tolist()
+        matrix = rng.integers(0, 11, (base, base))
+        record["row_priorities"] = rng.integers(1, num_groups + 1, base).tolist()
+        record["column_priorities"] = rng.integers(1, num_groups + 1, base).tolist()
+    elif kind == "many_groups":
+        matrix = rng.integers(0, 4, (n, n))
+        record["row_priorities"] = (rng.permutation(n) + 1).tolist()
+        record["column_priorities"] = (rng.permutation(n) + 1).tolist()
+    elif kind in ("offset_cost", "single_group"):
+        # 利益行列は最小値0のコスト行列に変わるので、コストが全て正の場合はコスト行列で作る
+        record["matrix_type"] = 0
+        matrix = 100 + rng.integers(0, 3, (n, n))
+        if kind == "single_group":
+            record["priority_flag"] = 0
+            record["row_priorities"] = [1] * n
+            record["column_priorities"] = rng.integers(1, num_groups + 1, n).tolist()
+    else:
+        raise ValueError(f"未知の問題の種類です: {kind}")
+
+    record["matrix"] = matrix.tolist()
+    if "row_priorities" not in record:
+        record["row_priorities"] = rng.integers(1, num_groups + 1, n).tolist()
+        record["column_priorities"] = rng.integers(1, num_groups + 1, n).tolist()
+    return record
+
+
+def _random_composition(rng, total, parts):
+    """totalを1以上のparts個の整数に分ける"""
+    cuts = np.sort(rng.choice(np.arange(1, total), parts - 1, replace=False))
+    return np.diff(np.concatenate([[0], cuts, [total]]))
+
+
+def assigned_total(problem, assignments):
+    """割当から求め直した元の行列の値の合計（assignが返す合計は線形割当の値なので構成によらず同じになる）"""
+    matrix = np.asarray(problem["original_matrix"])
+    return int(sum(matrix[row, col] for row, col in assignments))
+
+
+def group_values(problem, assignments):
+    """
+    辞書式順序の各段階（優先順位グループ）に割り当てた元の行列の値の合計
+
+    Parameters
+    ----------
+    problem : dict
+        assignment.assignのキーワード引数
+    assignments : list
+        割当のリスト [(row, col), ...]
+
+    Returns
+    -------
+    values : list[int]
+        段階ごとの合計
+    """
+    matrix = np.asarray(problem["original_matrix"])
+    col_of_row = np.empty(len(matrix), dtype=np.int64)
+    for row, col in assignments:
+        col_of_row[row] = col
+    values = []
+    for axis, members in assignment.make_stage_groups(problem["row_priorities"], problem["col_priorities"], problem["priority_flag"]):
+        if axis == 0:
+            values.append(int(matrix[members, col_of_row[members]].sum()))
+        else:
+            row_of_col = np.argsort(col_of_row)
+            values.append(int(matrix[row_of_col[members], members].sum()))
+    return values
+
+
+def run_instance(kind, n, seed, configs, time_limit=None, memory=False, munkres_max=300):
+    """
+    1つの問題を全構成で解き、時間と結果を記録して構成間で比較する
+
+    Returns
+    -------
+    runs : list[dict]
+        構成ごとの結果
+    check : dict
+        構成間の比較結果（割当から求め直した合計が線形割当の合計と一致し、
+        最適な構成どうしで段階ごとの値が一致すればconsistent=True）。
+        他の構成が最適性を証明できた問題で証明できなかった構成はnot_optimalに入れ、失敗とする
+    """
+    problem, _ = build_problem(generate_record(kind, n, seed), 1, 1, {})
+    runs = []
+    for config_name, options in configs:
+        run = {"kind": kind, "n": n, "seed": seed, "config": config_name}
+        if options.get("backend") == "munkres" and n > munkres_max:
+            run["skipped"] = f"n > {munkres_max}"
+            runs.append(run)
+            continue
+        trace = Trace(True, memory=memory)
+        start = time.perf_counter()
+        try:
+            _, total, assignments, info = assignment.assign(
+                **dict(problem, **options), seed=seed, time_limit=time_limit, trace=trace
+            )
+        except Exception as e:
+            run["error"] = f"{type(e).__name__}: {e}"
+            runs.append(run)
+            continue
+        run["seconds"] = time.perf_counter() - start
+        run["status"] = info["status"]
+        run["total"] = int(total)
+        run["assigned_total"] = assigned_total(problem, assignments)
+        run["group_values"] = group_values(problem, assignments)
+        run["phases"] = info["trace"]["phases"]
+        run["models"] = info["trace"]["models"]
+        runs.append(run)
+
+    solved = [run for run in runs if "total" in run]
+    optimal = [run for run in solved if run["status"] == "OPTIMAL"]
+    check = {
+        "kind": kind,
+        "n": n,
+        "seed": seed,
+        "totals": {run["config"]: run["assigned_total"] for run in solved},
+        "statuses": {run["config"]: run["status"] for run in solved},
+        "not_optimal": [run["config"] for run in solved if optimal and run["status"] != "OPTIMAL"],
+        # 制限時間で打ち切った構成は段階ごとの値が異なりうるので、最適な構成どうしだけ比べる
+        "consistent": (
+            all(run["assigned_total"] == run["total"] for run in solved)
+            and len({tuple(run["group_values"]) for run in optimal}) <= 1
+        ),
+        "errors": [run["config"] for run in runs if "error" in run]
+    }
+    return runs, check
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """
+    以前の結果と比べて、経過時間がthreshold倍を超えて増えた実行を返す
+
+    Returns
+    -------
+    regressions : list[dict]
+        kind, n, config, baseline_seconds, seconds, ratio
+    """
+    def key(run):
+        return (run["kind"], run["n"], run["seed"], run["config"])
+
+    previous = {key(run): run for run in baseline["runs"] if "seconds" in run}
+    regressions = []
+    for run in results["runs"]:
+        if "seconds" not in run or key(run) not in previous:
+            continue
+        baseline_seconds = previous[key(run)]["seconds"]
+        # ごく短い実行は計測誤差が大きいので比較しない
+        if baseline_seconds < 0.01:
+            continue
+        ratio = run["seconds"] / baseline_seconds
+        if ratio > threshold:
+            regressions.append({
+                "kind": run["kind"], "n": run["n"], "config": run["config"],
+                "baseline_seconds": baseline_seconds, "seconds": run["seconds"], "ratio": ratio
+            })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="assignの段階ごとの時間を計測し、構成間で結果が一致するかを確かめる")
+    parser.add_argument("--kinds", default=",".join(INSTANCE_KINDS), help="問題の種類（カンマ区切り）")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="複製後の行列の大きさ（カンマ区切り）")
+    parser.add_argument("--seeds", default="0", help="乱数シード（カンマ区切り）")
+    parser.add_argument("--configs", default=None, help="構成名（カンマ区切り、既定はすべて）")
+    parser.add_argument("--time-limit", type=float, default=60.0, help="1回の求解のCP-SATの制限時間[秒]")
+    parser.add_argument("--memory", action="store_true", help="tracemallocでメモリも計測する（時間は遅くなる）")
+    parser.add_argument("--munkres-max", type=int, default=300, help="Munkresで解く最大の大きさ")
+    parser.add_argument("-o", "--output", default=None, help="結果のJSONの書き出し先")
+    parser.add_argument("--baseline", default=None, help="比較する以前の結果のJSON")
+    parser.add_argument("--threshold", type=float, default=1.25, help="遅くなったとみなす経過時間の比")
+    args = parser.parse_args(argv)
+
+    configs = ENGINE_CONFIGS
+    if args.configs:
+        names = args.configs.split(",")
+        configs = [config for config in ENGINE_CONFIGS if config[0] in names]
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "time_limit": args.time_limit,
+            "memory": args.memory
+        },
+        "runs": [],
+        "checks": []
+    }
+    for kind in args.kinds.split(","):
+        for n in map(int, args.sizes.split(",")):
+            for seed in map(int, args.seeds.split(",")):
+                runs, check = run_instance(kind, n, seed, configs, args.time_limit, args.memory, args.munkres_max)
+                results["runs"].extend(runs)
+                results["checks"].append(check)
+                for run in runs:
+                    if "seconds" in run:
+                        outcome = f"{run['seconds']:9.3f}s {run['status']:8s} total={run['total']}"
+                    else:
+                        outcome = run.get("error") or f"skipped ({run['skipped']})"
+                    print(f"{kind:18s} n={n:<5d} seed={seed:<3d} {run['config']:24s} {outcome}", flush=True)
+                if not check["consistent"]:
+                    print(f"  !! 構成間で結果が一致しません: {check['totals']}", flush=True)
+                if check["not_optimal"]:
+                    print(f"  !! 他の構成が最適性を証明した問題で証明できませんでした: {check['not_optimal']}", flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=1)
+
+    failed = any(not check["consistent"] or check["errors"] or check["not_optimal"] for check in results["checks"])
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_with_baseline(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(
+                f"遅くなりました: {regression['kind']} n={regression['n']} {regression['config']} "
+                f"{regression['baseline_seconds']:.3f}s -> {regression['seconds']:.3f}s (x{regression['ratio']:.2f})"
+            )
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
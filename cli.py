@@ -0,0 +1,331 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import numpy as np
+import assignment
+from lsa_backends import LSA_BACKENDS, InfeasibleAssignmentError, maximum_matching_size
+from sparse_matrix import FORBIDDEN_MARKERS, SparseMatrix
+from matrix_reader import MATRIX_FILE_TYPES, read_matrix
+from batch_assignment import assign_many
+from matrix_info import (
+    ReplicationFactorError, ExpandableMatrixAndBackgrounds,
+    calculate_priority_ranking, split_forbidden_cells
+)
+
+
+# 行列ファイルとして読む拡張子
+MATRIX_EXTENSIONS = tuple("." + file_type for file_type in MATRIX_FILE_TYPES)
+# 問題のJSON Lines（1行1問）として読む拡張子
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+
+
+def read_matrix_file(path, sparse=False):
+    """
+    TSV/CSV/XLSX/NPY/Parquetファイルから行列を読む（空のセルは画面の入力と同じく0とする）
+
+    Parameters
+    ----------
+    path : str
+        行列ファイルのパス
+    sparse : bool
+        Trueなら空のセルと「x」のセルを割当不可（None）として読む
+
+    Returns
+    -------
+    numeric_matrix : numpy.ndarray
+        整数の行列（空のセル・割当不可のセルは0）
+    allowed_mask : numpy.ndarray or None
+        割当可能なセルをTrueとするブール行列（sparse=Falseなら None）
+    """
+    return read_matrix(path, os.path.splitext(path)[1], sparse)
+
+
+def iter_records(sources, sparse=False):
+    """
+    入力元から問題のレコード（辞書）を1件ずつ読む
+
+    ディレクトリは中のファイルを名前順に読み、"-" は標準入力のJSON Linesとして読む。
+    行列ファイルは行列（numpy.ndarray）と割当可能なセルのマスクだけのレコードになり、
+    ファイル名が問題名になる。
+
+    Parameters
+    ----------
+    sources : list[str]
+        ファイル・ディレクトリのパスまたは "-"
+    sparse : bool
+        行列ファイルの空のセルと「x」のセルを割当不可として読むか
+
+    Yields
+    ------
+    record : dict
+        name, matrix と任意の allowed_mask, row_names, column_names, row_replication_factors,
+        column_replication_factors, row_priorities, column_priorities, matrix_type, priority_flag
+    """
+    for source in sources:
+        if source == "-":
+            yield from _iter_jsonl(sys.stdin, "stdin")
+        elif os.path.isdir(source):
+            for name in sorted(os.listdir(source)):
+                path = os.path.join(source, name)
+                if os.path.isfile(path) and name.lower().endswith(MATRIX_EXTENSIONS + JSONL_EXTENSIONS):
+                    yield from iter_records([path], sparse)
+        elif source.lower().endswith(JSONL_EXTENSIONS):
+            with open(source, encoding="utf-8") as f:
+                yield from _iter_jsonl(f, os.path.basename(source))
+        else:
+            numeric_matrix, allowed_mask = read_matrix_file(source, sparse)
+            yield {"name": os.path.basename(source), "matrix": numeric_matrix, "allowed_mask": allowed_mask}
+
+
+def _iter_jsonl(f, source_name):
+    for line_number, line in enumerate(f, start=1):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        record.setdefault("name", f"{source_name}:{line_number}")
+        yield record
+
+
+def build_problem(record, matrix_type, priority_flag, options):
+    """
+    レコードから複製後の行列の問題を組み立てる（画面の割当ボタンと同じ手順）
+
+    行複製係数の和と列複製係数の和が異なれば、少ない方の全ての行（または列）を割り当てる問題になる。
+    行列にNone・空文字列・「x」のセルがあるか、レコードのsparseが真なら、それらのセルを
+    割当不可とする疎行列の問題にする。行列ファイルのレコード（matrixがnumpy.ndarray）は
+    読み込んだ行列とallowed_maskをそのまま使い、セルごとの変換をしない。割当可能なセルだけでは少ない方の全てを割り当てられない場合は
+    InfeasibleAssignmentErrorを送出する。
+
+    Parameters
+    ----------
+    record : dict
+        iter_recordsが返すレコード
+    matrix_type : int
+        レコードに指定がない場合の行列の種類(0ならコスト行列、1なら利益行列)
+    priority_flag : int
+        レコードに指定がない場合の優先順位のフラグ（0: 行優先, 1: 列優先）
+    options : dict
+        assignment.assignに渡すその他のキーワード引数
+
+    Returns
+    -------
+    problem : dict
+        assignment.assignのキーワード引数
+    expanded_matrix_info : ExpandableMatrixAndBackgrounds
+        結果を行名・列名に戻すための複製後の情報
+    """
+    if isinstance(record["matrix"], np.ndarray):
+        numeric_matrix = record["matrix"]
+        allowed_mask = record.get("allowed_mask")
+        if allowed_mask is None and record.get("sparse"):
+            allowed_mask = np.ones(numeric_matrix.shape, dtype=bool)
+        sparse = allowed_mask is not None
+        rows, cols = numeric_matrix.shape
+    else:
+        # JSON Linesのレコードはセルごとに変換する
+        sparse = record.get("sparse") or any(
+            value is None or str(value).strip() in FORBIDDEN_MARKERS for row in record["matrix"] for value in row
+        )
+        if sparse:
+            numeric_matrix, allowed_mask = split_forbidden_cells(record["matrix"])
+        else:
+            numeric_matrix = [[int(value) for value in row] for row in record["matrix"]]
+        rows = len(numeric_matrix)
+        cols = max((len(row) for row in numeric_matrix), default=0)
+        if any(len(row) != cols for row in numeric_matrix):
+            raise ValueError("長方形の整数のみの行列を入力してください")
+    matrix_type = int(record.get("matrix_type", matrix_type))
+    priority_flag = int(record.get("priority_flag", priority_flag))
+
+    row_names = record.get("row_names") or [str(i + 1) for i in range(rows)]
+    column_names = record.get("column_names") or [str(j + 1) for j in range(cols)]
+    row_replication_factors = [int(factor) for factor in record.get("row_replication_factors") or [1] * rows]
+    column_replication_factors = [int(factor) for factor in record.get("column_replication_factors") or [1] * cols]
+    if any(factor < 1 for factor in row_replication_factors + column_replication_factors):
+        raise ReplicationFactorError()
+    row_priorities = record.get("row_priorities") or calculate_priority_ranking(numeric_matrix, matrix_type)
+    column_priorities = record.get("column_priorities") or calculate_priority_ranking(
+        np.asarray(numeric_matrix).T, matrix_type
+    )
+
+    original_matrix_info = ExpandableMatrixAndBackgrounds(
+        row_names, column_names, row_priorities, column_priorities, numeric_matrix,
+        sparse_matrix=SparseMatrix.from_dense(numeric_matrix, allowed_mask) if sparse else None
+    )
+    expanded_matrix_info = original_matrix_info.expanded(row_replication_factors, column_replication_factors)
+    size = min(expanded_matrix_info.shape)
+    if sparse:
+        # 求解中のプロセスで失敗しないよう、少ない方の全てを割り当てられるかを組み立て時に確かめる
+        matching_size = maximum_matching_size(expanded_matrix_info.sparse_matrix)
+        if matching_size < size:
+            raise InfeasibleAssignmentError(
+                f"割当可能なセルだけでは完全な割当が存在しません（最大で{matching_size}/{size}組）"
+            )
+
+    problem = dict(
+        options,
+        original_matrix=expanded_matrix_info.sparse_matrix if sparse else expanded_matrix_info.display_matrix,
+        row_priorities=expanded_matrix_info.row_priorities,
+        col_priorities=expanded_matrix_info.column_priorities,
+        priority_flag=priority_flag,
+        matrix_type=matrix_type,
+        return_info=True,
+        row_groups=expanded_matrix_info.row_ids.tolist(),
+        col_groups=expanded_matrix_info.col_ids.tolist()
+    )
+    return problem, expanded_matrix_info
+
+
+def format_result(name, expanded_matrix_info, result):
+    """
+    assignment.assignの結果を出力用の辞書にする
+
+    Parameters
+    ----------
+    name : str
+        問題名
+    expanded_matrix_info : ExpandableMatrixAndBackgrounds
+        複製後の情報
+    result : tuple
+        return_info=Trueのassignment.assignの戻り値
+
+    Returns
+    -------
+    output : dict
+        name, total, status, trace, assignments（複製後の行名・列名と複製前の行・列番号）
+    """
+    m = expanded_matrix_info
+    _, total_assignment, assignments, solve_info = result
+    return {
+        "name": name,
+        "total": int(total_assignment),
+        "status": solve_info["status"],
+        "trace": solve_info["trace"],
+        "assignments": [
+            {
+                "row": m.row_names[row],
+                "column": m.column_names[col],
+                "row_index": int(m.row_ids[row]),
+                "column_index": int(m.col_ids[col])
+            }
+            for row, col in sorted(assignments)
+        ]
+    }
+
+
+def run(sources, output, matrix_type=1, priority_flag=1, jobs=1, options=None, sparse=False):
+    """
+    入力元の問題を順に解き、終わった順にJSON Linesで書き出す
+
+    組み立て中・求解中の問題だけを保持するので、問題数によらずメモリ使用量は一定。
+    組み立てられない問題はerrorを書き出して次に進む。
+
+    Parameters
+    ----------
+    sources : list[str]
+        入力元（iter_recordsを参照）
+    output : file
+        書き出し先
+    matrix_type : int
+        既定の行列の種類
+    priority_flag : int
+        既定の優先順位のフラグ
+    jobs : int
+        並列に解くプロセス数
+    options : dict or None
+        assignment.assignに渡すその他のキーワード引数
+    sparse : bool
+        行列ファイルの空のセルと「x」のセルを割当不可として読むか
+
+    Returns
+    -------
+    failures : int
+        解けなかった問題の数
+    """
+    options = options or {}
+    # assign_manyの番号（組み立てに成功した問題の通し番号）から問題名と複製後の情報を引く
+    submitted = {}
+    submitted_count = 0
+    failures = 0
+
+    def write(record):
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+
+    def problems():
+        nonlocal failures, submitted_count
+        for record in iter_records(sources, sparse):
+            name = record.get("name")
+            try:
+                problem, expanded_matrix_info = build_problem(record, matrix_type, priority_flag, options)
+            except (KeyError, TypeError, ValueError, ReplicationFactorError, InfeasibleAssignmentError) as e:
+                failures += 1
+                write({"name": name, "error": _describe_error(e)})
+                continue
+            submitted[submitted_count] = (name, expanded_matrix_info)
+            submitted_count += 1
+            yield problem
+
+    for index, result in assign_many(problems(), workers=jobs):
+        name, expanded_matrix_info = submitted.pop(index)
+        write(format_result(name, expanded_matrix_info, result))
+    return failures
+
+
+def _describe_error(error):
+    if isinstance(error, ReplicationFactorError):
+        return "複製係数は1以上の整数を入力してください"
+    if isinstance(error, KeyError):
+        return f"必要な項目がありません: {error.args[0]}"
+    return str(error)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="行列ファイルやJSON Linesの問題をまとめて割り当て、結果をJSON Linesで書き出す"
+    )
+    parser.add_argument("sources", nargs="+", help="TSV/CSV/XLSX/NPY/Parquet/JSONLファイル、ディレクトリ、または標準入力のJSON Linesを表す -")
+    parser.add_argument("-o", "--output", default="-", help="書き出し先（既定は標準出力）")
+    parser.add_argument("--matrix-type", choices=["cost", "profit"], default="profit", help="既定の行列の種類")
+    parser.add_argument("--priority", choices=["row", "col"], default="col", help="既定の優先（行優先・列優先）")
+    parser.add_argument("--sparse", action="store_true", help="行列ファイルの空のセルと「x」のセルを割当不可とする")
+    parser.add_argument("--backend", choices=LSA_BACKENDS, default="ortools", help="線形割当ソルバー")
+    parser.add_argument("--engine", choices=assignment.TIEBREAK_ENGINES, default="cpsat", help="同点解の辞書式最適化エンジン")
+    parser.add_argument("--seed", type=int, default=0, help="同点解の選択とCP-SATの乱数シード")
+    parser.add_argument("--time-limit", type=float, default=None, help="1問あたりのCP-SATの制限時間[秒]")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="並列に解くプロセス数")
+    parser.add_argument("--trace", action="store_true", help="段階ごとの経過時間・メモリを結果に含める")
+    parser.add_argument("-v", "--verbose", action="store_true", help="求解の途中経過を標準エラーに出力する")
+    args = parser.parse_args(argv)
+
+    options = {
+        "backend": args.backend,
+        "engine": args.engine,
+        "seed": args.seed,
+        "solver_seed": args.seed,
+        "time_limit": args.time_limit,
+        "trace": args.trace
+    }
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG, stream=sys.stderr)
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        failures = run(
+            args.sources,
+            output,
+            matrix_type=1 if args.matrix_type == "profit" else 0,
+            priority_flag=0 if args.priority == "row" else 1,
+            jobs=args.jobs,
+            options=options,
+            sparse=args.sparse
+        )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
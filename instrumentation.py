@@ -0,0 +1,108 @@
+import contextlib
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windowsにはresourceモジュールがない
+    resource = None
+
+
+# 計測しない場合に返す、何もしないコンテキストマネージャ
+_NULL_PHASE = contextlib.nullcontext()
+
+
+class Trace:
+    """
+    処理の段階ごとの経過時間・メモリとモデルの大きさを記録するクラス
+
+    enabledがFalseのときは phase() が何もしないコンテキストマネージャを返すだけなので、
+    計測を有効にしない限りほとんどコストがかからない。
+    メモリはtracemallocで追跡したPythonとNumPyの割当のみで、CP-SAT（C++）の割当は
+    プロセスの最大常駐メモリ（max_rss_bytes）にしか現れない。
+    tracemallocは処理を数倍遅くするので、時間だけを測る場合はmemory=Falseにする。
+    """
+    def __init__(self, enabled=False, memory=True):
+        self.enabled = enabled
+        self.memory = memory
+        self.phases = []
+        self.models = []
+        self._started_tracemalloc = False
+
+    def __getstate__(self):
+        # プロセスプールへ送るコピーは空の記録から始め、mergeで重複しないようにする
+        return {"enabled": self.enabled, "memory": self.memory, "phases": [], "models": [], "_started_tracemalloc": False}
+
+    def phase(self, name):
+        """
+        with文で囲んだ区間を1つの段階として記録する
+
+        Parameters
+        ----------
+        name : str
+            段階の名前
+        """
+        if not self.enabled:
+            return _NULL_PHASE
+        return self._measure(name)
+
+    @contextlib.contextmanager
+    def _measure(self, name):
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            start_memory, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            phase = {"name": name, "seconds": seconds, "memory_delta_bytes": None, "memory_peak_bytes": None}
+            if self.memory:
+                current_memory, peak_memory = tracemalloc.get_traced_memory()
+                phase["memory_delta_bytes"] = current_memory - start_memory
+                phase["memory_peak_bytes"] = peak_memory - start_memory
+            self.phases.append(phase)
+
+    def record_model(self, **sizes):
+        """
+        モデルの大きさ（変数の数、制約の数など）を記録する
+        """
+        if self.enabled:
+            self.models.append(sizes)
+
+    def merge(self, phases, models):
+        """
+        プロセスプールで計測した記録を取り込む
+        """
+        if phases is not self.phases:
+            self.phases.extend(phases)
+        if models is not self.models:
+            self.models.extend(models)
+
+    def stop(self):
+        """
+        このTraceが開始したtracemallocを止める
+        """
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def summary(self):
+        """
+        記録をまとめる。計測していない場合はNone
+        """
+        if not self.enabled:
+            return None
+        max_rss_bytes = None
+        if resource is not None:
+            # Linuxのru_maxrssはKiB単位
+            max_rss_bytes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return {
+            "total_seconds": sum(phase["seconds"] for phase in self.phases),
+            "phases": self.phases,
+            "models": self.models,
+            "max_rss_bytes": max_rss_bytes
+        }
@@ -0,0 +1,100 @@
+import numpy as np
+from lsa_backends import solve_lsa, solve_sparse
+from sparse_matrix import SparseMatrix
+
+
+def optimize_by_matching(stage_groups, cell_costs, num_cols, current_solution, backend="jv", required_cols=None):
+    """
+    CP-SATを使わず、段階ごとの最小費用完全マッチングで辞書式最適解を求める
+
+    各段階では、それまでの段階で最適だった完全マッチングの集合（最適面）に辺を制限し、
+    その段階のグループに属するセルだけにコストを置いた線形割当問題を解く。
+    最適双対変数で被約費用0になる辺だけを残すと、次の段階の最適面になる。
+    1段階あたり線形割当1回（O(n^3)）で、ソルバーの起動コストもない。
+    列の方が多い場合は長方形のまま解き、必ず割り当てる列には割り当てない解より必ず安くなる
+    割引を与える。余裕が正になった列も以降の段階で必ず割り当てる列に加える。
+
+    Parameters
+    ----------
+    stage_groups : list
+        辞書式順序に並べた (axis, members) のリスト（axisは0: 行, 1: 列）
+    cell_costs : list[dict]
+        行ごとの {列: コスト}（割当可能なセルだけを持つ）
+    num_cols : int
+        列数
+    current_solution : list
+        割当可能なセルだけを使う全ての行の割当 [(row, col), ...]
+    backend : str or None
+        各段階で使う線形割当ソルバー（lsa_backends.LSA_BACKENDSのいずれか）。
+        Noneなら割当可能なセルだけを辺としてsolve_sparseで解く（疎行列モード）
+    required_cols : list[bool] or None
+        列ごとに、必ず割り当てる列ならTrue（Noneなら全ての列を割り当てる）
+
+    Returns
+    -------
+    current_solution : list
+        辞書式最適解のリスト [(row, col), ...]
+    """
+    n = len(cell_costs)
+    # 割当可能なセルを行優先・列優先の順に並べた配列で持つ（SparseMatrixと同じ並び）
+    rows = np.repeat(np.arange(n, dtype=np.int64), [len(row_costs) for row_costs in cell_costs])
+    cols = np.fromiter((col for row_costs in cell_costs for col in row_costs), dtype=np.int64, count=len(rows))
+    cost = np.fromiter((value for row_costs in cell_costs for value in row_costs.values()), dtype=np.int64, count=len(rows))
+    order = np.lexsort((cols, rows))
+    rows, cols, cost = rows[order], cols[order], cost[order]
+    allowed = np.ones(len(rows), dtype=bool)
+
+    col_of_row = np.empty(n, dtype=np.int64)
+    for row, col in current_solution:
+        col_of_row[row] = col
+    required = None if required_cols is None else np.array(required_cols, dtype=bool)
+
+    for axis, members in stage_groups:
+        cell_member = rows if axis == 0 else cols
+        in_group = np.zeros(n if axis == 0 else num_cols, dtype=bool)
+        in_group[members] = True
+        stage_cost = np.where(in_group[cell_member], cost, 0)
+
+        # 各メンバーが最小コストのセルを取れば下界に達する
+        member_min = np.full(len(in_group), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(member_min, cell_member[allowed], stage_cost[allowed])
+        lower_bound = member_min[members].sum()
+        current_value = stage_cost[cols == col_of_row[rows]].sum()
+
+        if current_value == lower_bound:
+            # 現在の解が下界に達している：メンバーの最小コスト以外のセルを除けば最適面になる
+            allowed &= ~in_group[cell_member] | (stage_cost == member_min[cell_member])
+            continue
+
+        # コストを0以上にそろえ、必ず割り当てる列にはどの割当のコスト差よりも大きい割引を与える
+        # （そろえないと、全てのコストが正の場合に最適面の外のセルを使うマッチングの方が安くなりうる）
+        span = int(stage_cost[allowed].max() - stage_cost[allowed].min())
+        forbidden_cost = span * n + 1
+        shifted_cost = stage_cost - stage_cost[allowed].min()
+        if backend is None:
+            # 最適面のセルだけを辺として解く（計算量とメモリは割当可能なセル数に比例する）
+            cells = np.flatnonzero(allowed)
+            values = shifted_cost[cells]
+            if required is not None:
+                values = values - forbidden_cost * required[cols[cells]]
+            result, reduced_costs, column_slack = solve_sparse(
+                SparseMatrix((n, num_cols), rows[cells], cols[cells], values), return_column_slack=True
+            )
+            allowed[cells[reduced_costs != 0]] = False
+        else:
+            # 最適面の外のセルはどの完全マッチングよりも高くなる大きなコストで禁止する
+            stage_problem = np.full((n, num_cols), forbidden_cost, dtype=np.int64)
+            stage_problem[rows[allowed], cols[allowed]] = shifted_cost[allowed]
+            if required is None:
+                result, reduced_cost_matrix = solve_lsa(stage_problem, backend)
+                column_slack = None
+            else:
+                stage_problem[:, required] -= forbidden_cost
+                result, reduced_cost_matrix, column_slack = solve_lsa(stage_problem, backend, return_column_slack=True)
+            allowed &= np.asarray(reduced_cost_matrix)[rows, cols] == 0
+        if required is not None and column_slack is not None:
+            required |= column_slack > 0
+        for row, col in result:
+            col_of_row[row] = col
+
+    return [(int(row), int(col_of_row[row])) for row in range(n)]
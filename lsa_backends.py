@@ -0,0 +1,501 @@
+import numpy as np
+import ExtendedMunkres
+from ortools.graph.python import linear_sum_assignment, max_flow, min_cost_flow
+
+# 選択可能な線形割当ソルバー
+LSA_BACKENDS = ("munkres", "jv", "ortools")
+
+
+class LSABackendError(Exception):
+    """線形割当ソルバーの指定や実行に失敗した場合に発生する例外"""
+    pass
+
+
+class InfeasibleAssignmentError(LSABackendError):
+    """割当可能なセルだけでは全ての行と列を1対1に対応させられない場合に発生する例外"""
+    pass
+
+
+def solve_lsa(cost_matrix, backend="munkres", return_column_slack=False):
+    """
+    指定されたバックエンドで線形割当問題を解き、割当と被約費用行列を返す
+
+    行数が列数より少ない長方形のコスト行列は、全ての行を別々の列に割り当てる問題として
+    そのまま解く（ダミー行で正方行列に広げない）。
+
+    Parameters
+    ----------
+    cost_matrix : list or numpy.ndarray
+        コスト行列（行数は列数以下）
+    backend : str
+        "munkres"（純Python）、"jv"（NumPyによる最短増加路法）、"ortools"（OR-ToolsのC++実装）のいずれか
+    return_column_slack : bool
+        Trueなら列ごとの余裕（列ポテンシャルの符号を反転したもの）も返す
+
+    Returns
+    -------
+    result : list
+        最適割当のリスト [(row, col), ...]
+    reduced_cost_matrix : list or numpy.ndarray
+        最適双対変数による被約費用行列（0のセルが最適割当に使える辺）
+        ExtendedMunkres.get_internal_C()と同じ意味を持つ
+    column_slack : numpy.ndarray or None
+        return_column_slackがTrueの場合のみ。長方形の場合、余裕が正の列は全ての最適割当で
+        割り当てられ、0の列は割り当てずに残せる。正方の場合は全ての列が割り当てられるのでNone
+    """
+    if backend not in LSA_BACKENDS:
+        raise LSABackendError(f"未知のバックエンドです: {backend}")
+    C = _as_cost_array(cost_matrix)
+    num_rows, num_cols = C.shape
+    if num_rows == num_cols:
+        if backend == "munkres":
+            m = ExtendedMunkres.ExtendedMunkres()
+            # munkresはnumpy配列の行をビューのまま書き換えるため、リストのコピーを渡す
+            result = m.compute(C.tolist())
+            reduced_cost_matrix = m.get_internal_C()
+        elif backend == "jv":
+            result, reduced_cost_matrix, _ = solve_jv(C)
+        else:
+            result, reduced_cost_matrix, _ = solve_ortools(C)
+        return (result, reduced_cost_matrix, None) if return_column_slack else (result, reduced_cost_matrix)
+
+    if backend == "munkres":
+        # munkresは内部で0の行を足して正方にするため、被約費用は最適割当から復元する
+        result = ExtendedMunkres.ExtendedMunkres().compute(C.tolist())
+        col_of_row = np.empty(num_rows, dtype=np.int64)
+        for row, col in result:
+            col_of_row[row] = col
+        u, v = recover_potentials(C, col_of_row)
+        reduced_cost_matrix = _snap_zeros(C - u[:, None] - v[None, :])
+    elif backend == "jv":
+        result, reduced_cost_matrix, v = solve_jv(C)
+    else:
+        result, reduced_cost_matrix, v = solve_ortools(C)
+    return (result, reduced_cost_matrix, -v) if return_column_slack else (result, reduced_cost_matrix)
+
+
+def solve_jv(cost_matrix):
+    """
+    列縮約で初期割当を作り、残りの行を最短増加路で割り当てる（Jonker-Volgenant型）
+
+    内側のループ（列方向の最短距離更新）はNumPyでベクトル化している。
+    行数が列数より少ない場合は列縮約を行わず、列ポテンシャル0から全ての行を最短増加路で割り当てる
+    （割り当てられない列のポテンシャルは0のまま、割り当てた列は0以下に保たれる）。
+
+    Parameters
+    ----------
+    cost_matrix : list or numpy.ndarray
+        コスト行列（行数は列数以下）
+
+    Returns
+    -------
+    result : list
+        最適割当のリスト [(row, col), ...]
+    reduced_cost_matrix : numpy.ndarray
+        被約費用行列
+    column_potentials : numpy.ndarray
+        列ポテンシャル
+    """
+    C = _as_cost_array(cost_matrix)
+    num_rows, num_cols = C.shape
+    if num_rows == 0:
+        return [], C, np.zeros(num_cols, dtype=C.dtype)
+
+    u = np.zeros(num_rows, dtype=C.dtype)
+    row_of_col = np.full(num_cols, -1)
+    col_of_row = np.full(num_rows, -1)
+    if num_rows == num_cols:
+        # 列縮約：各列の最小値を列ポテンシャルとし、被約費用0の辺で貪欲に初期割当する
+        v = C.min(axis=0)
+        for j, i in enumerate(C.argmin(axis=0)):
+            if col_of_row[i] == -1:
+                row_of_col[j] = i
+                col_of_row[i] = j
+    else:
+        v = np.zeros(num_cols, dtype=C.dtype)
+
+    # 行縮約：未割当行のポテンシャルを被約費用の最小値に合わせる（割当済みの辺の相補性は保たれる）
+    free_rows = np.flatnonzero(col_of_row == -1)
+    if len(free_rows) > 0:
+        u[free_rows] = (C[free_rows] - v).min(axis=1)
+
+    _augment_free_rows(C, u, v, row_of_col, col_of_row, free_rows)
+
+    reduced_cost_matrix = _snap_zeros(C - u[:, None] - v[None, :])
+    result = [(i, int(col_of_row[i])) for i in range(num_rows)]
+    return result, reduced_cost_matrix, v
+
+
+def _augment_free_rows(C, u, v, row_of_col, col_of_row, free_rows):
+    """
+    未割当行ごとに最短増加路を探索して割り当てる（割当と双対変数はその場で書き換える）
+
+    被約費用が非負で、割当済みの辺の被約費用が0であれば、どの状態からでも始められる。
+    同じ距離の列はまとめて確定し、それらの行からの緩和を2次元の演算で一度に行う。
+    """
+    num_rows, num_cols = C.shape
+    all_cols = np.arange(num_cols)
+    for free_row in free_rows:
+        min_dist = np.full(num_cols, np.inf)
+        way = np.full(num_cols, -1)
+        used = np.zeros(num_cols, dtype=bool)
+        row_used = np.zeros(num_rows, dtype=bool)
+        row_used[free_row] = True
+        scan_rows = np.array([free_row])
+        scan_via = np.array([-1])
+        while True:
+            reduced = C[scan_rows] - u[scan_rows, None] - v[None, :]
+            best = reduced.argmin(axis=0)
+            candidate = reduced[best, all_cols]
+            improved = ~used & (candidate < min_dist)
+            min_dist[improved] = candidate[improved]
+            way[improved] = scan_via[best[improved]]
+            delta = np.where(used, np.inf, min_dist).min()
+            # 訪問済みの行・列のポテンシャルを更新して被約費用を非負に保つ
+            if delta != 0:
+                delta = C.dtype.type(delta)
+                u[row_used] += delta
+                v[used] -= delta
+                min_dist[~used] -= delta
+            ready = np.flatnonzero(~used & (min_dist == 0))
+            free_ready = ready[row_of_col[ready] == -1]
+            if len(free_ready) > 0:
+                j0 = free_ready[0]
+                break
+            used[ready] = True
+            scan_rows = row_of_col[ready]
+            scan_via = ready
+            row_used[scan_rows] = True
+
+        # 増加路に沿って割当を反転
+        while j0 != -1:
+            j_prev = way[j0]
+            i = row_of_col[j_prev] if j_prev != -1 else free_row
+            row_of_col[j0] = i
+            col_of_row[i] = j0
+            j0 = j_prev
+
+
+def repair_lsa(cost_matrix, col_of_row, row_potentials, col_potentials, touched_rows=(), touched_cols=()):
+    """
+    前回の最適割当と双対変数を引き継ぎ、値が変わった行・列だけを割り当て直す（正方の問題のみ）
+
+    変わった列は割当を外して列ポテンシャルを列の被約費用の最小値まで下げ、変わった行は
+    割当を外して行ポテンシャルを行の被約費用の最小値に合わせる。変わっていないセルの
+    被約費用はそのままなので、双対変数は実行可能で残った割当の相補性も保たれる。
+    外したk行を最短増加路で割り当て直せば最適割当に戻る（全体を解き直す O(n^3) ではなく O(k n^2)）。
+
+    Parameters
+    ----------
+    cost_matrix : numpy.ndarray
+        変更後の正方のコスト行列
+    col_of_row : numpy.ndarray
+        前回の行ごとの割当列
+    row_potentials : numpy.ndarray
+        前回の行ポテンシャル（変更のないセルの被約費用が前回と同じになるように合わせたもの）
+    col_potentials : numpy.ndarray
+        前回の列ポテンシャル
+    touched_rows : list[int]
+        値が変わったセルを含む行
+    touched_cols : list[int]
+        値が変わったセルを含む列（touched_rowsと合わせて全ての変わったセルを覆う）
+
+    Returns
+    -------
+    result : list
+        最適割当のリスト [(row, col), ...]
+    reduced_cost_matrix : numpy.ndarray
+        被約費用行列
+    row_potentials : numpy.ndarray
+        行ポテンシャル
+    col_potentials : numpy.ndarray
+        列ポテンシャル
+    """
+    C = _as_cost_array(cost_matrix)
+    num_rows, num_cols = C.shape
+    if num_rows != num_cols:
+        raise LSABackendError("割当の修復は正方のコスト行列のみ扱えます")
+    u = np.array(row_potentials, dtype=C.dtype)
+    v = np.array(col_potentials, dtype=C.dtype)
+    col_of_row = np.array(col_of_row, dtype=np.int64)
+    row_of_col = np.empty(num_cols, dtype=np.int64)
+    row_of_col[col_of_row] = np.arange(num_rows)
+
+    # 変わった列：割当を外し、全ての行に対して被約費用が非負になるまで列ポテンシャルを下げる
+    touched_cols = np.asarray(touched_cols, dtype=np.int64)
+    if len(touched_cols) > 0:
+        col_of_row[row_of_col[touched_cols]] = -1
+        row_of_col[touched_cols] = -1
+        v[touched_cols] = (C[:, touched_cols] - u[:, None]).min(axis=0)
+    # 変わった行：割当を外し、行ポテンシャルを行の被約費用の最小値に合わせる
+    touched_rows = np.asarray(touched_rows, dtype=np.int64)
+    if len(touched_rows) > 0:
+        assigned = col_of_row[touched_rows]
+        row_of_col[assigned[assigned != -1]] = -1
+        col_of_row[touched_rows] = -1
+        u[touched_rows] = (C[touched_rows] - v[None, :]).min(axis=1)
+
+    _augment_free_rows(C, u, v, row_of_col, col_of_row, np.flatnonzero(col_of_row == -1))
+
+    reduced_cost_matrix = _snap_zeros(C - u[:, None] - v[None, :])
+    result = [(i, int(col_of_row[i])) for i in range(num_rows)]
+    return result, reduced_cost_matrix, u, v
+
+
+def solve_ortools(cost_matrix):
+    """
+    OR-ToolsのLinearSumAssignment（C++実装）で線形割当問題を解く
+
+    OR-Toolsは双対変数を返さないため、得られた最適割当から最短路で双対変数を復元し、
+    被約費用行列を作る。LinearSumAssignmentは正方の問題しか扱えないので、
+    行数が列数より少ない場合は最小費用流（各行から1単位を列経由で流す）で解く。
+
+    Parameters
+    ----------
+    cost_matrix : list or numpy.ndarray
+        整数のコスト行列（行数は列数以下）
+
+    Returns
+    -------
+    result : list
+        最適割当のリスト [(row, col), ...]
+    reduced_cost_matrix : numpy.ndarray
+        被約費用行列
+    column_potentials : numpy.ndarray
+        列ポテンシャル
+    """
+    C = _as_cost_array(cost_matrix)
+    num_rows, num_cols = C.shape
+    if num_rows == 0:
+        return [], C, np.zeros(num_cols, dtype=C.dtype)
+    if not np.issubdtype(C.dtype, np.integer):
+        raise LSABackendError("ortoolsバックエンドは整数のコスト行列のみ扱えます")
+
+    rows, cols = np.indices((num_rows, num_cols))
+    if num_rows == num_cols:
+        solver = linear_sum_assignment.SimpleLinearSumAssignment()
+        solver.add_arcs_with_cost(rows.ravel(), cols.ravel(), C.ravel().astype(np.int64))
+        status = solver.solve()
+        if status != solver.OPTIMAL:
+            raise LSABackendError(f"LinearSumAssignmentが最適解を返しませんでした (status={status})")
+        col_of_row = np.array([solver.right_mate(i) for i in range(num_rows)])
+    else:
+        col_of_row = _solve_min_cost_flow((num_rows, num_cols), rows.ravel(), cols.ravel(), C.ravel())
+        if col_of_row is None:
+            raise LSABackendError("最小費用流が最適解を返しませんでした")
+
+    u, v = recover_potentials(C, col_of_row)
+    reduced_cost_matrix = C - u[:, None] - v[None, :]
+    result = [(i, int(col_of_row[i])) for i in range(num_rows)]
+    return result, reduced_cost_matrix, v
+
+
+def solve_sparse(sparse_costs, return_column_slack=False):
+    """
+    割当可能なセル（辺）だけを与えてOR-ToolsのLinearSumAssignmentで解く
+
+    計算量とメモリは割当可能なセル数に比例する。解く前に割当可能なセルのない行・列を調べ、
+    解けない場合は最大でいくつの組を作れるかを添えてInfeasibleAssignmentErrorを送出する。
+    行数が列数より少ない場合は全ての行を割り当てる問題として最小費用流で解く。
+
+    Parameters
+    ----------
+    sparse_costs : sparse_matrix.SparseMatrix
+        整数コストの疎行列（含まれないセルは割当不可、行数は列数以下）
+    return_column_slack : bool
+        Trueなら列ごとの余裕も返す（solve_lsaを参照）
+
+    Returns
+    -------
+    result : list
+        最適割当のリスト [(row, col), ...]
+    reduced_costs : numpy.ndarray
+        割当可能なセルごとの被約費用（sparse_costs.valuesと同じ並び）
+    column_slack : numpy.ndarray or None
+        return_column_slackがTrueの場合のみ（正方の場合はNone）
+    """
+    num_rows, num_cols = sparse_costs.shape
+    if num_rows > num_cols:
+        raise LSABackendError("コスト行列の行数は列数以下である必要があります")
+    if num_rows == 0:
+        reduced_costs = sparse_costs.values.copy()
+        return ([], reduced_costs, np.zeros(num_cols, dtype=np.int64)) if return_column_slack else ([], reduced_costs)
+    empty_rows = sparse_costs.empty_rows()
+    empty_cols = sparse_costs.empty_cols() if num_rows == num_cols else np.array([], dtype=np.int64)
+    if len(empty_rows) or len(empty_cols):
+        raise InfeasibleAssignmentError(
+            f"割当可能なセルがない行・列があります（行: {empty_rows.tolist()}, 列: {empty_cols.tolist()}）"
+        )
+
+    rows, cols, costs = sparse_costs.rows, sparse_costs.cols, sparse_costs.values
+    if num_rows == num_cols:
+        solver = linear_sum_assignment.SimpleLinearSumAssignment()
+        solver.add_arcs_with_cost(rows, cols, costs)
+        status = solver.solve()
+        if status == solver.INFEASIBLE:
+            raise InfeasibleAssignmentError(
+                f"割当可能なセルだけでは完全な割当が存在しません（最大で{maximum_matching_size(sparse_costs)}/{num_rows}組）"
+            )
+        if status != solver.OPTIMAL:
+            raise LSABackendError(f"LinearSumAssignmentが最適解を返しませんでした (status={status})")
+        col_of_row = np.array([solver.right_mate(i) for i in range(num_rows)])
+    else:
+        col_of_row = _solve_min_cost_flow(sparse_costs.shape, rows, cols, costs)
+        if col_of_row is None:
+            raise InfeasibleAssignmentError(
+                f"割当可能なセルだけでは全ての行を割り当てられません（最大で{maximum_matching_size(sparse_costs)}/{num_rows}組）"
+            )
+
+    u, v = recover_sparse_potentials(sparse_costs, col_of_row)
+    result = [(i, int(col_of_row[i])) for i in range(num_rows)]
+    reduced_costs = costs - u[rows] - v[cols]
+    if not return_column_slack:
+        return result, reduced_costs
+    return result, reduced_costs, None if num_rows == num_cols else -v
+
+
+def _solve_min_cost_flow(shape, rows, cols, costs):
+    """
+    各行から1単位を割当可能なセル経由で列へ流す最小費用流で、全ての行を割り当てる
+
+    Returns
+    -------
+    col_of_row : numpy.ndarray or None
+        行ごとの割当列（全ての行を割り当てられない場合はNone）
+    """
+    num_rows, num_cols = shape
+    sink = num_rows + num_cols
+    num_cells = len(rows)
+    solver = min_cost_flow.SimpleMinCostFlow()
+    solver.add_arcs_with_capacity_and_unit_cost(
+        np.concatenate([rows, num_rows + np.arange(num_cols)]),
+        np.concatenate([num_rows + np.asarray(cols), np.full(num_cols, sink)]),
+        np.ones(num_cells + num_cols, dtype=np.int64),
+        np.concatenate([np.asarray(costs, dtype=np.int64), np.zeros(num_cols, dtype=np.int64)])
+    )
+    solver.set_nodes_supplies(
+        np.arange(sink + 1),
+        np.concatenate([np.ones(num_rows, dtype=np.int64), np.zeros(num_cols, dtype=np.int64), [-num_rows]])
+    )
+    if solver.solve() != solver.OPTIMAL:
+        return None
+    flows = solver.flows(np.arange(num_cells))
+    col_of_row = np.empty(num_rows, dtype=np.int64)
+    col_of_row[np.asarray(rows)[flows > 0]] = np.asarray(cols)[flows > 0]
+    return col_of_row
+
+
+def maximum_matching_size(sparse_matrix):
+    """
+    割当可能なセルだけで作れる組の最大数（二部グラフの最大マッチングの大きさ）を求める
+    """
+    num_rows, num_cols = sparse_matrix.shape
+    source = num_rows + num_cols
+    sink = source + 1
+    solver = max_flow.SimpleMaxFlow()
+    solver.add_arcs_with_capacity(
+        np.concatenate([np.full(num_rows, source), sparse_matrix.rows, num_rows + np.arange(num_cols)]),
+        np.concatenate([np.arange(num_rows), num_rows + sparse_matrix.cols, np.full(num_cols, sink)]),
+        np.ones(num_rows + sparse_matrix.nnz + num_cols, dtype=np.int64)
+    )
+    solver.solve(source, sink)
+    return int(solver.optimal_flow())
+
+
+def recover_sparse_potentials(sparse_costs, col_of_row):
+    """
+    recover_potentialsの疎行列版（割当可能なセルだけを辺とする）
+
+    Parameters
+    ----------
+    sparse_costs : sparse_matrix.SparseMatrix
+        コストの疎行列（行数は列数以下）
+    col_of_row : numpy.ndarray
+        行ごとの割当列
+
+    Returns
+    -------
+    u : numpy.ndarray
+        行ポテンシャル
+    v : numpy.ndarray
+        列ポテンシャル
+    """
+    n, num_cols = sparse_costs.shape
+    rows, cols, costs = sparse_costs.rows, sparse_costs.cols, sparse_costs.values
+    matched = cols == col_of_row[rows]
+    matched_cost = np.zeros(n, dtype=costs.dtype)
+    matched_cost[rows[matched]] = costs[matched]
+    # 行iを経由して割当列col_of_row[i]から列colsへ移る重み
+    step = costs - matched_cost[rows]
+    v = np.zeros(num_cols, dtype=costs.dtype)
+    # ベクトル化したBellman-Ford法（高々n回の反復で収束する）
+    for _ in range(n):
+        new_v = v.copy()
+        np.minimum.at(new_v, cols, v[col_of_row[rows]] + step)
+        if np.array_equal(new_v, v):
+            break
+        v = new_v
+    u = matched_cost - v[col_of_row]
+    return u, v
+
+
+def recover_potentials(C, col_of_row):
+    """
+    最適割当から相補性を満たす双対変数(u, v)を復元する
+
+    列jから列kへ重みC[i][k] - C[i][j]（iはjに割り当てられた行）の辺を張った
+    グラフの最短距離が列ポテンシャルvになる。最適割当なので負閉路はない。
+    長方形の場合、割り当てられていない列から出る辺はなく、その列へ負の距離で届くこともない
+    （届けば割当を付け替えてコストを下げられる）ので、その列のポテンシャルは0になる。
+
+    Parameters
+    ----------
+    C : numpy.ndarray
+        コスト行列（行数は列数以下）
+    col_of_row : numpy.ndarray
+        行ごとの割当列
+
+    Returns
+    -------
+    u : numpy.ndarray
+        行ポテンシャル
+    v : numpy.ndarray
+        列ポテンシャル
+    """
+    n = len(C)
+    rows = np.arange(n)
+    matched_cost = C[rows, col_of_row]
+    # 行iを経由して割当列col_of_row[i]から列kへ移る重み
+    step = C - matched_cost[:, None]
+    v = np.zeros(C.shape[1], dtype=C.dtype)
+    # ベクトル化したBellman-Ford法（高々n回の反復で収束する）
+    for _ in range(n):
+        candidate = (v[col_of_row][:, None] + step).min(axis=0)
+        new_v = np.minimum(v, candidate)
+        if np.array_equal(new_v, v):
+            break
+        v = new_v
+    u = matched_cost - v[col_of_row]
+    return u, v
+
+
+def _as_cost_array(cost_matrix):
+    """コスト行列を行数が列数以下のnumpy配列に変換する"""
+    C = np.array(cost_matrix)
+    if C.size == 0 and C.ndim != 2:
+        return C.reshape(0, 0)
+    if C.ndim != 2:
+        raise LSABackendError("コスト行列は2次元の行列である必要があります")
+    if C.shape[0] > C.shape[1]:
+        raise LSABackendError("コスト行列の行数は列数以下である必要があります")
+    if not np.issubdtype(C.dtype, np.number):
+        raise LSABackendError("コスト行列は数値のみで構成されている必要があります")
+    return C
+
+
+def _snap_zeros(reduced_cost_matrix):
+    """浮動小数のコストで生じる丸め誤差を0に寄せる"""
+    if np.issubdtype(reduced_cost_matrix.dtype, np.floating):
+        scale = max(1.0, float(np.abs(reduced_cost_matrix).max()))
+        reduced_cost_matrix[np.abs(reduced_cost_matrix) <= 1e-9 * scale] = 0
+    return reduced_cost_matrix
@@ -0,0 +1,239 @@
+import re
+from functools import cached_property
+import numpy as np
+import pandas as pd
+from sparse_matrix import FORBIDDEN_MARKERS
+
+
+class ReplicationFactorError(Exception):
+    """複製係数が1未満の場合に発生する例外"""
+    pass
+
+class ExpandableMatrixAndBackgrounds:
+    """
+    expand可能なマトリックスと背景情報を管理するクラス
+
+    行列・名前・優先順位・疎行列は複製前のものだけを持ち、複製したインスタンスとも共有する。
+    複製は行・列ごとの複製係数として持ち、複製後の行列・名前・優先順位は参照されたときに
+    1度だけ作る（複製係数がすべて1なら複製前の行列をそのまま返す）。
+    """
+    def __init__(self, row_names, column_names, row_priorities, column_priorities, display_matrix,
+                 row_replication_factors=None, column_replication_factors=None, sparse_matrix=None):
+        matrix = np.asarray(display_matrix, dtype=np.int64)
+        # 複製前の情報（複製したインスタンスと共有する）
+        self._base = {
+            "matrix": matrix,
+            "row_names": row_names,
+            "column_names": column_names,
+            "row_priorities": row_priorities,
+            "column_priorities": column_priorities,
+            # 割当不可のセルがある場合は、割当可能なセルだけの疎行列（SparseMatrix）を持つ
+            "sparse_matrix": sparse_matrix
+        }
+        rows, cols = matrix.shape
+        self.row_replication_factors = np.ones(rows, dtype=np.int64) if row_replication_factors is None \
+            else np.asarray(row_replication_factors, dtype=np.int64)
+        self.column_replication_factors = np.ones(cols, dtype=np.int64) if column_replication_factors is None \
+            else np.asarray(column_replication_factors, dtype=np.int64)
+
+    def show_all_members(self):
+        """
+        このインスタンスの全てのメンバー変数の値を見やすく表示するテスト用メソッド
+        """
+        print("==== ExpandableMatrixAndBackgrounds メンバー変数一覧 ====")
+        print(f"row_names: {self.row_names}")
+        print(f"column_names: {self.column_names}")
+        print(f"row_priorities: {self.row_priorities}")
+        print(f"column_priorities: {self.column_priorities}")
+        print(f"display_matrix: {self.display_matrix.tolist()}")
+        print(f"row_ids: {self.row_ids.tolist()}")
+        print(f"col_ids: {self.col_ids.tolist()}")
+        print(f"sparse_matrix: {None if self.sparse_matrix is None else f'{self.sparse_matrix.nnz}セル'}")
+        print("===============================================")
+
+    def _with_factors(self, row_replication_factors, column_replication_factors):
+        """
+        複製前の情報を共有し、複製係数だけが異なるインスタンスを作る
+        """
+        expanded = ExpandableMatrixAndBackgrounds.__new__(ExpandableMatrixAndBackgrounds)
+        expanded._base = self._base
+        expanded.row_replication_factors = np.asarray(row_replication_factors, dtype=np.int64)
+        expanded.column_replication_factors = np.asarray(column_replication_factors, dtype=np.int64)
+        return expanded
+
+    def row_expanded(self, row_replication_factors):
+        """
+        行複製係数に従って行を複製した新しいインスタンスを生成するインスタンスメソッド
+
+        Parameters
+        ----------
+        row_replication_factors : list of int
+            行複製係数
+
+        Returns
+        -------
+        ExpandableMatrixAndBackgrounds
+            行複製後の新しいインスタンス（行列は複製前のものを共有する）
+        """
+        # 複製済みの行をさらに複製する場合は、複製前の行ごとの複製係数に合算する
+        factors = np.bincount(self.row_ids, weights=row_replication_factors, minlength=len(self.row_replication_factors))
+        # 列情報はそのまま
+        return self._with_factors(factors, self.column_replication_factors)
+
+    def column_expanded(self, column_replication_factors):
+        """
+        列複製係数に従って列を複製した新しいインスタンスを生成するインスタンスメソッド
+
+        Parameters
+        ----------
+        column_replication_factors : list of int
+            列複製係数
+
+        Returns
+        -------
+        ExpandableMatrixAndBackgrounds
+            列複製後の新しいインスタンス（行列は複製前のものを共有する）
+        """
+        # 複製済みの列をさらに複製する場合は、複製前の列ごとの複製係数に合算する
+        factors = np.bincount(self.col_ids, weights=column_replication_factors, minlength=len(self.column_replication_factors))
+        # 行情報はそのまま
+        return self._with_factors(self.row_replication_factors, factors)
+
+    def expanded(self, row_replication_factors, column_replication_factors):
+        """
+        行・列を複製係数に従って複製したインスタンスを生成する（複製後は長方形でもよい）
+
+        Parameters
+        ----------
+        row_replication_factors : list of int
+            行複製係数
+        column_replication_factors : list of int
+            列複製係数
+
+        Returns
+        -------
+        ExpandableMatrixAndBackgrounds
+            行・列複製後の新しいインスタンス（行列は複製前のものを共有する）
+        """
+        return self.row_expanded(row_replication_factors).column_expanded(column_replication_factors)
+
+    @property
+    def shape(self):
+        """
+        複製後の行数と列数
+        """
+        return int(self.row_replication_factors.sum()), int(self.column_replication_factors.sum())
+
+    @cached_property
+    def row_ids(self):
+        """
+        複製後の各行の複製前の行番号（整数の配列）
+        """
+        return np.repeat(np.arange(len(self.row_replication_factors)), self.row_replication_factors)
+
+    @cached_property
+    def col_ids(self):
+        """
+        複製後の各列の複製前の列番号（整数の配列）
+        """
+        return np.repeat(np.arange(len(self.column_replication_factors)), self.column_replication_factors)
+
+    @cached_property
+    def display_matrix(self):
+        """
+        複製後の行列（複製がなければ複製前の行列そのもの）
+        """
+        matrix = self._base["matrix"]
+        row_copied = self.shape[0] != len(self.row_replication_factors)
+        col_copied = self.shape[1] != len(self.column_replication_factors)
+        if row_copied and col_copied:
+            return matrix[np.ix_(self.row_ids, self.col_ids)]
+        if row_copied:
+            return matrix[self.row_ids]
+        if col_copied:
+            return matrix[:, self.col_ids]
+        return matrix
+
+    @cached_property
+    def sparse_matrix(self):
+        """
+        複製後の割当可能なセルだけの疎行列（割当不可のセルがなければNone）
+        """
+        sparse_matrix = self._base["sparse_matrix"]
+        if sparse_matrix is None or self.shape == sparse_matrix.shape:
+            return sparse_matrix
+        return sparse_matrix.expanded(self.row_replication_factors, self.column_replication_factors)
+
+    @cached_property
+    def row_names(self):
+        """
+        複製後の行名（2つ以上に複製した行は名前の後に1からの番号を付ける）
+        """
+        return self.expand_names(self._base["row_names"], self.row_replication_factors)
+
+    @cached_property
+    def column_names(self):
+        """
+        複製後の列名（2つ以上に複製した列は名前の後に1からの番号を付ける）
+        """
+        return self.expand_names(self._base["column_names"], self.column_replication_factors)
+
+    @cached_property
+    def row_priorities(self):
+        """
+        複製後の行の優先順位
+        """
+        return [priority for priority, factor in zip(self._base["row_priorities"], self.row_replication_factors) for _ in range(factor)]
+
+    @cached_property
+    def column_priorities(self):
+        """
+        複製後の列の優先順位
+        """
+        return [priority for priority, factor in zip(self._base["column_priorities"], self.column_replication_factors) for _ in range(factor)]
+
+    def expand_names(self, names, replication_factors):
+        """
+        名前を複製係数に従って展開する（名前が足りない行・列は空の名前にする）
+        """
+        expanded_names = []
+        for i, factor in enumerate(replication_factors):
+            if i < len(names):
+                name = names[i]
+            else:
+                name = ""
+            if factor == 1:
+                expanded_names.append(name)
+            else:
+                expanded_names.extend([f"{name}{j+1}" for j in range(factor)])
+        return expanded_names
+
+def split_text_to_array(input_text):
+    """
+    入力テキストをタブ、スペース、改行で分割し、配列に変換する。
+    """
+    return re.split(r'[\t|\s|\r\n|\r|\n]', input_text)
+
+def calculate_priority_ranking(numeric_matrix, matrix_type):
+    # 各行の合計を計算
+    sums = np.asarray(numeric_matrix, dtype=np.int64).sum(axis=1)
+    # ランキングを計算
+    # コスト行列ならTrue(小さいほど順位が高い)、利益行列ならFalse(大きいほど順位が高い)
+    ranks = pd.Series(sums).rank(method='min', ascending=not matrix_type).astype(int)
+    return ranks.tolist()
+
+def split_forbidden_cells(matrix):
+    """
+    疎行列モードで、行列を数値の行列と割当可能なセルのマスクに分ける
+
+    空欄・None・FORBIDDEN_MARKERSのセルは割当不可とし、数値の行列では0にする。
+    """
+    allowed_mask = [
+        [cell is not None and str(cell).strip() not in FORBIDDEN_MARKERS for cell in row]
+        for row in matrix
+    ]
+    numeric_matrix = [
+        [int(cell) if allowed else 0 for cell, allowed in zip(row, allowed_row)]
+        for row, allowed_row in zip(matrix, allowed_mask)
+    ]
+    return numeric_matrix, allowed_mask
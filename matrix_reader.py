@@ -0,0 +1,290 @@
+import csv
+import io
+import os
+import re
+import numpy as np
+import pandas as pd
+from sparse_matrix import FORBIDDEN_MARKERS
+
+
+# 読み込める行列ファイルの種類（拡張子）
+MATRIX_FILE_TYPES = ("tsv", "txt", "csv", "xlsx", "npy", "parquet")
+
+# ASCIIの整数のセル（int()と同じ値になる）
+_ASCII_INTEGER = r"[ \t]*[+-]?[0-9]+[ \t]*"
+# 全角数字はint()と同じくASCIIの数字として読む
+_FULLWIDTH_DIGITS = str.maketrans("０１２３４５６７８９", "0123456789")
+
+
+class MatrixParseError(ValueError):
+    """行列のセルを整数に変換できない場合に発生する例外"""
+    def __init__(self, row, col, value):
+        self.row = row
+        self.col = col
+        self.value = value
+        super().__init__(f"{row + 1}行{col + 1}列目のセル「{value}」を整数に変換できません")
+
+
+def read_matrix_text(text, sparse=False):
+    """
+    貼り付けたTSV（またはスペース区切り）のテキストを整数の行列に変換する
+
+    pandasのCパーサで読むので、数千行・数千列の行列でも行ごとの分割をPythonで行わない。
+    タブを含むテキストはタブ区切り、含まないテキストはスペース区切りとして読み、
+    空行は読み飛ばす。行によって列数が異なる場合はValueErrorを送出する。
+
+    Parameters
+    ----------
+    text : str
+        貼り付けた行列のテキスト
+    sparse : bool
+        Trueなら空のセルと「x」のセルを割当不可として読む
+
+    Returns
+    -------
+    numeric_matrix : numpy.ndarray
+        整数の行列（空のセル・割当不可のセルは0）
+    allowed_mask : numpy.ndarray or None
+        割当可能なセルをTrueとするブール行列（sparse=Falseなら None）
+    """
+    text = _ascii_digits(text)
+    _check_column_counts(text, "\t" if "\t" in text else " ")
+    return to_numeric_matrix(read_text_frame(text, dtype=_cell_dtype(text, sparse)), sparse)
+
+
+def read_text_frame(text, dtype=None):
+    """
+    貼り付けたテキストを表（DataFrame）として読む（dtype=strならセルを文字列のまま読む）
+    """
+    separator = "\t" if "\t" in text else " "
+    lines = text.splitlines()
+    cols = max((line.count(separator) + 1 for line in lines if line.strip()), default=0)
+    if cols == 0:
+        return pd.DataFrame()
+    return pd.read_csv(
+        io.StringIO(text), sep=separator, header=None, names=range(cols), index_col=False,
+        dtype=dtype, keep_default_na=False, na_values=[""], skip_blank_lines=True, low_memory=False
+    )
+
+
+def read_matrix(source, file_type, sparse=False):
+    """
+    行列ファイルを整数の行列として読む
+
+    CSV・TSV・XLSXは1行目から行列として読み（見出し行は持たない）、Parquetは列名を除いた値を行列とする。
+    CSV・TSVのセルはint()で読める値だけを受け付ける（全角数字は可、「1.0」「1e3」は不可）。
+    貼り付けたテキストと同じく、行によって列数が異なる場合はValueErrorを送出する
+    （XLSXでは末尾のセルが空の行を短い行とみなすので、行末の割当不可のセルは「x」で表す）。
+
+    Parameters
+    ----------
+    source : str or file-like
+        ファイルのパスまたはファイルオブジェクト（アップロードされたファイルなど）
+    file_type : str
+        ファイルの種類（MATRIX_FILE_TYPES のいずれか）
+    sparse : bool
+        Trueなら空のセルと「x」のセルを割当不可として読む
+
+    Returns
+    -------
+    numeric_matrix : numpy.ndarray
+        整数の行列（空のセル・割当不可のセルは0）
+    allowed_mask : numpy.ndarray or None
+        割当可能なセルをTrueとするブール行列（sparse=Falseなら None）
+    """
+    file_type = file_type.lower().lstrip(".")
+    if file_type == "npy":
+        array = np.load(source, allow_pickle=False)
+        if array.ndim != 2:
+            raise ValueError("2次元の配列を指定してください")
+        return to_numeric_matrix(pd.DataFrame(array), sparse)
+    if file_type == "parquet":
+        frame = pd.read_parquet(source)
+        frame.columns = range(frame.shape[1])
+    elif file_type == "xlsx":
+        # openpyxlが必要（未インストールならImportError）
+        frame = _check_row_lengths(pd.read_excel(source, header=None, dtype=object))
+    elif file_type in ("csv", "tsv", "txt"):
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, encoding="utf-8") as f:
+                text = f.read()
+        else:
+            text = source.read()
+        if isinstance(text, bytes):
+            text = text.decode("utf-8")
+        if file_type != "csv":
+            return read_matrix_text(text, sparse)
+        text = _ascii_digits(text)
+        _check_column_counts(text, ",")
+        frame = pd.read_csv(
+            io.StringIO(text), header=None, dtype=_cell_dtype(text, sparse),
+            keep_default_na=False, na_values=[""], skip_blank_lines=True, low_memory=False
+        )
+    else:
+        raise ValueError(f"対応していないファイルの種類です: {file_type}")
+    return to_numeric_matrix(frame, sparse)
+
+
+def _check_column_counts(text, separator):
+    """
+    空行を除く全ての行の区切り文字の数がそろっていることを確かめる
+
+    pandasは短い行の足りないセルを欠損で埋めるので、読む前に確かめないと0（疎行列モードでは割当不可）になる。
+    """
+    expected = None
+    for number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        count = line.count(separator)
+        if expected is None:
+            expected = count
+        elif count != expected:
+            raise ValueError(f"行によって列数が異なります（{number}行目）")
+
+
+def _check_row_lengths(frame):
+    """
+    XLSXの表から全てのセルが空の行を除き、末尾のセルが空の（短い）行がないことを確かめる
+    """
+    filled = frame.notna().to_numpy()
+    frame = frame[filled.any(axis=1)]
+    filled = filled[filled.any(axis=1)]
+    if filled.size:
+        short = np.flatnonzero(~filled[:, -1])
+        if len(short):
+            raise ValueError(f"行によって列数が異なります（{int(frame.index[short[0]]) + 1}行目）")
+    return frame
+
+
+def _ascii_digits(text):
+    """全角数字をASCIIの数字に置き換える（含まなければそのまま返す）"""
+    return text.translate(_FULLWIDTH_DIGITS) if re.search("[０-９]", text) else text
+
+
+def _cell_dtype(text, sparse):
+    """
+    テキストを表として読むときの列の型
+
+    ASCIIの数字・符号・空白（疎行列モードなら割当不可の記号も）だけのテキストなら、pandasが数値と
+    推定した列はint()で読める整数だけからなるので推定に任せる（None）。それ以外の文字
+    （小数点・指数など）を含む場合は、全てのセルを文字列（str）として読んでint()の規則で確かめる。
+    """
+    markers = "".join(re.escape(marker) for marker in FORBIDDEN_MARKERS) if sparse else ""
+    return None if re.search(f"[^0-9+\\-\\s{markers}]", text) is None else str
+
+
+def to_numeric_matrix(frame, sparse=False):
+    """
+    表（DataFrame）を整数の行列と割当可能なセルのマスクに変換する
+
+    数値の列はNumPyで、文字列を含む列はpandasのCパーサでまとめて変換する（セルごとのループはしない）。
+    整数に変換できないセルがあれば、その位置を MatrixParseError で知らせる。
+
+    Parameters
+    ----------
+    frame : pandas.DataFrame
+        行列の表（列の型は問わない）
+    sparse : bool
+        Trueなら空のセルと「x」のセルを割当不可とする（Falseなら空のセルは0とする）
+
+    Returns
+    -------
+    numeric_matrix : numpy.ndarray
+        整数の行列（空のセル・割当不可のセルは0）
+    allowed_mask : numpy.ndarray or None
+        割当可能なセルをTrueとするブール行列（sparse=Falseなら None）
+    """
+    rows, cols = frame.shape
+    numeric_matrix = np.zeros((rows, cols), dtype=np.int64)
+    blank_mask = np.zeros((rows, cols), dtype=bool)
+
+    # 整数の列はそのまま、小数（欠損を含む列）の列はまとめて変換する
+    integer_columns = [j for j, dtype in enumerate(frame.dtypes) if pd.api.types.is_integer_dtype(dtype)]
+    float_columns = [j for j, dtype in enumerate(frame.dtypes) if pd.api.types.is_float_dtype(dtype)]
+    if integer_columns:
+        numeric_matrix[:, integer_columns] = frame.iloc[:, integer_columns].to_numpy(dtype=np.int64)
+    if float_columns:
+        _fill_float_block(frame.iloc[:, float_columns].to_numpy(dtype=np.float64), float_columns,
+                          frame, numeric_matrix, blank_mask)
+
+    # 文字列を含む列はまとめて1列に並べて変換する
+    numeric_set = set(integer_columns + float_columns)
+    text_columns = [j for j in range(cols) if j not in numeric_set]
+    if text_columns:
+        cells = frame.iloc[:, text_columns].to_numpy(dtype=object)
+        try:
+            parsed, blank = _parse_cells(cells.ravel(), sparse)
+        except MatrixParseError as e:
+            i, k = divmod(e.row, len(text_columns))
+            raise MatrixParseError(i, text_columns[k], e.value) from None
+        numeric_matrix[:, text_columns] = parsed.reshape(rows, len(text_columns))
+        blank_mask[:, text_columns] = blank.reshape(rows, len(text_columns))
+
+    if not sparse:
+        return numeric_matrix, None
+    return numeric_matrix, ~blank_mask
+
+
+def _fill_float_block(values, columns, frame, numeric_matrix, blank_mask):
+    """
+    小数の列（欠損はNaN）をまとめて整数に変換して書き込む
+    """
+    blank = np.isnan(values)
+    bad = ~blank & (values != np.round(values))
+    if bad.any():
+        i, k = (int(index) for index in np.argwhere(bad)[0])
+        raise MatrixParseError(i, columns[k], frame.iat[i, columns[k]])
+    numeric_matrix[:, columns] = np.where(blank, 0, values).astype(np.int64)
+    blank_mask[:, columns] = blank
+
+
+def _parse_cells(values, sparse):
+    """
+    セルの値の配列を整数に変換する（空のセル・割当不可のセルは0とし、そのマスクも返す）
+
+    受け付けるセルはint()で読める文字列（前後の空白・全角数字を含む）と整数値の数値。
+    ASCIIの整数・空白・割当不可の記号だけのセルなら、改行で連結した1列のテキストとしてpandasのCパーサで読む。
+    そうでなければASCIIの整数のセルはまとめて変換し、残りのセルだけを1セルずつint()で確かめる。
+    """
+    na_values = list(FORBIDDEN_MARKERS) if sparse else [""]
+    try:
+        text = _ascii_digits("\n".join(values))
+    except TypeError:
+        text = None
+    if text is not None and text.count("\n") == len(values) - 1 and _cell_dtype(text, sparse) is None:
+        column = pd.read_csv(
+            io.StringIO("v\n" + text + "\n"), sep="\x1f", quoting=csv.QUOTE_NONE,
+            keep_default_na=False, na_values=na_values, skip_blank_lines=False, low_memory=False
+        )["v"]
+        if len(column) == len(values) and pd.api.types.is_integer_dtype(column.dtype):
+            return column.to_numpy(dtype=np.int64), np.zeros(len(values), dtype=bool)
+        if len(column) == len(values) and pd.api.types.is_float_dtype(column.dtype):
+            parsed = column.to_numpy(dtype=np.float64)
+            blank = np.isnan(parsed)
+            return np.where(blank, 0, parsed).astype(np.int64), blank
+
+    # 文字列以外（Excelの数値やNone）や、小数点などを含むセルがある場合
+    cells = pd.Series(values, dtype=object)
+    text = cells.astype("string").str.strip()
+    blank = text.isna() | (text == "")
+    if sparse:
+        blank |= text.isin(FORBIDDEN_MARKERS)
+    blank = blank.to_numpy(dtype=bool)
+    ascii_integer = text.str.fullmatch(_ASCII_INTEGER).fillna(False).to_numpy(dtype=bool) & ~blank
+    parsed = np.zeros(len(cells), dtype=np.int64)
+    parsed[ascii_integer] = text[ascii_integer].astype(np.int64).to_numpy()
+    for index in np.flatnonzero(~ascii_integer & ~blank):
+        parsed[index] = _parse_cell(index, values[index])
+    return parsed, blank
+
+
+def _parse_cell(index, value):
+    """1つのセルをint()と同じ規則で整数に変換する（数値は整数値のものだけを受け付ける）"""
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return int(value)
+    if isinstance(value, (str, int, np.integer)) and not isinstance(value, bool):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    raise MatrixParseError(index, 0, value)
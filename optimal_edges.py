@@ -0,0 +1,177 @@
+import numpy as np
+
+
+def optimal_edge_cells(shape, rows, cols, matching, free_cols=None):
+    """
+    被約費用0のセルのうち、少なくとも1つの最適完全マッチングに含まれるセルを求める
+
+    最適完全マッチングは被約費用0のセルだけからなる完全マッチングと一致する。
+    1つの完全マッチングMに対し、行rから「rが0で接続する列に割り当てられた行」へ辺を張った
+    交互路グラフを作ると、M以外のセル(r, c)が何らかの完全マッチングに含まれるのは
+    rとcに割り当てられた行が同じ強連結成分にある（交互閉路に乗る）場合に限る
+    （Dulmage-Mendelsohn分解）。
+
+    行数が列数より少ない場合は、割り当てずに残せる列（free_cols）にだけ0で接続する
+    ダミー行を足した正方の問題と同じになる。ダミー行は互いに入れ替えられるので1つの頂点にまとめ、
+    Mで割り当てられていない列はその頂点に割り当てられているとみなす。
+
+    セルの配列だけを扱うので、計算量とメモリは被約費用0のセル数に比例する。
+
+    Parameters
+    ----------
+    shape : tuple
+        行列の大きさ (行数, 列数)
+    rows : numpy.ndarray
+        被約費用0のセルの行
+    cols : numpy.ndarray
+        被約費用0のセルの列
+    matching : list
+        被約費用0のセルだけを使う（全ての行の）最適割当 [(row, col), ...]
+    free_cols : numpy.ndarray or None
+        割り当てずに残せる列をTrueとするブール配列（行数が列数より少ない場合）
+
+    Returns
+    -------
+    optimal : numpy.ndarray
+        セルごとに、何らかの最適完全マッチングに含まれるならTrueとするブール配列
+    """
+    num_rows, num_cols = shape
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    # 割り当てられていない列はダミー行の頂点（番号num_rows）に割り当てられているとみなす
+    row_of_col = np.full(num_cols, num_rows, dtype=np.int64)
+    for row, col in matching:
+        row_of_col[col] = row
+
+    targets = row_of_col[cols]
+    sources = rows
+    num_vertices = num_rows
+    if free_cols is not None:
+        # ダミー行からは、割り当てずに残せる列に割り当てられた行へ辺を張る
+        dummy_targets = row_of_col[np.flatnonzero(free_cols)]
+        sources = np.concatenate([rows, np.full(len(dummy_targets), num_rows)])
+        targets = np.concatenate([targets, dummy_targets])
+        num_vertices = num_rows + 1
+    component = strongly_connected_components(num_vertices, sources, targets)
+    # 割当のセル自身はrow_of_col[col] == rowなので常に含まれる
+    return component[rows] == component[row_of_col[cols]]
+
+
+def strongly_connected_components(n, sources, targets):
+    """
+    有向グラフの強連結成分番号を求める（反復版Tarjan法）
+
+    Parameters
+    ----------
+    n : int
+        頂点数
+    sources : numpy.ndarray
+        辺の始点
+    targets : numpy.ndarray
+        辺の終点
+
+    Returns
+    -------
+    component : numpy.ndarray
+        頂点ごとの強連結成分番号
+    """
+    # 始点でソートしたCSR形式の隣接リスト
+    order = np.argsort(sources, kind="stable")
+    adjacency = targets[order].tolist()
+    offsets = np.searchsorted(sources[order], np.arange(n + 1)).tolist()
+
+    index = [-1] * n
+    lowlink = [0] * n
+    on_stack = [False] * n
+    component = [-1] * n
+    stack = []
+    next_index = 0
+    next_component = 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        # (頂点, 次に調べる辺の位置) の呼び出しスタック
+        call_stack = [(root, offsets[root])]
+        index[root] = lowlink[root] = next_index
+        next_index += 1
+        stack.append(root)
+        on_stack[root] = True
+        while call_stack:
+            v, edge = call_stack[-1]
+            if edge < offsets[v + 1]:
+                call_stack[-1] = (v, edge + 1)
+                w = adjacency[edge]
+                if index[w] == -1:
+                    index[w] = lowlink[w] = next_index
+                    next_index += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    call_stack.append((w, offsets[w]))
+                elif on_stack[w] and index[w] < lowlink[v]:
+                    lowlink[v] = index[w]
+                continue
+
+            call_stack.pop()
+            if call_stack:
+                parent = call_stack[-1][0]
+                if lowlink[v] < lowlink[parent]:
+                    lowlink[parent] = lowlink[v]
+            if lowlink[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component[w] = next_component
+                    if w == v:
+                        break
+                next_component += 1
+
+    return np.array(component, dtype=np.int64)
+
+
+def matching_components(shape, rows, cols, matching):
+    """
+    割当可能なセルの二部グラフの連結成分を、行ごと・列ごとの成分番号として求める
+
+    割り当てられた列は割り当てられた行と同じ成分に属する。行数が列数より少ない場合に
+    割り当てられていない列は、その列と割当可能なセルでつながる行と同じ成分に属する。
+
+    Parameters
+    ----------
+    shape : tuple
+        行列の大きさ (行数, 列数)
+    rows : numpy.ndarray
+        割当可能なセルの行
+    cols : numpy.ndarray
+        割当可能なセルの列
+    matching : list
+        割当可能なセルだけを使う（全ての行の）割当 [(row, col), ...]
+
+    Returns
+    -------
+    row_component : numpy.ndarray
+        行ごとの連結成分番号
+    col_component : numpy.ndarray
+        列ごとの連結成分番号（割当可能なセルが1つもない列は-1）
+    """
+    num_rows, num_cols = shape
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    # 割り当てられていない列には、行の後ろに自分の頂点を割り振る
+    row_of_col = np.full(num_cols, -1, dtype=np.int64)
+    for row, col in matching:
+        row_of_col[col] = row
+    free = row_of_col == -1
+    row_of_col[free] = num_rows + np.arange(int(free.sum()))
+    num_vertices = num_rows + int(free.sum())
+
+    # 行とその列の頂点を双方向に結ぶと、強連結成分が連結成分になる
+    targets = row_of_col[cols]
+    component = strongly_connected_components(
+        num_vertices,
+        np.concatenate([rows, targets]),
+        np.concatenate([targets, rows])
+    )
+    col_component = component[row_of_col]
+    col_component[np.bincount(cols, minlength=num_cols) == 0] = -1
+    return component[:num_rows], col_component
@@ -0,0 +1,101 @@
+import numpy as np
+
+
+# 割当不可のセルとして扱う入力（疎行列モード）
+FORBIDDEN_MARKERS = ("", "x", "X", "×")
+
+
+class SparseMatrix:
+    """
+    割当可能なセルだけを持つ疎行列
+
+    行・列・値の配列（COO形式）を行優先・列優先の順に並べて持つので、
+    row_offsets() でそのままCSR形式の行ポインタが得られる。
+    含まれないセルは割当不可を表す。
+    """
+    def __init__(self, shape, rows, cols, values):
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        values = np.asarray(values, dtype=np.int64)
+        order = np.lexsort((cols, rows))
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.rows = rows[order]
+        self.cols = cols[order]
+        self.values = values[order]
+
+    @classmethod
+    def from_dense(cls, matrix, allowed_mask):
+        """
+        密行列と割当可能なセルのマスクから作る
+
+        Parameters
+        ----------
+        matrix : list or numpy.ndarray
+            値の行列（割当不可のセルの値は使わない）
+        allowed_mask : list or numpy.ndarray
+            割当可能なセルをTrueとするブール行列
+        """
+        allowed_mask = np.asarray(allowed_mask, dtype=bool)
+        rows, cols = np.nonzero(allowed_mask)
+        return cls(allowed_mask.shape, rows, cols, np.asarray(matrix)[rows, cols])
+
+    @property
+    def nnz(self):
+        """割当可能なセルの数"""
+        return len(self.values)
+
+    def row_offsets(self):
+        """CSR形式の行ポインタ（行iのセルは row_offsets[i]:row_offsets[i+1]）"""
+        return np.searchsorted(self.rows, np.arange(self.shape[0] + 1))
+
+    def empty_rows(self):
+        """割当可能なセルが1つもない行"""
+        return np.flatnonzero(np.bincount(self.rows, minlength=self.shape[0]) == 0)
+
+    def empty_cols(self):
+        """割当可能なセルが1つもない列"""
+        return np.flatnonzero(np.bincount(self.cols, minlength=self.shape[1]) == 0)
+
+    def expanded(self, row_replication_factors, column_replication_factors):
+        """
+        複製係数に従って行・列を複製した疎行列を返す（セル数は複製後の割当可能なセル数になる）
+
+        Parameters
+        ----------
+        row_replication_factors : list[int]
+            行複製係数
+        column_replication_factors : list[int]
+            列複製係数
+        """
+        row_factors = np.asarray(row_replication_factors, dtype=np.int64)
+        col_factors = np.asarray(column_replication_factors, dtype=np.int64)
+        row_starts = np.concatenate([[0], np.cumsum(row_factors)[:-1]])
+        col_starts = np.concatenate([[0], np.cumsum(col_factors)[:-1]])
+
+        # セルごとの複製数（行の複製数×列の複製数）だけ並べ、複製内の位置を行・列に分ける
+        cell_col_factors = col_factors[self.cols]
+        counts = row_factors[self.rows] * cell_col_factors
+        source = np.repeat(np.arange(self.nnz), counts)
+        offsets = np.arange(len(source)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return SparseMatrix(
+            (int(row_factors.sum()), int(col_factors.sum())),
+            row_starts[self.rows[source]] + offsets // cell_col_factors[source],
+            col_starts[self.cols[source]] + offsets % cell_col_factors[source],
+            self.values[source]
+        )
+
+    def transpose(self):
+        """行と列を入れ替えた疎行列"""
+        return SparseMatrix((self.shape[1], self.shape[0]), self.cols, self.rows, self.values)
+
+    def allowed_mask(self):
+        """割当可能なセルをTrueとする密なブール行列"""
+        mask = np.zeros(self.shape, dtype=bool)
+        mask[self.rows, self.cols] = True
+        return mask
+
+    def toarray(self, fill=0):
+        """割当不可のセルをfillで埋めた密行列"""
+        dense = np.full(self.shape, fill, dtype=np.int64)
+        dense[self.rows, self.cols] = self.values
+        return dense
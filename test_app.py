@@ -0,0 +1,40 @@
+from streamlit.testing.v1 import AppTest
+
+
+def run_app(matrix_text, matrix_type=0, sparse=False, transportation=False):
+    """行列を貼り付けてチェックボックスを設定し、割当ボタンを押したアプリを返す"""
+    at = AppTest.from_file("app.py", default_timeout=60)
+    at.run()
+    next(text_area for text_area in at.text_area if "行列" in text_area.label).input(matrix_text).run()
+    next(radio for radio in at.radio if "コスト行列" in radio.label).set_value(matrix_type).run()
+    if sparse:
+        next(checkbox for checkbox in at.checkbox if "割当不可" in checkbox.label).check().run()
+    if transportation:
+        next(checkbox for checkbox in at.checkbox if "輸送問題" in checkbox.label).check().run()
+    next(button for button in at.button if button.label == "割当").click().run()
+    assert not at.exception
+    return at
+
+
+def error_messages(at):
+    return [markdown.value for markdown in at.markdown if "color: red" in markdown.value]
+
+
+def test_transportation_rejects_forbidden_cells():
+    # 疎行列モードの割当不可のセルを値0のセルとして解いていた
+    at = run_app("5\tx\nx\t5", sparse=True, transportation=True)
+    assert any("割当不可のセル" in message for message in error_messages(at))
+    assert at.session_state.solve_result is None
+
+
+def test_transportation_in_sparse_mode_without_forbidden_cells():
+    at = run_app("5\t1\n1\t5", sparse=True, transportation=True)
+    assert error_messages(at) == []
+    assert at.session_state.solve_result["total_assignment"] == 2
+
+
+def test_sparse_mode_avoids_forbidden_cells():
+    # 割当可能行列は割当可能なセルだけを持つ疎行列で返る
+    at = run_app("1\tx\t9\n9\t1\tx\nx\t9\t1", sparse=True)
+    assert error_messages(at) == []
+    assert at.session_state.solve_result["total_assignment"] == 3
@@ -0,0 +1,282 @@
+import itertools
+import re
+import numpy as np
+import pytest
+import batch_assignment
+from assignment import assign, make_sorted_priority_groups
+from assignment_cache import ResultCache, cached_assign, cached_call
+from batch_assignment import assign_many
+from lsa_backends import InfeasibleAssignmentError
+from sparse_matrix import SparseMatrix
+from transportation import assign_replicated
+from warm_start import WarmStart
+
+
+def brute_force_values(matrix, row_priorities, col_priorities, priority_flag, matrix_type, allowed_mask=None):
+    """
+    全ての割当を列挙して、(合計コスト, 段階ごとのグループのコスト...) の辞書式最小値を求める
+
+    allowed_maskを渡した場合は割当可能なセルだけを使う割当を列挙する（コストは割当可能なセルの最大値から引く）
+    """
+    C = np.asarray(matrix)
+    if matrix_type == 1:
+        C = (C.max() if allowed_mask is None else C[np.asarray(allowed_mask)].max()) - C
+    return min(
+        lexicographic_values(C, list(enumerate(cols)), row_priorities, col_priorities, priority_flag)
+        for cols in itertools.permutations(range(C.shape[1]), C.shape[0])
+        if allowed_mask is None or all(allowed_mask[i][j] for i, j in enumerate(cols))
+    )
+
+
+def lexicographic_values(C, assignments, row_priorities, col_priorities, priority_flag):
+    """
+    割当の (合計コスト, 段階ごとのグループのコスト...) を求める（行数が列数より少なければ行の段階だけ）
+    """
+    stages = [(0, rows) for _, rows in make_sorted_priority_groups(row_priorities)]
+    if C.shape[0] == C.shape[1]:
+        col_stages = [(1, cols) for _, cols in make_sorted_priority_groups(col_priorities)]
+        stages = stages + col_stages if priority_flag == 0 else col_stages + stages
+    values = [sum(int(C[i, j]) for i, j in assignments)]
+    for axis, members in stages:
+        members = set(members)
+        values.append(sum(int(C[i, j]) for i, j in assignments if (i, j)[axis] in members))
+    return tuple(values)
+
+
+def check_against_brute_force(matrix, row_priorities, col_priorities, priority_flag, matrix_type, **options):
+    _, total_assignment, assignments = assign(
+        np.array(matrix), row_priorities, col_priorities, priority_flag, matrix_type, seed=0, **options
+    )
+    M = np.asarray(matrix)
+    C = M.max() - M if matrix_type == 1 else M
+    assert sorted(i for i, _ in assignments) == list(range(M.shape[0]))
+    assert len({j for _, j in assignments}) == M.shape[0]
+    assert total_assignment == sum(int(M[i, j]) for i, j in assignments)
+    assert lexicographic_values(C, assignments, row_priorities, col_priorities, priority_flag) == \
+        brute_force_values(M, row_priorities, col_priorities, priority_flag, matrix_type)
+
+
+@pytest.mark.parametrize("engine", ["cpsat", "matching"])
+def test_positive_costs_single_row_group(engine):
+    # 全てのコストが正で、行の優先順位が1グループだけの場合（matchingエンジンが禁止したセルを選んでいた）
+    matrix = [[12, 11, 11, 14], [13, 11, 11, 12], [11, 11, 10, 10], [13, 14, 14, 10]]
+    check_against_brute_force(matrix, [1] * 4, [2, 2, 1, 2], 0, 0, engine=engine)
+
+
+SOLVER_OPTIONS = [
+    {"engine": "cpsat", "backend": backend, "scalarize": scalarize}
+    for backend in ("munkres", "jv", "ortools") for scalarize in (True, False)
+] + [{"engine": "matching", "backend": backend} for backend in ("munkres", "jv", "ortools")]
+
+
+def random_problems(seed, count=15, max_size=6, rectangular=False):
+    """
+    同点解の多い小さな問題を作る（コストの下限を0からずらしたものや、優先順位が1グループだけのものも含む）
+    """
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        num_rows = int(rng.integers(1, max_size + 1))
+        num_cols = int(rng.integers(num_rows, max_size + 1)) if rectangular else num_rows
+        offset = int(rng.choice([0, 10, 100]))
+        matrix = (offset + rng.integers(0, int(rng.choice([2, 3, 6])), (num_rows, num_cols))).tolist()
+        num_groups = int(rng.integers(1, 4))
+        row_priorities = [int(p) for p in rng.integers(1, num_groups + 1, num_rows)]
+        col_priorities = [int(p) for p in rng.integers(1, num_groups + 1, num_cols)]
+        yield matrix, row_priorities, col_priorities, int(rng.integers(0, 2))
+
+
+@pytest.mark.parametrize("matrix_type", [0, 1])
+@pytest.mark.parametrize("options", SOLVER_OPTIONS, ids=lambda options: "-".join(map(str, options.values())))
+def test_square_matches_brute_force(options, matrix_type):
+    for matrix, row_priorities, col_priorities, priority_flag in random_problems(seed=matrix_type):
+        check_against_brute_force(matrix, row_priorities, col_priorities, priority_flag, matrix_type, **options)
+
+
+@pytest.mark.parametrize("matrix_type", [0, 1])
+@pytest.mark.parametrize("engine", ["cpsat", "matching"])
+def test_rectangular_matches_brute_force(engine, matrix_type):
+    for matrix, row_priorities, col_priorities, priority_flag in random_problems(seed=10 + matrix_type, rectangular=True):
+        check_against_brute_force(matrix, row_priorities, col_priorities, priority_flag, matrix_type, engine=engine)
+
+
+def test_warm_start_matches_fresh_solve():
+    rng = np.random.default_rng(0)
+    warm_start = WarmStart()
+    matrix = rng.integers(0, 20, (8, 8))
+    priorities = [1] * 8
+    for _ in range(10):
+        _, warm_total, _ = assign(matrix, priorities, priorities, 0, 1, seed=0, warm_start=warm_start)
+        _, fresh_total, _ = assign(matrix, priorities, priorities, 0, 1, seed=0)
+        assert warm_total == fresh_total
+        matrix = matrix.copy()
+        matrix[rng.integers(8), rng.integers(8)] = rng.integers(0, 25)
+
+
+def transportation_problems(seed, count=20, max_size=4, max_total=7):
+    """
+    複製係数（容量）が2以上の行・列を含む輸送問題を作る（複製前の行列は長方形のものも含む）
+    """
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        num_rows = int(rng.integers(1, max_size + 1))
+        num_cols = int(rng.integers(1, max_size + 1))
+        total = int(rng.integers(max(num_rows, num_cols) + 1, max_total + 1))
+        row_factors = (1 + rng.multinomial(total - num_rows, [1 / num_rows] * num_rows)).tolist()
+        col_factors = (1 + rng.multinomial(total - num_cols, [1 / num_cols] * num_cols)).tolist()
+        offset = int(rng.choice([0, 10]))
+        matrix = (offset + rng.integers(0, int(rng.choice([2, 3, 6])), (num_rows, num_cols))).tolist()
+        num_groups = int(rng.integers(1, 4))
+        row_priorities = [int(p) for p in rng.integers(1, num_groups + 1, num_rows)]
+        col_priorities = [int(p) for p in rng.integers(1, num_groups + 1, num_cols)]
+        yield matrix, row_factors, col_factors, row_priorities, col_priorities, int(rng.integers(0, 2))
+
+
+@pytest.mark.parametrize("matrix_type", [0, 1])
+def test_transportation_matches_expanded_assign(matrix_type):
+    for matrix, row_factors, col_factors, row_priorities, col_priorities, priority_flag in transportation_problems(seed=20 + matrix_type):
+        _, total_assignment, assignments = assign_replicated(
+            matrix, row_factors, col_factors, row_priorities, col_priorities, priority_flag, matrix_type, seed=0
+        )
+        # 行・列を複製係数の数だけ並べた行列をassignで解いた場合と比べる
+        expanded = np.repeat(np.repeat(np.array(matrix), row_factors, axis=0), col_factors, axis=1)
+        expanded_row_priorities = np.repeat(row_priorities, row_factors).tolist()
+        expanded_col_priorities = np.repeat(col_priorities, col_factors).tolist()
+        _, expected_total, expected_assignments = assign(
+            expanded, expanded_row_priorities, expanded_col_priorities, priority_flag, matrix_type, seed=0
+        )
+        n = len(expanded)
+        assert sorted(i for i, _ in assignments) == list(range(n))
+        assert sorted(j for _, j in assignments) == list(range(n))
+        assert total_assignment == expected_total == sum(int(expanded[i, j]) for i, j in assignments)
+        C = expanded.max() - expanded if matrix_type == 1 else expanded
+        assert lexicographic_values(C, assignments, expanded_row_priorities, expanded_col_priorities, priority_flag) == \
+            lexicographic_values(C, expected_assignments, expanded_row_priorities, expanded_col_priorities, priority_flag)
+
+
+def test_cached_call_stores_only_final_results():
+    cache = ResultCache(cache_dir=None)
+    calls = []
+
+    def solve(value):
+        calls.append(value)
+        return {"value": value, "final": len(calls) > 1}
+
+    def is_final(result):
+        return result["final"]
+
+    assert not cached_call("solve", solve, (1,), {}, cache, is_final)["final"]
+    # 保存されなかった結果は解き直し、最終的な結果だけが保存される
+    assert cached_call("solve", solve, (1,), {}, cache, is_final)["final"]
+    assert cached_call("solve", solve, (1,), {}, cache, is_final)["final"]
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("disk", [False, True])
+def test_cached_assign_stores_only_optimal_results(disk, tmp_path):
+    cache = ResultCache(max_entries=0 if disk else 8, cache_dir=str(tmp_path) if disk else None)
+    rng = np.random.default_rng(0)
+    matrix = rng.integers(0, 3, (8, 8))
+    priorities = [int(p) for p in rng.integers(1, 4, 8)]
+
+    # 制限時間で打ち切った結果は保存しない
+    *_, info = cached_assign(matrix, priorities, priorities, 0, 0, cache=cache, time_limit=0, return_info=True)
+    assert info["status"] == "FEASIBLE"
+    assert len(cache.memory) == 0 and list(tmp_path.iterdir()) == []
+
+    _, total_assignment, assignments, info = cached_assign(matrix, priorities, priorities, 0, 0, cache=cache, return_info=True)
+    assert info["status"] == "OPTIMAL"
+    assert cache.hits == 0
+    # return_infoの有無によらず同じ結果を使う（ディスク層は別のインスタンスからも読める）
+    other = ResultCache(max_entries=0, cache_dir=str(tmp_path)) if disk else cache
+    assert cached_assign(matrix, priorities, priorities, 0, 0, cache=other)[1:] == (total_assignment, assignments)
+    assert other.hits == 1
+
+
+def test_cached_assign_returns_copies():
+    cache = ResultCache(cache_dir=None)
+    matrix = np.array([[1, 2], [2, 1]])
+    first = cached_assign(matrix, [1, 1], [1, 1], 0, 0, cache=cache)
+    first[0][0, 0] = 99
+    first[2].append((9, 9))
+    second = cached_assign(matrix, [1, 1], [1, 1], 0, 0, cache=cache)
+    assert second[0][0, 0] == 0 and second[2] == [(0, 0), (1, 1)]
+    second[2].clear()
+    assert cached_assign(matrix, [1, 1], [1, 1], 0, 0, cache=cache)[2] == [(0, 0), (1, 1)]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_assign_many_matches_brute_force(workers, monkeypatch):
+    # 小さな行列も共有メモリでワーカーに渡す
+    monkeypatch.setattr(batch_assignment, "SHARED_MEMORY_MIN_BYTES", 0)
+    problems = [
+        {"original_matrix": np.array(matrix), "row_priorities": row_priorities, "col_priorities": col_priorities,
+         "priority_flag": priority_flag, "matrix_type": index % 2, "seed": 0}
+        for index, (matrix, row_priorities, col_priorities, priority_flag) in enumerate(random_problems(seed=30, count=8))
+    ]
+    results = list(assign_many(iter(problems), workers=workers, max_pending=3))
+    # 終わった順に返るが、各問題の位置と結果がそろっている（逐次なら入力の順）
+    indices = [index for index, _ in results]
+    assert sorted(indices) == list(range(len(problems)))
+    if workers == 1:
+        assert indices == list(range(len(problems)))
+    for index, (_, total_assignment, assignments) in results:
+        problem = problems[index]
+        M = problem["original_matrix"]
+        C = M.max() - M if problem["matrix_type"] == 1 else M
+        args = (problem["row_priorities"], problem["col_priorities"], problem["priority_flag"])
+        assert total_assignment == sum(int(M[i, j]) for i, j in assignments)
+        assert lexicographic_values(C, assignments, *args) == brute_force_values(M, *args, problem["matrix_type"])
+
+
+@pytest.mark.parametrize("rectangular", [False, True])
+@pytest.mark.parametrize("options", [{"engine": "cpsat"}, {"engine": "cpsat", "scalarize": True}, {"engine": "matching"}],
+                         ids=lambda options: "-".join(map(str, options.values())))
+def test_sparse_matches_brute_force(options, rectangular):
+    rng = np.random.default_rng(40 + rectangular)
+    for index, (matrix, row_priorities, col_priorities, priority_flag) in enumerate(random_problems(seed=40 + rectangular, rectangular=rectangular)):
+        M = np.array(matrix)
+        num_rows, num_cols = M.shape
+        # 完全な割当が1つは存在するように、ランダムな割当のセルは必ず割当可能にする
+        allowed_mask = rng.random(M.shape) < 0.5
+        allowed_mask[np.arange(num_rows), rng.permutation(num_cols)[:num_rows]] = True
+        matrix_type = index % 2
+        assignment_matrix, total_assignment, assignments = assign(
+            SparseMatrix.from_dense(M, allowed_mask), row_priorities, col_priorities, priority_flag, matrix_type, seed=0, **options
+        )
+        assert all(allowed_mask[i, j] for i, j in assignments)
+        assert total_assignment == sum(int(M[i, j]) for i, j in assignments)
+        C = M[allowed_mask].max() - M if matrix_type == 1 else M
+        assert lexicographic_values(C, assignments, row_priorities, col_priorities, priority_flag) == \
+            brute_force_values(M, row_priorities, col_priorities, priority_flag, matrix_type, allowed_mask)
+        # 割当可能行列は割当可能なセルだけを持ち、割り当てたセルは0
+        assert isinstance(assignment_matrix, SparseMatrix) and assignment_matrix.shape == M.shape
+        assert np.array_equal(assignment_matrix.allowed_mask(), allowed_mask)
+        zero_mask = assignment_matrix.toarray(fill=-1) == 0
+        assert all(zero_mask[i, j] for i, j in assignments)
+
+
+def test_sparse_transposed_returns_transposed_matrix():
+    # 行数が列数より多い場合は転置して解き、割当可能行列も元の向きに戻す
+    allowed_mask = np.array([[True, False], [True, True], [False, True]])
+    M = np.array([[1, 2], [3, 4], [5, 6]])
+    assignment_matrix, total_assignment, assignments = assign(SparseMatrix.from_dense(M, allowed_mask), [1, 1, 1], [1, 1], 0, 0, seed=0)
+    assert assignments == [(0, 0), (1, 1)] and total_assignment == 5
+    assert assignment_matrix.shape == (3, 2)
+    assert np.array_equal(assignment_matrix.allowed_mask(), allowed_mask)
+
+
+@pytest.mark.parametrize("allowed_mask, message", [
+    # 割当可能なセルがない行
+    ([[True, True, False], [False, False, False], [True, True, True]], "行: [1]"),
+    # 2つの行が同じ1つの列にしか割り当てられない
+    ([[True, False, False], [True, False, False], [True, True, True]], "最大で2/3組"),
+    # 長方形でも全ての行を割り当てられない
+    ([[False, True, False, False], [False, True, False, False]], "最大で1/2組"),
+])
+@pytest.mark.parametrize("engine", ["cpsat", "matching"])
+def test_sparse_infeasible_is_detected(allowed_mask, message, engine):
+    allowed_mask = np.array(allowed_mask)
+    sparse_matrix = SparseMatrix.from_dense(np.ones(allowed_mask.shape, dtype=int), allowed_mask)
+    priorities = [1] * allowed_mask.shape[0], [1] * allowed_mask.shape[1]
+    with pytest.raises(InfeasibleAssignmentError, match=re.escape(message)):
+        assign(sparse_matrix, *priorities, 0, 0, engine=engine)
@@ -0,0 +1,106 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from matrix_reader import MatrixParseError, read_matrix, read_matrix_text
+
+
+def read_file(data, file_type, sparse=False):
+    return read_matrix(io.BytesIO(data.encode("utf-8")), file_type, sparse)
+
+
+@pytest.mark.parametrize("text, row, col, value", [
+    ("1\t2\n3\tabc", 1, 1, "abc"),
+    ("1\t2.5\n3\t4", 0, 1, "2.5"),
+    ("1 2 3\n4 5 1e3", 1, 2, "1e3"),
+])
+def test_parse_error_reports_cell_position(text, row, col, value):
+    with pytest.raises(MatrixParseError) as error:
+        read_matrix_text(text)
+    assert (error.value.row, error.value.col, error.value.value) == (row, col, value)
+    assert f"{row + 1}行{col + 1}列目" in str(error.value)
+
+
+def test_csv_parse_error_reports_cell_position():
+    with pytest.raises(MatrixParseError) as error:
+        read_file("1,2\n3,4\n5,6.0\n", "csv")
+    assert (error.value.row, error.value.col) == (2, 1)
+
+
+def test_fullwidth_digits_and_signs():
+    matrix, allowed_mask = read_matrix_text("１２\t-３\n+4\t 5 ")
+    assert matrix.tolist() == [[12, -3], [4, 5]]
+    assert allowed_mask is None
+    matrix, _ = read_file("１,２\n３,４\n", "csv")
+    assert matrix.tolist() == [[1, 2], [3, 4]]
+
+
+def test_blank_cells_and_lines():
+    # 空行は読み飛ばし、空のセルは0（疎行列モードでは割当不可）になる
+    matrix, allowed_mask = read_matrix_text("1\t\t3\n\n4\t5\t6\n")
+    assert matrix.tolist() == [[1, 0, 3], [4, 5, 6]]
+    assert allowed_mask is None
+    matrix, allowed_mask = read_matrix_text("1\t\t3\n\n4\t5\t6\n", sparse=True)
+    assert matrix.tolist() == [[1, 0, 3], [4, 5, 6]]
+    assert allowed_mask.tolist() == [[True, False, True], [True, True, True]]
+
+
+@pytest.mark.parametrize("file_type", [None, "csv", "tsv"])
+def test_forbidden_markers(file_type):
+    rows = [["1", "x", "3"], ["X", "5", "×"], ["", "8", "9"]]
+    if file_type is None:
+        matrix, allowed_mask = read_matrix_text("\n".join("\t".join(row) for row in rows), sparse=True)
+    else:
+        separator = "," if file_type == "csv" else "\t"
+        matrix, allowed_mask = read_file("\n".join(separator.join(row) for row in rows), file_type, sparse=True)
+    assert matrix.tolist() == [[1, 0, 3], [0, 5, 0], [0, 8, 9]]
+    assert allowed_mask.tolist() == [[True, False, True], [False, True, False], [False, True, True]]
+
+
+def test_forbidden_markers_are_rejected_outside_sparse_mode():
+    with pytest.raises(MatrixParseError) as error:
+        read_matrix_text("1\t2\nx\t4")
+    assert (error.value.row, error.value.col) == (1, 0)
+
+
+@pytest.mark.parametrize("file_type, text", [
+    (None, "1\t2\n3\n"),
+    (None, "1 2\n3 4 5\n"),
+    ("csv", "1,2\n3\n"),
+    ("tsv", "1\t2\n3\n"),
+    ("txt", "1 2\n3\n"),
+])
+@pytest.mark.parametrize("sparse", [False, True])
+def test_ragged_rows_are_rejected(file_type, text, sparse):
+    # 短い行を欠損で埋めて0（疎行列モードでは割当不可）として読んでいた
+    with pytest.raises(ValueError, match="列数が異なります（2行目）"):
+        if file_type is None:
+            read_matrix_text(text, sparse)
+        else:
+            read_file(text, file_type, sparse)
+
+
+def test_trailing_blank_cells_with_separators_are_not_ragged():
+    matrix, allowed_mask = read_file("1,\nx,4\n", "csv", sparse=True)
+    assert matrix.tolist() == [[1, 0], [0, 4]]
+    assert allowed_mask.tolist() == [[True, False], [False, True]]
+
+
+def test_xlsx_ragged_rows_are_rejected(tmp_path):
+    pytest.importorskip("openpyxl")
+    path = tmp_path / "matrix.xlsx"
+    pd.DataFrame([[1, 2], [3, None]]).to_excel(path, header=False, index=False)
+    with pytest.raises(ValueError, match="列数が異なります（2行目）"):
+        read_matrix(str(path), "xlsx")
+    pd.DataFrame([[1, "x"], [None, 4]]).to_excel(path, header=False, index=False)
+    matrix, allowed_mask = read_matrix(str(path), "xlsx", sparse=True)
+    assert matrix.tolist() == [[1, 0], [0, 4]]
+    assert allowed_mask.tolist() == [[True, False], [False, True]]
+
+
+def test_npy_matrix(tmp_path):
+    path = tmp_path / "matrix.npy"
+    np.save(path, np.array([[1, 2], [3, 4]]))
+    matrix, allowed_mask = read_matrix(str(path), "npy")
+    assert matrix.tolist() == [[1, 2], [3, 4]]
+    assert allowed_mask is None
@@ -0,0 +1,294 @@
+import numpy as np
+import random
+from ortools.graph.python import min_cost_flow
+from ortools.sat.python import cp_model
+from assignment import make_sorted_priority_groups
+from sparse_matrix import SparseMatrix
+
+
+class TransportationError(Exception):
+    """輸送問題として解けない入力や、ソルバーが最適解を返さなかった場合に発生する例外"""
+    pass
+
+
+def assign_replicated(numeric_matrix, row_replication_factors, column_replication_factors,
+                      row_priorities, col_priorities, priority_flag, matrix_type, seed=None):
+    """
+    複製係数を容量とする輸送問題として割り当てる
+
+    正方行列に展開せず元の行列のまま最小費用流で解き、優先順位による辞書式最適化も
+    元の行・列単位の整数流量で行う。複製ごとの割当への展開は最後に一度だけ行い、
+    被約費用行列も元の大きさのまま返すため、計算量とメモリは複製係数の和ではなく
+    元の行数・列数に依存する（割当のリストだけが複製係数の和に比例する）。
+
+    Parameters
+    ----------
+    numeric_matrix : list or numpy.ndarray or sparse_matrix.SparseMatrix
+        複製前の行列（SparseMatrixに割当不可のセルがあればTransportationErrorを送出する）
+    row_replication_factors : list[int]
+        行複製係数（行の供給量）
+    column_replication_factors : list[int]
+        列複製係数（列の需要量）
+    row_priorities : list[int]
+        複製前の行ごとの優先順位
+    col_priorities : list[int]
+        複製前の列ごとの優先順位
+    priority_flag : int
+        優先順位のフラグ（0: 行優先, 1: 列優先）
+    matrix_type : int
+        行列の種類(0ならコスト行列、1なら利益行列)
+    seed : int or None
+        同点解をランダムに選ぶ行・列シャッフルの乱数シード（Noneならグローバルな乱数を使う）
+
+    Returns
+    -------
+    assignment_matrix : numpy.ndarray
+        複製前の行列の被約費用行列（0が割当可能）。複製後の行列のセル(i, j)は、
+        その複製元のセルの値になる
+    total_assignment : int
+        割当利益orコストの総和
+    assignments : list
+        複製後の正方行列での割当のリスト [(row, col), ...]
+    """
+    if isinstance(numeric_matrix, SparseMatrix):
+        if numeric_matrix.nnz < numeric_matrix.shape[0] * numeric_matrix.shape[1]:
+            raise TransportationError("輸送問題モードは割当不可のセルを含む行列に対応していません")
+        numeric_matrix = numeric_matrix.toarray()
+    original_matrix = np.asarray(numeric_matrix)
+    row_supplies = np.asarray(row_replication_factors, dtype=np.int64)
+    col_demands = np.asarray(column_replication_factors, dtype=np.int64)
+    if row_supplies.sum() != col_demands.sum():
+        raise TransportationError("輸送問題モードでは行複製係数の和と列複製係数の和を一致させてください")
+
+    # 利益行列をコスト行列に変換（正方行列に展開した場合と同じく最大値から引く）
+    if matrix_type == 1:
+        cost_matrix = original_matrix.max() - original_matrix
+    else:
+        cost_matrix = original_matrix
+
+    flows, reduced_cost_matrix = solve_transportation(cost_matrix, row_supplies, col_demands)
+    total_assignment = int((original_matrix * flows).sum())
+
+    # 最適解が複数ある場合にランダムに選ぶため、行と列の順序をシャッフルしてからモデルを作る
+    num_rows, num_cols = cost_matrix.shape
+    row_permutation = list(range(num_rows))
+    col_permutation = list(range(num_cols))
+    rng = random if seed is None else random.Random(seed)
+    rng.shuffle(row_permutation)
+    rng.shuffle(col_permutation)
+    shuffled_cost = cost_matrix[np.ix_(row_permutation, col_permutation)]
+    shuffled_reduced = reduced_cost_matrix[np.ix_(row_permutation, col_permutation)]
+    shuffled_flows = flows[np.ix_(row_permutation, col_permutation)]
+    shuffled_supplies = row_supplies[row_permutation]
+    shuffled_demands = col_demands[col_permutation]
+    shuffled_row_priorities = [row_priorities[i] for i in row_permutation]
+    shuffled_col_priorities = [col_priorities[j] for j in col_permutation]
+
+    # 被約費用0のセルだけに流量変数を作る
+    model = cp_model.CpModel()
+    flow_vars = {}
+    row_vars = [[] for _ in range(num_rows)]
+    col_vars = [[] for _ in range(num_cols)]
+    for i, j in zip(*np.nonzero(shuffled_reduced == 0)):
+        capacity = int(min(shuffled_supplies[i], shuffled_demands[j]))
+        var = model.NewIntVar(0, capacity, f'flow_{i}_{j}')
+        flow_vars[(int(i), int(j))] = var
+        row_vars[i].append(var)
+        col_vars[j].append(var)
+    for i in range(num_rows):
+        model.Add(sum(row_vars[i]) == int(shuffled_supplies[i]))
+    for j in range(num_cols):
+        model.Add(sum(col_vars[j]) == int(shuffled_demands[j]))
+
+    if priority_flag == 0:  # 行優先
+        stages = [(0, shuffled_row_priorities), (1, shuffled_col_priorities)]
+    else:  # 列優先
+        stages = [(1, shuffled_col_priorities), (0, shuffled_row_priorities)]
+
+    # 全段階で1つのソルバーを使い、最小費用流の最適解（被約費用0のセルだけを使う）から始める
+    solver = cp_model.CpSolver()
+    current_flows = {cell: int(shuffled_flows[cell]) for cell in flow_vars}
+    for axis, priorities in stages:
+        current_flows = optimize_flows_by_priorities(model, flow_vars, priorities, axis, shuffled_cost, solver, current_flows)
+        if current_flows is None:
+            raise TransportationError("辞書式最適化で解が見つかりませんでした")
+
+    # シャッフル後の流量を元の順序に戻す
+    final_flows = np.zeros_like(flows)
+    for (i, j), value in current_flows.items():
+        final_flows[row_permutation[i], col_permutation[j]] = value
+
+    assignments = expand_flows(final_flows, row_supplies, col_demands)
+    return reduced_cost_matrix, total_assignment, assignments
+
+
+def solve_transportation(cost_matrix, row_supplies, col_demands):
+    """
+    OR-Toolsの最小費用流で輸送問題を解き、流量と被約費用行列を返す
+
+    Parameters
+    ----------
+    cost_matrix : numpy.ndarray
+        整数のコスト行列
+    row_supplies : numpy.ndarray
+        行ごとの供給量
+    col_demands : numpy.ndarray
+        列ごとの需要量
+
+    Returns
+    -------
+    flows : numpy.ndarray
+        セルごとの最適流量
+    reduced_cost_matrix : numpy.ndarray
+        最適双対変数による被約費用行列（0のセルが最適解に使える辺）
+    """
+    num_rows, num_cols = cost_matrix.shape
+    if not np.issubdtype(cost_matrix.dtype, np.integer):
+        raise TransportationError("輸送問題モードは整数の行列のみ扱えます")
+
+    rows, cols = np.indices((num_rows, num_cols))
+    rows = rows.ravel()
+    cols = cols.ravel()
+    solver = min_cost_flow.SimpleMinCostFlow()
+    arcs = solver.add_arcs_with_capacity_and_unit_cost(
+        rows,
+        cols + num_rows,
+        np.minimum(row_supplies[rows], col_demands[cols]),
+        cost_matrix.ravel().astype(np.int64)
+    )
+    solver.set_nodes_supplies(
+        np.arange(num_rows + num_cols),
+        np.concatenate([row_supplies, -col_demands])
+    )
+    status = solver.solve()
+    if status != solver.OPTIMAL:
+        raise TransportationError(f"最小費用流が最適解を返しませんでした (status={status})")
+
+    flows = solver.flows(arcs).reshape(num_rows, num_cols)
+    row_potentials, col_potentials = recover_transportation_potentials(cost_matrix, flows)
+    reduced_cost_matrix = cost_matrix - row_potentials[:, None] - col_potentials[None, :]
+    return flows, reduced_cost_matrix
+
+
+def recover_transportation_potentials(cost_matrix, flows):
+    """
+    最適流量から相補性を満たす双対変数(u, v)を復元する
+
+    残余グラフ（行→列は常に通れ、流量のあるセルは列→行へ逆向きに通れる）の
+    最短距離dから u = -d(行), v = d(列) とする。
+
+    Parameters
+    ----------
+    cost_matrix : numpy.ndarray
+        コスト行列
+    flows : numpy.ndarray
+        最適流量
+
+    Returns
+    -------
+    u : numpy.ndarray
+        行ポテンシャル
+    v : numpy.ndarray
+        列ポテンシャル
+    """
+    num_rows, num_cols = cost_matrix.shape
+    has_flow = flows > 0
+    row_dist = np.zeros(num_rows, dtype=np.int64)
+    col_dist = np.zeros(num_cols, dtype=np.int64)
+    # ベクトル化したBellman-Ford法
+    for _ in range(num_rows + num_cols):
+        new_col_dist = np.minimum(col_dist, (row_dist[:, None] + cost_matrix).min(axis=0))
+        backward = np.where(has_flow, new_col_dist[None, :] - cost_matrix, np.iinfo(np.int64).max)
+        new_row_dist = np.minimum(row_dist, backward.min(axis=1))
+        if np.array_equal(new_col_dist, col_dist) and np.array_equal(new_row_dist, row_dist):
+            break
+        row_dist = new_row_dist
+        col_dist = new_col_dist
+    return -row_dist, col_dist
+
+
+def optimize_flows_by_priorities(model, flow_vars, priorities, axis, cost_matrix, solver=None, current_flows=None):
+    """
+    優先順位グループ順に、グループ内のコスト合計を最小化して固定していく
+
+    各グループは前のグループ（または前段）の解をヒントとして与えて解く。
+
+    Parameters
+    ----------
+    model : cp_model.CpModel
+        流量変数と供給・需要制約を持つモデル
+    flow_vars : dict
+        (row, col) -> 流量変数
+    priorities : list[int]
+        行または列の優先順位リスト
+    axis : int
+        0なら行の優先順位、1なら列の優先順位
+    cost_matrix : numpy.ndarray
+        コスト行列
+    solver : cp_model.CpSolver or None
+        全段階で共有するソルバー（Noneなら新しく作る）
+    current_flows : dict or None
+        前段の解 (row, col) -> 流量（ヒントに使う）
+
+    Returns
+    -------
+    current_flows : dict or None
+        (row, col) -> 流量 の最適解、解が見つからない場合はNone
+    """
+    if solver is None:
+        solver = cp_model.CpSolver()
+    for priority, members in make_sorted_priority_groups(priorities):
+        members = set(members)
+        terms = [int(cost_matrix[cell]) * var for cell, var in flow_vars.items() if cell[axis] in members]
+        if not terms:
+            continue
+        model.Minimize(sum(terms))
+        model.ClearHints()
+        if current_flows:
+            for cell, var in flow_vars.items():
+                model.AddHint(var, current_flows[cell])
+        status = solver.Solve(model)
+        if status != cp_model.OPTIMAL:
+            return None
+        current_flows = {cell: solver.Value(var) for cell, var in flow_vars.items()}
+        group_value = sum(int(cost_matrix[cell]) * value for cell, value in current_flows.items() if cell[axis] in members)
+        model.Add(sum(terms) == group_value)
+        model.ClearObjective()
+
+    if current_flows is None:
+        # 前段の解がなく目的関数も一度も立たなかった場合は実行可能解を1つ求める
+        if solver.Solve(model) not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return None
+        current_flows = {cell: solver.Value(var) for cell, var in flow_vars.items()}
+    return current_flows
+
+
+def expand_flows(flows, row_replication_factors, column_replication_factors):
+    """
+    元の行列での流量を複製後の正方行列での割当に展開する
+
+    行iの複製と列jの複製を先頭から順に対応させる（複製同士は同一なので対応は任意）。
+
+    Parameters
+    ----------
+    flows : numpy.ndarray
+        セルごとの流量
+    row_replication_factors : list[int]
+        行複製係数
+    column_replication_factors : list[int]
+        列複製係数
+
+    Returns
+    -------
+    assignments : list
+        複製後の正方行列での割当のリスト [(row, col), ...]
+    """
+    next_row = np.concatenate([[0], np.cumsum(row_replication_factors)[:-1]])
+    next_col = np.concatenate([[0], np.cumsum(column_replication_factors)[:-1]])
+    assignments = []
+    for i, j in zip(*np.nonzero(flows)):
+        for _ in range(int(flows[i, j])):
+            assignments.append((int(next_row[i]), int(next_col[j])))
+            next_row[i] += 1
+            next_col[j] += 1
+    return assignments
@@ -0,0 +1,127 @@
+import hashlib
+import numpy as np
+from lsa_backends import solve_lsa, repair_lsa, recover_potentials
+
+
+# 変わった行・列がこの割合を超えたら、修復せずに解き直す（増加路の探索は1本ずつなので）
+MAX_REPAIR_FRACTION = 0.25
+
+
+class WarmStart:
+    """
+    前回の求解状態（最適割当・双対変数・成分ごとの辞書式最適解）を保持し、次の求解で再利用するクラス
+
+    セッションに1つ持ってassignment.assignに渡すと、前回の状態を読んで今回の状態に書き換える。
+    データエディタで数セルだけ変えて解き直す場合に、変わった行・列だけを最短増加路で割り当て直し、
+    入力が前回と同じ連結成分の辞書式最適化を省く。
+    """
+    def __init__(self, max_repair_fraction=MAX_REPAIR_FRACTION):
+        self.max_repair_fraction = max_repair_fraction
+        # 前回の線形割当の状態（正方の密行列の問題だけを持つ）
+        self.original_matrix = None
+        self.cost_matrix = None
+        self.col_of_row = None
+        self.row_potentials = None
+        self.col_potentials = None
+        # 成分の入力のハッシュ → 成分内の辞書式最適解（前回の求解で最適性を証明できたものだけ）
+        self.component_solutions = {}
+        # 直近の求解で修復した行・列の数（解き直した場合はNone）と再利用した成分の数
+        self.repaired = None
+        self.reused_components = 0
+
+    def solve_lsa(self, original_matrix, cost_matrix, backend):
+        """
+        前回の状態から修復できれば修復し、できなければbackendで解き直して状態を保存する
+
+        Parameters
+        ----------
+        original_matrix : list or numpy.ndarray
+            元の行列（前回との差分を調べるのに使う）
+        cost_matrix : list or numpy.ndarray
+            正方のコスト行列
+        backend : str
+            解き直す場合の線形割当ソルバー
+
+        Returns
+        -------
+        result : list
+            最適割当のリスト [(row, col), ...]
+        reduced_cost_matrix : numpy.ndarray
+            被約費用行列
+        """
+        original = np.asarray(original_matrix)
+        C = np.asarray(cost_matrix)
+        touched = self._touched_lines(original, C)
+        if touched is None:
+            result, reduced_cost_matrix = solve_lsa(C, backend)
+            col_of_row = np.empty(len(C), dtype=np.int64)
+            for row, col in result:
+                col_of_row[row] = col
+            u, v = recover_potentials(C, col_of_row)
+            self.repaired = None
+        else:
+            touched_rows, touched_cols, shift = touched
+            # 利益行列では最大値が変わると全てのコストが同じだけずれるので、行ポテンシャルに足す
+            result, reduced_cost_matrix, u, v = repair_lsa(
+                C, self.col_of_row, self.row_potentials + shift, self.col_potentials, touched_rows, touched_cols
+            )
+            col_of_row = np.array([col for _, col in result], dtype=np.int64)
+            self.repaired = len(touched_rows) + len(touched_cols)
+
+        self.original_matrix = original.copy()
+        self.cost_matrix = C.copy()
+        self.col_of_row = col_of_row
+        self.row_potentials = u
+        self.col_potentials = v
+        return result, reduced_cost_matrix
+
+    def _touched_lines(self, original, C):
+        """
+        前回から値が変わったセルを覆う行または列（少ない方）と、変わらないセルのコストのずれを求める
+
+        修復できない（前回の状態がない・大きさが違う・変わった行と列が多すぎる）場合はNoneを返す。
+        """
+        if self.cost_matrix is None or self.cost_matrix.shape != C.shape or self.original_matrix.shape != original.shape:
+            return None
+        changed = original != self.original_matrix
+        unchanged = np.argwhere(~changed)
+        if len(unchanged) == 0:
+            return None
+        i, j = unchanged[0]
+        shift = C[i, j] - self.cost_matrix[i, j]
+        # 変わらないセルは全て同じだけずれていなければならない（コスト行列を直接変えた場合など）
+        if not np.array_equal(C[~changed] - self.cost_matrix[~changed], np.full(len(unchanged), shift)):
+            return None
+
+        touched_rows = np.flatnonzero(changed.any(axis=1))
+        touched_cols = np.flatnonzero(changed.any(axis=0))
+        if len(touched_rows) <= len(touched_cols):
+            touched_cols = touched_cols[:0]
+        else:
+            touched_rows = touched_rows[:0]
+        if len(touched_rows) + len(touched_cols) > self.max_repair_fraction * len(C):
+            return None
+        return touched_rows, touched_cols, shift
+
+    def component_key(self, task):
+        """
+        成分の辞書式最適化の入力（ヒントと予算を除く）のハッシュを求める
+
+        Parameters
+        ----------
+        task : tuple
+            assignment.solve_componentの引数
+        """
+        (engine, backend, cell_costs, num_cols, row_priorities, col_priorities, priority_flag,
+         _, scalarize, _, row_classes, col_classes, required_cols) = task
+        digest = hashlib.sha256()
+        digest.update(repr((
+            engine, backend, priority_flag, scalarize, row_priorities, col_priorities,
+            row_classes, col_classes, required_cols, len(cell_costs), num_cols
+        )).encode("utf-8"))
+        # 成分の全ての行が割り当てられるので、コストが一様にずれても最適解は変わらない（利益行列の最大値が変わった場合など）
+        min_cost = min((min(row_costs.values()) for row_costs in cell_costs if row_costs), default=0)
+        digest.update(repr([
+            [(col, cost - min_cost) for col, cost in row_costs.items()] for row_costs in cell_costs
+        ]).encode("utf-8"))
+        return digest.hexdigest()